@@ -0,0 +1,69 @@
+"""
+Per-tick latency of each compute backend on the tic-tac-toe Neuron shape.
+
+    PYTHONPATH=src python benchmarks/backends.py --ticks 2000
+"""
+import argparse
+import time
+
+from numpy.random import default_rng
+
+from roxene import Organism, Neuron, random_neuron_state
+from roxene.backend import BACKENDS, set_backend
+from roxene.genes import CompositeGene, ConnectNeurons, CreateNeuron, RotateCells
+from roxene.tic_tac_toe.players import REQUIRED_INPUTS, REQUIRED_OUTPUTS
+from roxene.util import set_rng
+
+# The same as Environment.populate()
+NEURON_SHAPE = {"input_size": 10, "feedback_size": 5, "hidden_size": 10}
+
+
+def build_organism() -> Organism:
+    genes = []
+    for _ in REQUIRED_OUTPUTS:
+        genes.extend([
+            CreateNeuron(**random_neuron_state(**NEURON_SHAPE)),
+            *[ConnectNeurons(n, n) for n in range(1, len(REQUIRED_INPUTS) + 1)],
+            RotateCells()
+        ])
+    return Organism(REQUIRED_INPUTS, REQUIRED_OUTPUTS, CompositeGene(genes))
+
+
+def time_per_tick(tick, ticks: int) -> float:
+    for _ in range(10):
+        tick()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        tick()
+    return (time.perf_counter() - start) / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=1000, help='Ticks to time per measurement')
+    parser.add_argument('--seed', type=int, default=11235)
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'Neuron.update':>16} {'Organism.update':>16} {'Phenotype.step':>16} {'run_until':>16}")
+    for name in BACKENDS:
+        set_backend(name)
+        set_rng(default_rng(args.seed))
+        neuron = Neuron(**random_neuron_state(**NEURON_SHAPE))
+        organism = build_organism()
+        for input_name in REQUIRED_INPUTS:
+            organism.set_input(input_name, 0.5)
+        neuron_tick = time_per_tick(neuron.update, args.ticks)
+        organism_tick = time_per_tick(organism.update, args.ticks)
+        organism.compile()
+        phenotype_tick = time_per_tick(organism.phenotype.step, args.ticks)
+        # A threshold that's never reached, so every tick runs
+        start = time.perf_counter()
+        organism.run_until(REQUIRED_OUTPUTS[0], lambda x: x > 2, args.ticks)
+        run_until_tick = (time.perf_counter() - start) / args.ticks
+        organism.decompile()
+        print(f"{name:<8} {neuron_tick * 1e6:>14.1f}us {organism_tick * 1e6:>14.1f}us "
+              f"{phenotype_tick * 1e6:>14.1f}us {run_until_tick * 1e6:>14.1f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Per-tick cost of SQLAlchemy change tracking, with and without Organism.simulation().
+
+    PYTHONPATH=src python benchmarks/simulation.py --ticks 2000
+"""
+import argparse
+
+from numpy.random import default_rng
+
+from roxene.tic_tac_toe.players import REQUIRED_INPUTS
+from roxene.util import set_rng
+from backends import build_organism, time_per_tick
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=1000, help='Ticks to time per measurement')
+    parser.add_argument('--seed', type=int, default=11235)
+    args = parser.parse_args()
+
+    set_rng(default_rng(args.seed))
+    organism = build_organism()
+    for input_name in REQUIRED_INPUTS:
+        organism.set_input(input_name, 0.5)
+
+    tracked_tick = time_per_tick(organism.update, args.ticks)
+    with organism.simulation():
+        simulated_tick = time_per_tick(organism.update, args.ticks)
+
+    print(f"{'tracked':<10} {tracked_tick * 1e6:>10.1f}us")
+    print(f"{'simulation':<10} {simulated_tick * 1e6:>10.1f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+The array library Neurons and Phenotypes do their math with.
+
+Torch is the default. Set the ROXENE_BACKEND environment variable to "numpy" (or call set_backend("numpy"))
+to use plain NumPy arrays instead, which has a lot less per-op overhead at the sizes we use.
+Arrays already created keep working with whichever backend they were created by, see backend_for().
+"""
+import abc
+import functools
+import os
+from typing import Any, Sequence
+
+import numpy as np
+import torch
+
+
+class Backend(abc.ABC):
+
+    name: str
+
+    @abc.abstractmethod
+    def is_array(self, x) -> bool:
+        pass
+
+    @abc.abstractmethod
+    def dtype(self, dtype):
+        """The backend's equivalent of a NumPy dtype (or the name of one)"""
+        pass
+
+    @abc.abstractmethod
+    def array(self, data, dtype=None):
+        """A new array holding a copy of data"""
+        pass
+
+    @abc.abstractmethod
+    def to_numpy(self, x) -> np.ndarray:
+        pass
+
+    @abc.abstractmethod
+    def zeros(self, shape, dtype):
+        pass
+
+    @abc.abstractmethod
+    def index(self, values: Sequence[int]):
+        """An integer array suitable for indexing other arrays"""
+        pass
+
+    @abc.abstractmethod
+    def mask(self, size: int):
+        """An all-False boolean array"""
+        pass
+
+    @abc.abstractmethod
+    def astype(self, x, dtype):
+        pass
+
+    def clone(self, x):
+        return self.astype(x, x.dtype)
+
+    @abc.abstractmethod
+    def first_true(self, mask) -> int:
+        """Index of the first True in a 1-D boolean array, or -1 if there isn't one"""
+        pass
+
+    def cast(self, x, dtype):
+        """x as dtype, without copying it if it already is"""
+        dtype = self.dtype(dtype)
+        return x if x.dtype == dtype else self.astype(x, dtype)
+
+    @abc.abstractmethod
+    def stack(self, xs):
+        pass
+
+    @abc.abstractmethod
+    def cat(self, xs, axis: int = 0):
+        pass
+
+    @abc.abstractmethod
+    def matmul(self, a, b):
+        """Matrix product, batched over the leading dimension for 3-D arguments"""
+        pass
+
+    @abc.abstractmethod
+    def tanh(self, x):
+        pass
+
+    @abc.abstractmethod
+    def where(self, condition, x, y):
+        pass
+
+    @abc.abstractmethod
+    def copy_(self, dst, src) -> None:
+        """Copy src into dst in place, converting to dst's dtype"""
+        pass
+
+
+class TorchBackend(Backend):
+    name = "torch"
+
+    def is_array(self, x) -> bool:
+        return isinstance(x, torch.Tensor)
+
+    @functools.lru_cache(maxsize=None)
+    def dtype(self, dtype):
+        if isinstance(dtype, torch.dtype):
+            return dtype
+        if isinstance(dtype, str) and hasattr(torch, dtype):
+            return getattr(torch, dtype)
+        return torch.from_numpy(np.zeros(0, dtype=dtype)).dtype
+
+    def array(self, data, dtype=None):
+        if isinstance(data, torch.Tensor):
+            return data.to(self.dtype(dtype) if dtype is not None else data.dtype, copy=True)
+        return torch.tensor(np.asarray(data), dtype=self.dtype(dtype) if dtype is not None else None)
+
+    def to_numpy(self, x) -> np.ndarray:
+        if x.dtype == torch.bfloat16:
+            # NumPy doesn't have it, float32 holds every value exactly
+            x = x.float()
+        return x.detach().cpu().numpy()
+
+    def zeros(self, shape, dtype):
+        return torch.zeros(shape, dtype=self.dtype(dtype))
+
+    def index(self, values: Sequence[int]):
+        return torch.tensor(values, dtype=torch.long)
+
+    def mask(self, size: int):
+        return torch.zeros(size, dtype=torch.bool)
+
+    def astype(self, x, dtype):
+        return x.to(self.dtype(dtype), copy=True)
+
+    def first_true(self, mask) -> int:
+        hits = mask.nonzero()
+        return int(hits[0, 0]) if len(hits) else -1
+
+    def stack(self, xs):
+        return torch.stack(xs)
+
+    def cat(self, xs, axis: int = 0):
+        return torch.cat(xs, dim=axis)
+
+    def matmul(self, a, b):
+        return torch.matmul(a, b)
+
+    def tanh(self, x):
+        return torch.tanh(x)
+
+    def where(self, condition, x, y):
+        return torch.where(condition, x, y)
+
+    def copy_(self, dst, src) -> None:
+        dst.copy_(src if isinstance(src, torch.Tensor) else torch.as_tensor(np.asarray(src)))
+
+
+class NumpyBackend(Backend):
+    name = "numpy"
+
+    def is_array(self, x) -> bool:
+        return isinstance(x, np.ndarray)
+
+    @functools.lru_cache(maxsize=None)
+    def dtype(self, dtype):
+        try:
+            if isinstance(dtype, torch.dtype):
+                return torch.zeros(0, dtype=dtype).numpy().dtype
+            return np.dtype(dtype)
+        except TypeError as e:
+            raise ValueError(f"NumPy has no equivalent of {dtype}") from e
+
+    def array(self, data, dtype=None):
+        if isinstance(data, torch.Tensor):
+            data = data.detach().cpu().numpy()
+        return np.array(data, dtype=self.dtype(dtype) if dtype is not None else None)
+
+    def to_numpy(self, x) -> np.ndarray:
+        return x
+
+    def zeros(self, shape, dtype):
+        return np.zeros(shape, dtype=self.dtype(dtype))
+
+    def index(self, values: Sequence[int]):
+        return np.array(values, dtype=np.intp)
+
+    def mask(self, size: int):
+        return np.zeros(size, dtype=bool)
+
+    def astype(self, x, dtype):
+        return x.astype(self.dtype(dtype))
+
+    def first_true(self, mask) -> int:
+        hits = np.flatnonzero(mask)
+        return int(hits[0]) if len(hits) else -1
+
+    def stack(self, xs):
+        return np.stack(xs)
+
+    def cat(self, xs, axis: int = 0):
+        return np.concatenate(xs, axis=axis)
+
+    def matmul(self, a, b):
+        return np.matmul(a, b)
+
+    def tanh(self, x):
+        return np.tanh(x)
+
+    def where(self, condition, x, y):
+        return np.where(condition, x, y)
+
+    def copy_(self, dst, src) -> None:
+        if isinstance(src, torch.Tensor):
+            src = src.detach().cpu().numpy()
+        np.copyto(dst, src, casting='unsafe')
+
+
+BACKENDS = {backend.name: backend for backend in (TorchBackend(), NumpyBackend())}
+
+_backend: Backend = BACKENDS[os.environ.get("ROXENE_BACKEND", "torch")]
+
+
+def get_backend() -> Backend:
+    return _backend
+
+
+def set_backend(name: str) -> Backend:
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name}, expected one of {list(BACKENDS.keys())}")
+    _backend = BACKENDS[name]
+    return _backend
+
+
+def backend_for(x: Any) -> Backend:
+    """The Backend that created an array"""
+    if isinstance(x, torch.Tensor):
+        return BACKENDS["torch"]
+    return BACKENDS["numpy"]
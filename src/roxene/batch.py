@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from .backend import get_backend
+from .phenotype import Phenotype, _Bucket
+
+
+class PhenotypeBatch(object):
+    """
+    Many independent Phenotypes stepped by one tensor program.
+
+    Buckets with the same level and shape are concatenated across all the Phenotypes, and so are their
+    output vectors, so a tick of the whole batch costs the same handful of batched matmul calls as a tick of one
+    Organism. Each Phenotype's own tensors are re-pointed at its slice of the batch's, so they stay
+    usable (get_output, write_back, etc.) while batched.
+
+    All the Phenotypes need the same dtype and backend.
+    """
+
+    def __init__(self, phenotypes: Collection[Phenotype]):
+        self.phenotypes: List[Phenotype] = list(phenotypes)
+        self.index: Dict[Phenotype, int] = {p: i for i, p in enumerate(self.phenotypes)}
+        self.backend = self.phenotypes[0].backend if self.phenotypes else get_backend()
+        backend = self.backend
+
+        offsets = []
+        offset = 0
+        for phenotype in self.phenotypes:
+            offsets.append(offset)
+            offset += len(phenotype.outputs)
+        self.outputs = backend.cat([p.outputs for p in self.phenotypes]) if self.phenotypes else backend.zeros(0, 'float32')
+        for phenotype, offset in zip(self.phenotypes, offsets):
+            phenotype.outputs = self.outputs[offset:offset + len(phenotype.outputs)]
+
+        grouped: Dict[Tuple, List[Tuple[int, _Bucket]]] = defaultdict(list)
+        for i, phenotype in enumerate(self.phenotypes):
+            for buckets in phenotype.levels:
+                for bucket in buckets:
+                    grouped[(bucket.level, bucket.shape)].append((i, bucket))
+
+        num_levels = max((level for level, _ in grouped.keys()), default=-1) + 1
+        # Each merged bucket alongside which Phenotype each of its rows came from
+        self.levels: List[List[Tuple[_Bucket, object]]] = [[] for _ in range(num_levels)]
+        for (level, shape), members in grouped.items():
+            self.levels[level].append(self._merge(level, shape, members, offsets))
+
+    def _merge(self, level: int, shape: Tuple, members: List[Tuple[int, _Bucket]],
+               offsets: List[int]) -> Tuple[_Bucket, object]:
+        backend = self.backend
+        neurons, slots, owners = [], [], []
+        gather_rows, gather_ports, gather_sources = [], [], []
+        row_offset = 0
+        for i, bucket in members:
+            neurons.extend(bucket.neurons)
+            slots.append(bucket.slots + offsets[i])
+            owners.append(backend.index([i] * len(bucket.neurons)))
+            gather_rows.append(bucket.gather_rows + row_offset)
+            gather_ports.append(bucket.gather_ports)
+            gather_sources.append(bucket.gather_sources + offsets[i])
+            row_offset += len(bucket.neurons)
+
+        tensors = {name: backend.cat([getattr(bucket, name) for _, bucket in members]) for name in _Bucket.TENSORS}
+        merged = _Bucket(backend, level, shape, neurons, backend.cat(slots),
+                         (backend.cat(gather_rows), backend.cat(gather_ports), backend.cat(gather_sources)), tensors)
+
+        # Point each of the original buckets at its rows of the merged one
+        row_offset = 0
+        for _, bucket in members:
+            num_rows = len(bucket.neurons)
+            for name in _Bucket.TENSORS:
+                setattr(bucket, name, tensors[name][row_offset:row_offset + num_rows])
+            row_offset += num_rows
+
+        return merged, backend.cat(owners)
+
+    def update(self, active: Optional[Collection[Phenotype]] = None) -> None:
+        """Run one tick of every Phenotype in the batch, or only of the active ones"""
+        mask = None
+        if active is not None and len(active) < len(self.phenotypes):
+            mask = self.backend.mask(len(self.phenotypes))
+            mask[self.backend.index([self.index[p] for p in active])] = True
+
+        for buckets in self.levels:
+            for bucket, owners in buckets:
+                bucket.load_inputs(self.outputs, None if mask is None else mask[owners])
+            for bucket, owners in buckets:
+                bucket.update(None if mask is None else mask[owners])
+                bucket.store_outputs(self.outputs)
+
+
+class BatchStepper(object):
+    """
+    Lets Phenotypes being ticked from different threads (e.g. concurrent Trials) share forward passes.
+
+    A thread calling update() on an attached Phenotype blocks until a round runs: as soon as every
+    attached Phenotype is waiting for a tick, or max_wait seconds after the first one started waiting.
+    Each round is one PhenotypeBatch.update() of whichever Phenotypes asked for it, so no Phenotype
+    ever gets more or fewer ticks than it asked for.
+
+    Only attach a Phenotype while something is actively ticking it, e.g. for the length of one
+    Player's move, or the rest of the batch will wait out max_wait on it every round. Attaching the same
+    Phenotypes again and again is cheap: the batch is only rebuilt when one it doesn't have yet is attached.
+    """
+
+    def __init__(self, max_wait: float = 0.001):
+        self.max_wait = max_wait
+        self._condition = threading.Condition()
+        self._attached: List[Phenotype] = []
+        self._pending: Set[Phenotype] = set()
+        self._batch: Optional[PhenotypeBatch] = None
+        # Set when something's attached that the batch doesn't have rows for yet
+        self._stale = False
+        self._round = 0
+        self.rounds_run = 0
+        self.ticks_run = 0
+
+    def attach(self, phenotype: Phenotype) -> None:
+        with self._condition:
+            self._attached.append(phenotype)
+            phenotype.stepper = self
+            # The batch only gets rebuilt once a round needs it, and only if this Phenotype isn't in it already
+            if self._batch is None or phenotype not in self._batch.index:
+                self._stale = True
+
+    def detach(self, phenotype: Phenotype) -> None:
+        with self._condition:
+            self._attached.remove(phenotype)
+            phenotype.stepper = None
+            # Its rows stay in the batch, left out of every round, in case it's attached again
+            # Whoever's left might have only been waiting on this one
+            if self._pending and len(self._pending) == len(self._attached):
+                self._run_round()
+
+    @contextmanager
+    def attached(self, phenotype: Phenotype):
+        self.attach(phenotype)
+        try:
+            yield phenotype
+        finally:
+            self.detach(phenotype)
+
+    def update(self, phenotype: Phenotype) -> None:
+        with self._condition:
+            self._pending.add(phenotype)
+            this_round = self._round
+            if len(self._pending) == len(self._attached):
+                self._run_round()
+                return
+            deadline = time.monotonic() + self.max_wait
+            while self._round == this_round:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._run_round()
+                    return
+                self._condition.wait(remaining)
+
+    def set_input(self, phenotype: Phenotype, slot: int, value) -> None:
+        # Under the lock, so it can't land in the old copy of the outputs while the batch is being rebuilt
+        with self._condition:
+            phenotype.outputs[slot] = value
+
+    def _run_round(self) -> None:
+        if self._stale:
+            self._batch = PhenotypeBatch(self._attached)
+            self._stale = False
+        self._batch.update(self._pending)
+        self.rounds_run += 1
+        self.ticks_run += len(self._pending)
+        self._pending = set()
+        self._round += 1
+        self._condition.notify_all()
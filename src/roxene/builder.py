@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import TYPE_CHECKING, Dict, List
+
+from .cell import Cell
+from .cells.neuron import Neuron
+
+if TYPE_CHECKING:
+    from .organism import Organism
+
+
+class _Cells(deque):
+    """A deque that takes list-style pop(0), which is all the genes use it for"""
+
+    def pop(self, index: int = -1):
+        if index == 0:
+            return self.popleft()
+        if index == -1:
+            return super().pop()
+        raise IndexError("Can only pop from either end")
+
+
+class OrganismBuilder(object):
+    """
+    Stands in for a freshly constructed Organism while its genotype runs, so the genes shuffle plain
+    Python objects around instead of ORM collections. Nothing lands on the Organism until materialize(),
+    which sets its cells, Neuron connections and outputs in one go.
+    """
+
+    def __init__(self, organism: Organism):
+        self.organism = organism
+        self.precision = organism.precision
+        self.inputs = dict(organism.inputs)
+        self.cells = _Cells(organism.cells)
+        self.outputs: Dict[str, Neuron] = {}
+        self.unused_output_names: List[str] = list(organism.unused_output_names)
+        self._ports: Dict[Neuron, Dict[int, Cell]] = {}
+
+    def addNeuron(self, neuron: Neuron):
+        self.cells.appendleft(neuron)
+        self._ports[neuron] = {}
+        if self.unused_output_names:
+            self.outputs[self.unused_output_names.pop()] = neuron
+
+    def connect(self, tx_cell: Cell, rx_cell: Neuron, req_port: int):
+        ports = self._ports[rx_cell]
+        port = Neuron.free_port(ports, rx_cell.input.shape[0], req_port)
+        if port is not None:
+            ports[port] = tx_cell
+
+    def materialize(self) -> Organism:
+        organism = self.organism
+        for neuron, ports in self._ports.items():
+            if ports:
+                neuron.bound_ports = ports
+        organism.cells.clear()
+        organism.cells.extend(self.cells)
+        for name, neuron in self.outputs.items():
+            organism.outputs[name] = neuron
+        organism.unused_output_names.clear()
+        organism.unused_output_names.extend(self.unused_output_names)
+        organism._wiring = None
+        return organism
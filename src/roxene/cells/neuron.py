@@ -1,18 +1,18 @@
 from numpy import ndarray
 import numpy as np
 from sqlalchemy.ext.associationproxy import AssociationProxy, association_proxy
-from typing import Dict
+from typing import Dict, Optional
 
 import torch
 import uuid
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column, relationship, attribute_keyed_dict
 
+from ..backend import get_backend, backend_for
 from ..cell import Cell
-from ..constants import NP_PRECISION, TORCH_PRECISION
+from ..constants import NP_PRECISION
 from ..persistence import TrackedTensor, WrappedTensor, EntityBase
-
-activation_func = torch.tanh
+from ..precision import DEFAULT_PRECISION
 
 
 class Neuron(Cell):
@@ -21,14 +21,15 @@ class Neuron(Cell):
 
     id: Mapped[uuid.UUID] = mapped_column(ForeignKey("cell.id"), primary_key=True)
 
-    input: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
-    feedback: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
-    output: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
+    # The weights never change once the Neuron's built, so they're only ever written when it's inserted.
+    # The runtime state changes all the time, and gets a table of its own (see _Neuron_State)
     input_hidden: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
     hidden_feedback: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
     feedback_hidden: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
     hidden_output: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
 
+    _state: Mapped["_Neuron_State"] = relationship(cascade="all, delete-orphan", lazy="joined")
+
     _ports_map: Mapped[Dict[int, "_Neuron_Input"]] = relationship(
         back_populates="listener_neuron",
         cascade="all, delete-orphan",
@@ -40,6 +41,17 @@ class Neuron(Cell):
         attr="broadcaster_cell",
         creator=lambda port, inputcell: _Neuron_Input(port, inputcell))
 
+    # The runtime state, everything else is fixed once the Neuron's built
+    STATE = ("input", "feedback", "output")
+
+    input = property(lambda self: self._state.input, lambda self, value: setattr(self._state, "input", value))
+    feedback = property(lambda self: self._state.feedback, lambda self, value: setattr(self._state, "feedback", value))
+    output = property(lambda self: self._state.output, lambda self, value: setattr(self._state, "output", value))
+
+    # Not persisted. Off while simulating (see Organism.simulation), when nobody's going to look at the
+    # session until mark_changed() gets called at the end anyway
+    _tracking = True
+
     def __init__(self,
                  input: ndarray,
                  feedback: ndarray,
@@ -47,51 +59,109 @@ class Neuron(Cell):
                  input_hidden: ndarray,
                  hidden_feedback: ndarray,
                  feedback_hidden: ndarray,
-                 hidden_output: ndarray):
+                 hidden_output: ndarray,
+                 dtype=DEFAULT_PRECISION.storage):
         '''
             I guess there's not much enforcement of this API anyway,
             but we're really trying to only take numpy ndarrays as inputs here.
             They should be the "right" sizes and types, but that depends on the Genes/tests
-            that call this c'tor, or else you could build a Neuron that asplodes at runtime
+            that call this c'tor, or else you could build a Neuron that asplodes at runtime.
+            Everything gets stored as dtype, whatever it came in as.
         '''
         self.id = uuid.uuid4()
-        self.input = torch.tensor(input, dtype=TORCH_PRECISION)
-        self.feedback = torch.tensor(feedback, dtype=TORCH_PRECISION)
-        self.output = torch.tensor(output, dtype=TORCH_PRECISION)
-
-        self.input_hidden = torch.tensor(input_hidden, dtype=TORCH_PRECISION)
-        self.hidden_feedback = torch.tensor(hidden_feedback, dtype=TORCH_PRECISION)
-        self.feedback_hidden = torch.tensor(feedback_hidden, dtype=TORCH_PRECISION)
-        self.hidden_output = torch.tensor(hidden_output, dtype=TORCH_PRECISION)
+        backend = get_backend()
+        self._state = _Neuron_State()
+        self.input = backend.array(input, dtype=dtype)
+        self.feedback = backend.array(feedback, dtype=dtype)
+        self.output = backend.array(output, dtype=dtype)
+
+        self.input_hidden = backend.array(input_hidden, dtype=dtype)
+        self.hidden_feedback = backend.array(hidden_feedback, dtype=dtype)
+        self.feedback_hidden = backend.array(feedback_hidden, dtype=dtype)
+        self.hidden_output = backend.array(hidden_output, dtype=dtype)
         self.bound_ports = {}
 
-    def update(self) -> None:
-        # TODO: Optimize / make less wack
-        for port_num, cell in self.bound_ports.items():
-            self.input[port_num] = cell.get_output()
-        
-        hidden_in = torch.cat([self.input, self.feedback], dim=0).unsqueeze(0)
-        hidden_wts = torch.cat([self.input_hidden, self.feedback_hidden], dim=0)
-        hidden = activation_func(torch.matmul(hidden_in, hidden_wts))
-        
-        self.feedback.copy_(activation_func(torch.matmul(hidden, self.hidden_feedback)).squeeze(0))
-        self.output.copy_(activation_func(torch.matmul(hidden, self.hidden_output)).squeeze(0))
+    def update(self, compute_dtype=DEFAULT_PRECISION.compute) -> None:
+        bound_ports = self.bound_ports
+        if bound_ports:
+            backend = backend_for(self.input.tensor)
+            ports = backend.index(list(bound_ports.keys()))
+            values = backend.array([cell.get_output() for cell in bound_ports.values()], dtype=self.input.dtype)
+            self.load_inputs(ports, values)
+        self.step(compute_dtype)
+
+    def load_inputs(self, ports, values) -> None:
+        """Write a batch of input values to their ports in one go"""
+        self.input.tensor[ports] = values
+        if self._tracking:
+            self.input.changed()
+
+    def step(self, compute_dtype=DEFAULT_PRECISION.compute) -> None:
+        """
+        Update the Neuron from whatever is currently in its input, without reading its bound ports.
+        The math runs in compute_dtype, and the results are rounded back to the Neuron's own dtype.
+        """
+        backend = backend_for(self.input.tensor)
+
+        def compute(x):
+            return backend.cast(x.tensor, compute_dtype)
+
+        hidden_in = backend.cat([compute(self.input), compute(self.feedback)])
+        hidden_wts = backend.cat([compute(self.input_hidden), compute(self.feedback_hidden)])
+        hidden = backend.tanh(backend.matmul(hidden_in, hidden_wts))
+
+        backend.copy_(self.feedback.tensor, backend.tanh(backend.matmul(hidden, compute(self.hidden_feedback))))
+        backend.copy_(self.output.tensor, backend.tanh(backend.matmul(hidden, compute(self.hidden_output))))
+        if self._tracking:
+            self.feedback.changed()
+            self.output.changed()
+
+    def snapshot(self) -> Dict[str, object]:
+        """A copy of the runtime state, to tell what's changed later"""
+        return {key: backend_for(getattr(self, key).tensor).clone(getattr(self, key).tensor) for key in Neuron.STATE}
+
+    def mark_changed(self, since: Optional[Dict[str, object]] = None) -> None:
+        """
+        Tell SQLAlchemy the runtime state has changed, e.g. after updating it untracked. Only the parts that
+        differ from since, if given a snapshot().
+        """
+        for key in Neuron.STATE:
+            value = getattr(self, key)
+            if since is None or not np.array_equal(backend_for(value.tensor).to_numpy(value.tensor),
+                                                   backend_for(since[key]).to_numpy(since[key])):
+                value.changed()
 
     def get_output(self) -> NP_PRECISION:
         return NP_PRECISION(self.output.item())
 
     def add_input_connection(self, tx_cell: Cell, req_port: int):
-        num_ports = self.input.shape[0]
+        rx_port = Neuron.free_port(self.bound_ports, self.input.shape[0], req_port)
+        if rx_port is not None:
+            self.bound_ports[rx_port] = tx_cell
+
+    @staticmethod
+    def free_port(bound_ports, num_ports: int, req_port: int) -> Optional[int]:
+        """The first port from req_port on (wrapping around) that isn't in bound_ports, or None if they're all taken"""
         for offset in range(num_ports):
             rx_port = (req_port + offset) % num_ports
-            if rx_port not in self.bound_ports:
-                self.bound_ports[rx_port] = tx_cell
-                return
+            if rx_port not in bound_ports:
+                return rx_port
+        return None
 
     def __str__(self):
         return f"N-{str(self.id)[-7:]}"
 
 
+class _Neuron_State(EntityBase):
+    """A Neuron's runtime state, narrow enough to rewrite every Trial without touching the weights"""
+    __tablename__ = "neuron_state"
+
+    neuron_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("neuron.id", ondelete="CASCADE"), primary_key=True)
+    input: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
+    feedback: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
+    output: Mapped[torch.Tensor] = mapped_column(TrackedTensor.as_mutable(WrappedTensor))
+
+
 class _Neuron_Input(EntityBase):
     __tablename__ = "neuron_input"
 
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+class ConvergenceMonitor(object):
+    """
+    Watches an Organism's recurrent state (see Organism.get_state) while its inputs are held still, and
+    tells you once more updates can't change anything.
+
+    That's either a fixed point, where no value moved by more than tolerance since the last update,
+    or a cycle, where the exact same state came up again within the last history updates. Either way
+    an output that hasn't crossed a threshold yet never will.
+    """
+
+    FIXED_POINT = "fixed point"
+    CYCLE = "cycle"
+
+    def __init__(self, tolerance: float = 1e-4, history: int = 64):
+        self.tolerance = tolerance
+        self.history = history
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything seen so far, e.g. because the inputs changed"""
+        self._previous: Optional[np.ndarray] = None
+        self._seen: OrderedDict[bytes, int] = OrderedDict()
+        self._count = 0
+        self.reason: Optional[str] = None
+        self.cycle_length: Optional[int] = None
+
+    def observe(self, state: np.ndarray) -> bool:
+        """Record the state after an update, and return whether it's converged"""
+        self._count += 1
+        previous, self._previous = self._previous, state
+        if previous is not None and previous.shape == state.shape \
+                and np.max(np.abs(state - previous), initial=0) <= self.tolerance:
+            self.reason = ConvergenceMonitor.FIXED_POINT
+            return True
+
+        key = state.tobytes()
+        seen_at = self._seen.get(key)
+        if seen_at is not None:
+            self.reason = ConvergenceMonitor.CYCLE
+            self.cycle_length = self._count - seen_at
+            return True
+        self._seen[key] = self._count
+        if len(self._seen) > self.history:
+            self._seen.popitem(last=False)
+        return False
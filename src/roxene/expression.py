@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .backend import backend_for
+from .cells.input_cell import InputCell
+from .cells.neuron import Neuron
+
+if TYPE_CHECKING:
+    from .gene import Gene
+    from .organism import Organism
+
+NEURON_ARRAYS = ("input", "feedback", "output", "input_hidden", "hidden_feedback", "feedback_hidden", "hidden_output")
+
+
+class Expression(object):
+    """
+    A snapshot of what a genotype did to a fresh Organism: which cells it ended up with in what order,
+    each Neuron's arrays, what's wired to what and which outputs got assigned.
+    Cells are referred to by their index in the final cell list.
+    """
+
+    def __init__(self,
+                 cells: List[Tuple[str, object]],
+                 ports: Dict[int, Dict[int, int]],
+                 outputs: Dict[str, int],
+                 unused_output_names: List[str]):
+        # ("input", name) for the Organism's own inputs, ("input_cell", initial value) for ones made by
+        # genes, ("neuron", {array name: ndarray})
+        self.cells = cells
+        self.ports = ports
+        self.outputs = outputs
+        self.unused_output_names = unused_output_names
+
+    @staticmethod
+    def capture(organism: Organism) -> Expression:
+        input_names = {cell.id: name for name, cell in organism.inputs.items()}
+        cells = list(organism.cells)
+        index_of = {cell.id: index for index, cell in enumerate(cells)}
+        specs = []
+        ports = {}
+        for index, cell in enumerate(cells):
+            if isinstance(cell, Neuron):
+                to_numpy = backend_for(cell.input.tensor).to_numpy
+                specs.append(("neuron", {name: np.array(to_numpy(getattr(cell, name).tensor))
+                                         for name in NEURON_ARRAYS}))
+                ports[index] = {port: index_of[tx_cell.id] for port, tx_cell in cell.bound_ports.items()}
+            elif cell.id in input_names:
+                specs.append(("input", input_names[cell.id]))
+            else:
+                specs.append(("input_cell", cell.get_output()))
+        outputs = {name: index_of[neuron.id] for name, neuron in organism.outputs.items()}
+        return Expression(specs, ports, outputs, list(organism.unused_output_names))
+
+    def instantiate(self, organism: Organism) -> None:
+        """
+        Give a freshly constructed Organism, one that only has its input cells so far, new cells built
+        from this snapshot. Nothing is shared with the Organism it was captured from.
+        """
+        cells = []
+        for kind, value in self.cells:
+            if kind == "neuron":
+                cells.append(Neuron(**value, dtype=organism.precision.storage))
+            elif kind == "input":
+                cells.append(organism.inputs[value])
+            else:
+                cells.append(InputCell(value))
+        for index, bound_ports in self.ports.items():
+            cells[index].bound_ports = {port: cells[tx_index] for port, tx_index in bound_ports.items()}
+
+        organism.cells.clear()
+        organism.cells.extend(cells)
+        for name, index in self.outputs.items():
+            organism.outputs[name] = cells[index]
+        organism.unused_output_names.clear()
+        organism.unused_output_names.extend(self.unused_output_names)
+
+
+class ExpressionCache(object):
+    """
+    Remembers the Expression of recently executed genotypes, so Organisms with the same genotype can be
+    built by copying arrays instead of replaying (and loading) the whole gene tree. Genes don't change
+    once they're made, so the gene's ID is a good enough key, along with whatever else changes the result.
+    Holds at most maxsize Expressions, and drops the least recently used ones first.
+
+    Safe to share between threads. Expressing a miss happens outside the lock, so two threads missing on
+    the same genotype at once will both execute it.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._expressions: OrderedDict[tuple, Expression] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._expressions)
+
+    @staticmethod
+    def key(genotype: Gene, organism: Organism) -> tuple:
+        return (genotype.id,
+                tuple(organism.inputs.keys()),
+                tuple(organism.unused_output_names),
+                organism.precision.storage)
+
+    def get(self, key: tuple) -> Optional[Expression]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: tuple) -> Optional[Expression]:
+        expression = self._expressions.get(key)
+        if expression is not None:
+            self._expressions.move_to_end(key)
+        return expression
+
+    def put(self, key: tuple, expression: Expression) -> None:
+        with self._lock:
+            self._expressions[key] = expression
+            self._expressions.move_to_end(key)
+            while len(self._expressions) > self.maxsize:
+                self._expressions.popitem(last=False)
+
+    def express(self, genotype: Gene, organism: Organism) -> None:
+        """Do to a freshly constructed Organism what genotype.execute() would"""
+        key = ExpressionCache.key(genotype, organism)
+        with self._lock:
+            expression = self._get(key)
+            if expression is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if expression is not None:
+            expression.instantiate(organism)
+            return
+        organism.express(genotype)
+        self.put(key, Expression.capture(organism))
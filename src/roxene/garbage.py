@@ -0,0 +1,114 @@
+import dataclasses
+import logging
+from typing import Dict, List
+
+from sqlalchemy import Integer, LargeBinary, PickleType, Table, delete, func, or_, select, union, update
+from sqlalchemy.orm import Session
+
+from .cell import Cell
+from .cells.neuron import _Neuron_Input, _Neuron_State
+from .gene import Gene
+from .genes.composite_gene import _CompositeGene_Child
+from .genes.loading import genotype_genes
+from .lineage import Lineage
+from .mutagen import _Mutagen_Susceptibility
+from .organism import Organism, _Organism_Cell, _Organism_Input, _Organism_Output, _Organism_Unused_Output_Name
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class GCReport:
+    """What collect_garbage() deleted: how many rows from each table, and how big their pickled arrays were"""
+    rows: Dict[str, int] = dataclasses.field(default_factory=dict)
+    bytes_reclaimed: int = 0
+
+    @property
+    def genes(self) -> int:
+        return self.rows.get(Gene.__tablename__, 0)
+
+    @property
+    def cells(self) -> int:
+        return self.rows.get(Cell.__tablename__, 0)
+
+
+def collect_garbage(session: Session, retention_depth: int = 0, chunk_size: int = 500) -> GCReport:
+    """
+    Delete the genes and cells no living Organism can get to anymore, along with everything hanging off them.
+
+    Genes are kept if they're in some Organism's genotype, or up to retention_depth generations up the lineage
+    of one that is (with everything under those too). Kept genes whose parents don't make the cut lose their
+    parent_gene. Cells are kept if some Organism has them. Dead rows are deleted in chunks of chunk_size IDs.
+
+    Prune the mutagens' susceptibilities first (see Mutagen.prune_susceptibilities), or genes whose ancestors get
+    deleted inherit base susceptibilities from then on. The space is only given back to the OS once the DB gets
+    around to it (e.g. VACUUM).
+    """
+    report = GCReport()
+    _delete_unowned_links(session, report)
+
+    live = genotype_genes(select(Organism.genotype_id), "live")
+    retained = Lineage.ancestry(select(live.c.id), "retained", retention_depth).subquery()
+    kept = genotype_genes(union(select(live.c.id), select(retained.c.id)), "kept")
+    dead_genes = session.scalars(select(Gene.id).where(Gene.id.not_in(select(kept.c.id)))).all()
+    for chunk in _chunks(dead_genes, chunk_size):
+        _delete(session, report, _Mutagen_Susceptibility.__table__, _Mutagen_Susceptibility.gene_id.in_(chunk))
+        # Dead children can be under dead composites in other chunks, and the links have to go before either does
+        _delete(session, report, _CompositeGene_Child.__table__,
+                or_(_CompositeGene_Child.gene_id.in_(chunk), _CompositeGene_Child.child_id.in_(chunk)))
+        session.execute(update(Gene.__table__).where(Gene.parent_gene_id.in_(chunk)).values(parent_gene_id=None))
+        _delete_entities(session, report, Gene, chunk)
+
+    live_cells = union(select(_Organism_Cell.cell_id),
+                       select(_Organism_Input.inputcell_id),
+                       select(_Organism_Output.neuron_id))
+    dead_cells = session.scalars(select(Cell.id).where(Cell.id.not_in(live_cells))).all()
+    for chunk in _chunks(dead_cells, chunk_size):
+        _delete(session, report, _Neuron_Input.__table__,
+                or_(_Neuron_Input.listener_neuron_id.in_(chunk), _Neuron_Input.broadcaster_cell_id.in_(chunk)))
+        report.bytes_reclaimed += _payload_bytes(session, _Neuron_State.__table__, _Neuron_State.neuron_id.in_(chunk))
+        _delete(session, report, _Neuron_State.__table__, _Neuron_State.neuron_id.in_(chunk))
+        _delete_entities(session, report, Cell, chunk)
+
+    logger.info(f"Collected {report.genes} genes and {report.cells} cells, {report.bytes_reclaimed} bytes")
+    return report
+
+
+def _delete_unowned_links(session: Session, report: GCReport):
+    """The rows tying deleted Organisms to their cells, if the DB didn't cascade the delete"""
+    organism_ids = select(Organism.id)
+    for link in (_Organism_Cell, _Organism_Input, _Organism_Output, _Organism_Unused_Output_Name):
+        _delete(session, report, link.__table__, link.organism_id.not_in(organism_ids))
+
+
+def _delete_entities(session: Session, report: GCReport, base: type, ids: List):
+    """Delete the rows for ids from base's table and all its subclasses' tables"""
+    tables = [mapper.local_table for mapper in base.__mapper__.self_and_descendants]
+    # Subclass tables have foreign keys to the base table, so they go first
+    for table in reversed(list(dict.fromkeys(tables))):
+        report.bytes_reclaimed += _payload_bytes(session, table, table.c.id.in_(ids))
+        _delete(session, report, table, table.c.id.in_(ids))
+
+
+def _delete(session: Session, report: GCReport, table: Table, where):
+    deleted = session.execute(delete(table).where(where)).rowcount
+    if deleted:
+        report.rows[table.name] = report.rows.get(table.name, 0) + deleted
+
+
+def _payload_bytes(session: Session, table: Table, where) -> int:
+    blobs = [column for column in table.columns if _is_blob(column.type)]
+    if not blobs:
+        return 0
+    size = sum(func.coalesce(func.length(column, type_=Integer), 0) for column in blobs)
+    return session.scalar(select(func.coalesce(func.sum(size, type_=Integer), 0)).where(where))
+
+
+def _is_blob(column_type) -> bool:
+    return isinstance(column_type, (LargeBinary, PickleType)) or isinstance(getattr(column_type, "impl", None),
+                                                                           (LargeBinary, PickleType))
+
+
+def _chunks(ids: List, chunk_size: int):
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start:start + chunk_size]
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import abc
+import hashlib
 import uuid
 from typing import Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, String, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .persistence import EntityBase
@@ -17,6 +18,10 @@ class Gene(EntityBase):
     parent_gene_id: Mapped[Optional[uuid.UUID]] = mapped_column(ForeignKey("gene.id"))
     parent_gene: Mapped[Gene] = relationship("Gene", remote_side=[id])
     type: Mapped[str]
+    # A hash of everything that affects what the gene does (see digest()), so equal genes can share a row
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
+    # How many parent_genes up the lineage goes, 0 for a gene without one
+    generation: Mapped[int] = mapped_column(default=0)
 
     __mapper_args__ = {
         "polymorphic_identity": "gene",
@@ -25,11 +30,31 @@ class Gene(EntityBase):
 
     def __init__(self, parent_gene=None):
         self.parent_gene = parent_gene
+        self.generation = 0 if parent_gene is None else parent_gene.generation + 1
         self.id = uuid.uuid4()
 
     @abc.abstractmethod
     def execute(self, organism: 'Organism'):
         pass
 
+    def digest(self) -> str:
+        """
+        This gene's content_hash, worked out the first time it's asked for. Genes with the same digest
+        do the same thing, whatever their IDs and parents.
+        """
+        if self.content_hash is None:
+            content = hashlib.sha256(type(self).__mapper__.polymorphic_identity.encode())
+            self.hash_content(content)
+            self.content_hash = content.hexdigest()
+        return self.content_hash
+
+    def hash_content(self, content) -> None:
+        """Feed everything that affects what this gene does into content, a hashlib hash"""
+        pass
+
     def __str__(self):
-        return f"G-{str(self.id)[-7:]}"
\ No newline at end of file
+        return f"G-{str(self.id)[-7:]}"
+
+@event.listens_for(Gene, "before_insert", propagate=True)
+def _set_content_hash(mapper, connection, gene: Gene):
+    gene.digest()
@@ -1,7 +1,8 @@
-from .create_neuron import CreateNeuron
+from .create_neuron import CreateNeuron, CreateNeuronDelta
 from .connect_neurons import ConnectNeurons
 from .create_input_cell import CreateInputCell
 from .rotate_cells import RotateCells
 from .composite_gene import CompositeGene
+from .program import GeneProgram
 
-__all__ = ['CreateNeuron', 'ConnectNeurons', 'RotateCells', 'CreateInputCell', 'CompositeGene']
\ No newline at end of file
+__all__ = ['CreateNeuron', 'CreateNeuronDelta', 'ConnectNeurons', 'RotateCells', 'CreateInputCell', 'CompositeGene', 'GeneProgram']
\ No newline at end of file
@@ -26,15 +26,27 @@ class CompositeGene(Gene):
         lazy="select",
     )
 
+    # Not persisted, compiled the first time it's needed. Genes don't change once they're made, so it never goes stale
+    _program = None
+
     def __init__(self, child_genes: List[Gene], iterations: int = 1, parent_gene=None):
         super().__init__(parent_gene)
         self.child_genes = child_genes
         self.iterations = iterations
 
     def execute(self, organism: Organism):
-        for n in range(self.iterations):
-            for gene in self.child_genes:
-                gene.execute(organism)
+        self.program().run(organism)
+
+    def hash_content(self, content) -> None:
+        content.update(str(self.iterations).encode())
+        for gene in self.child_genes:
+            content.update(gene.digest().encode())
+
+    def program(self) -> "GeneProgram":
+        if self._program is None:
+            from .program import GeneProgram
+            self._program = GeneProgram.compile(self)
+        return self._program
 
 
 class _CompositeGene_Child(EntityBase):
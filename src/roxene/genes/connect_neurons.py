@@ -23,7 +23,14 @@ class ConnectNeurons(Gene):
         self.rx_port = rx_input_port
 
     def execute(self, organism: Organism):
-        index: int = self.tx_cell_index % len(organism.cells)
+        ConnectNeurons.apply(organism, self.tx_cell_index, self.rx_port)
+
+    def hash_content(self, content) -> None:
+        content.update(f"{self.tx_cell_index},{self.rx_port}".encode())
+
+    @staticmethod
+    def apply(organism: Organism, tx_cell_index: int, rx_port: int):
+        index: int = tx_cell_index % len(organism.cells)
         tx_cell: Cell = organism.cells[index]
         rx_cell: Neuron = organism.cells[0]
-        rx_cell.add_input_connection(tx_cell, self.rx_port)
+        organism.connect(tx_cell, rx_cell, rx_port)
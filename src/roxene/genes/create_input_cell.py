@@ -20,5 +20,12 @@ class CreateInputCell(Gene):
         self.initial_value = initial_value
 
     def execute(self, organism: Organism):
-        input_cell = InputCell(self.initial_value)
+        CreateInputCell.apply(organism, self.initial_value)
+
+    def hash_content(self, content) -> None:
+        content.update(repr(self.initial_value if self.initial_value is None else float(self.initial_value)).encode())
+
+    @staticmethod
+    def apply(organism: Organism, initial_value):
+        input_cell = InputCell(initial_value)
         organism.cells.insert(0, input_cell)
@@ -1,5 +1,7 @@
 import uuid
+from typing import Dict, Optional, Tuple
 
+import numpy as np
 from numpy import ndarray
 from sqlalchemy import ForeignKey, PickleType
 from sqlalchemy.orm import Mapped, mapped_column
@@ -9,6 +11,12 @@ from ..organism import  Organism
 from ..cells.neuron import Neuron
 
 
+def hash_array(content, name: str, array: ndarray) -> None:
+    array = np.ascontiguousarray(array)
+    content.update(f"{name}:{array.dtype.str}:{array.shape}".encode())
+    content.update(array.tobytes())
+
+
 class CreateNeuron(Gene):
     __tablename__ = "create_neuron"
     __mapper_args__ = {"polymorphic_identity": "create_neuron"}
@@ -44,13 +52,119 @@ class CreateNeuron(Gene):
 
 
     def execute(self, organism: Organism):
-        neuron = Neuron(
-            input=self.input,
-            feedback=self.feedback,
-            output=self.output,
-            input_hidden=self.input_hidden,
-            hidden_feedback=self.hidden_feedback,
-            feedback_hidden=self.feedback_hidden,
-            hidden_output=self.hidden_output
-        )
-        organism.addNeuron(neuron)
+        CreateNeuron.apply(organism, self.state())
+
+    def hash_content(self, content) -> None:
+        for name, array in self.state().items():
+            hash_array(content, name, array)
+
+    def state(self) -> Dict[str, ndarray]:
+        return {
+            "input": self.input,
+            "feedback": self.feedback,
+            "output": self.output,
+            "input_hidden": self.input_hidden,
+            "hidden_feedback": self.hidden_feedback,
+            "feedback_hidden": self.feedback_hidden,
+            "hidden_output": self.hidden_output,
+        }
+
+    @staticmethod
+    def apply(organism: Organism, state: Dict[str, ndarray]):
+        organism.addNeuron(Neuron(**state, dtype=organism.precision.storage))
+
+
+class CreateNeuronDelta(Gene):
+    """
+    A CreateNeuron stored as the values that differ from its parent_gene's, which is a CreateNeuron or
+    another CreateNeuronDelta. deltas maps an array name to the flat indices that changed and their new
+    values, or to (None, the whole array) where most of it changed anyway. Arrays it doesn't mention are
+    the parent's. Use derive() to make one, it falls back to a plain CreateNeuron once the chain gets long.
+    """
+    __tablename__ = "create_neuron_delta"
+    __mapper_args__ = {"polymorphic_identity": "create_neuron_delta"}
+
+    # Past this many deltas in a row, store the whole thing again
+    MAX_DEPTH = 32
+    # Store an array whole once more than this fraction of it changed
+    DENSE_FRACTION = 0.5
+
+    id: Mapped[uuid.UUID] = mapped_column(ForeignKey("gene.id"), primary_key=True)
+    deltas: Mapped[Dict[str, Tuple[Optional[ndarray], ndarray]]] = mapped_column(PickleType)
+    depth: Mapped[int] = mapped_column()
+
+    # Not persisted, the resolved arrays. Genes don't change, so neither do these once they're worked out
+    _state = None
+
+    def __init__(self, parent_gene: Gene, deltas: Dict[str, Tuple[Optional[ndarray], ndarray]], depth: int):
+        super().__init__(parent_gene)
+        self.deltas = deltas
+        self.depth = depth
+
+    @staticmethod
+    def derive(parent_gene: Gene, changes: Dict[str, Tuple[ndarray, ndarray]]) -> Gene:
+        """
+        A gene like parent_gene (a CreateNeuron or CreateNeuronDelta), but with the given flat indices of
+        the named arrays set to new values
+        """
+        depth = parent_gene.depth + 1 if isinstance(parent_gene, CreateNeuronDelta) else 1
+        parent_state = parent_gene.state()
+        if depth > CreateNeuronDelta.MAX_DEPTH:
+            state = CreateNeuronDelta._apply_deltas(parent_state, changes)
+            return CreateNeuron(**state, parent_gene=parent_gene)
+        deltas = {}
+        for name, (indices, values) in changes.items():
+            if len(indices) > CreateNeuronDelta.DENSE_FRACTION * parent_state[name].size:
+                deltas[name] = (None, CreateNeuronDelta._apply_deltas(parent_state, {name: (indices, values)})[name])
+            else:
+                deltas[name] = (indices, values)
+        return CreateNeuronDelta(parent_gene, deltas, depth)
+
+    def execute(self, organism: Organism):
+        CreateNeuron.apply(organism, self.state())
+
+    def hash_content(self, content) -> None:
+        content.update(self.parent_gene.digest().encode())
+        for name in sorted(self.deltas):
+            indices, values = self.deltas[name]
+            if indices is not None:
+                hash_array(content, name + ".indices", indices)
+            hash_array(content, name, values)
+
+    def state(self) -> Dict[str, ndarray]:
+        if self._state is None:
+            # Walk up to the nearest gene that knows its state, then resolve back down, caching along the way
+            chain = []
+            gene = self
+            while isinstance(gene, CreateNeuronDelta) and gene._state is None:
+                chain.append(gene)
+                gene = gene.parent_gene
+            state = gene.state()
+            for delta in reversed(chain):
+                state = CreateNeuronDelta._apply_deltas(state, delta.deltas)
+                delta._state = state
+        return self._state
+
+    @staticmethod
+    def _apply_deltas(state: Dict[str, ndarray], deltas: Dict[str, Tuple[Optional[ndarray], ndarray]]):
+        result = dict(state)
+        for name, (indices, values) in deltas.items():
+            if indices is None:
+                result[name] = values
+            else:
+                array = np.array(state[name])
+                array.flat[indices] = values
+                result[name] = array
+        return result
+
+    input = property(lambda self: self.state()["input"])
+    feedback = property(lambda self: self.state()["feedback"])
+    output = property(lambda self: self.state()["output"])
+    input_hidden = property(lambda self: self.state()["input_hidden"])
+    hidden_feedback = property(lambda self: self.state()["hidden_feedback"])
+    feedback_hidden = property(lambda self: self.state()["feedback_hidden"])
+    hidden_output = property(lambda self: self.state()["hidden_output"])
+
+
+# Everything that makes a Neuron, and has a state()
+NEURON_GENES = (CreateNeuron, CreateNeuronDelta)
@@ -0,0 +1,56 @@
+from typing import Dict, List
+
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session
+
+from ..gene import Gene
+from .composite_gene import CompositeGene
+
+
+def intern_genotype(genotype: Gene, session: Session) -> Gene:
+    """
+    Swap genotype, and any new genes in it, for equal genes (by digest) that are already in the DB or
+    elsewhere in genotype, so equal genes share one row and one object. Genes that are already saved
+    are left alone, along with everything under them. Returns what to use in genotype's place.
+    """
+    new_genes = _new_genes(genotype)
+    if not new_genes:
+        return genotype
+
+    digests = {gene.digest() for gene in new_genes}
+    existing: Dict[str, Gene] = {}
+    for gene in session.scalars(select(Gene).where(Gene.content_hash.in_(digests))):
+        existing.setdefault(gene.content_hash, gene)
+
+    interned: Dict[int, Gene] = {}
+    for gene in new_genes:
+        match = existing.get(gene.digest())
+        if match is None:
+            if isinstance(gene, CompositeGene):
+                children = list(gene.child_genes)
+                interned_children = [interned.get(id(child), child) for child in children]
+                if any(interned_child is not child for interned_child, child in zip(interned_children, children)):
+                    # Same digests, so still the same gene, but nobody's saved it yet so it can still change
+                    gene.child_genes = interned_children
+                    gene._program = None
+            match = existing[gene.digest()] = gene
+        interned[id(gene)] = match
+    return interned[id(genotype)]
+
+
+def _new_genes(genotype: Gene) -> List[Gene]:
+    """Every unsaved gene in genotype, children before their parents, once each"""
+    ordered = []
+    seen = set()
+    stack = [(genotype, False)]
+    while stack:
+        gene, children_done = stack.pop()
+        if id(gene) in seen or inspect(gene).has_identity:
+            continue
+        if children_done or not isinstance(gene, CompositeGene):
+            seen.add(id(gene))
+            ordered.append(gene)
+        else:
+            stack.append((gene, True))
+            stack.extend((child, False) for child in reversed(list(gene.child_genes)))
+    return ordered
@@ -0,0 +1,64 @@
+import uuid
+from typing import Collection, Dict, Optional
+
+from sqlalchemy import CTE, and_, or_, select
+from sqlalchemy.orm import Session, with_polymorphic
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..gene import Gene
+from .composite_gene import CompositeGene, _CompositeGene_Child
+from .create_neuron import CreateNeuronDelta
+
+
+def load_genotype(gene_id: uuid.UUID, session: Session) -> Optional[Gene]:
+    """
+    Load the gene with gene_id and everything under it in one query, rather than a lazy load per gene.
+    Takes in the parents of any CreateNeuronDeltas too, since those need them to work out their state.
+    Walking the result (child_genes, and parent_gene where it was loaded) doesn't go back to the DB.
+    """
+    return load_genotypes([gene_id], session).get(gene_id)
+
+
+def load_genotypes(gene_ids: Collection[uuid.UUID], session: Session) -> Dict[uuid.UUID, Gene]:
+    """Like load_genotype(), for several genotypes at once. Returns every gene loaded, by ID."""
+    genotype = genotype_genes(list(gene_ids))
+
+    any_gene = with_polymorphic(Gene, "*")
+    rows = session.execute(select(any_gene, _CompositeGene_Child)
+                           .where(any_gene.id.in_(select(genotype.c.id)))
+                           .outerjoin(_CompositeGene_Child, _CompositeGene_Child.gene_id == any_gene.id)).all()
+
+    genes: Dict[uuid.UUID, Gene] = {}
+    links: Dict[uuid.UUID, list] = {}
+    for loaded, child_link in rows:
+        genes[loaded.id] = loaded
+        if child_link is not None:
+            links.setdefault(loaded.id, []).append(child_link)
+
+    for loaded in genes.values():
+        if isinstance(loaded, CompositeGene):
+            child_links = sorted(links.get(loaded.id, []), key=lambda child_link: child_link.ordinal)
+            for child_link in child_links:
+                set_committed_value(child_link, "gene", loaded)
+                set_committed_value(child_link, "child", genes[child_link.child_id])
+            set_committed_value(loaded, "_genes_list", child_links)
+        if loaded.parent_gene_id in genes:
+            set_committed_value(loaded, "parent_gene", genes[loaded.parent_gene_id])
+    return genes
+
+
+def genotype_genes(gene_ids, name: str = "genotype") -> CTE:
+    """
+    A recursive CTE of the IDs (and parent_gene_ids and types) of the genes in gene_ids, a list or a select of
+    gene IDs, and every gene under them, including the parents of CreateNeuronDeltas.
+    """
+    genotype = select(Gene.id, Gene.parent_gene_id, Gene.type).where(Gene.id.in_(gene_ids)).cte(name, recursive=True)
+    link = _CompositeGene_Child.__table__
+    gene = Gene.__table__
+    return genotype.union(
+        select(gene.c.id, gene.c.parent_gene_id, gene.c.type)
+        .select_from(genotype)
+        .outerjoin(link, link.c.gene_id == genotype.c.id)
+        .join(gene, or_(gene.c.id == link.c.child_id,
+                        and_(genotype.c.type == CreateNeuronDelta.__mapper__.polymorphic_identity,
+                             gene.c.id == genotype.c.parent_gene_id))))
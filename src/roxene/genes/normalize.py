@@ -0,0 +1,69 @@
+import dataclasses
+from typing import Dict, List
+
+from ..gene import Gene
+from .composite_gene import CompositeGene
+
+
+@dataclasses.dataclass(frozen=True)
+class GenotypeShape:
+    """How deep a genotype's CompositeGenes nest, and how many different genes are in it"""
+    depth: int
+    genes: int
+
+    @staticmethod
+    def of(genotype: Gene) -> "GenotypeShape":
+        depths: Dict = {}
+        stack = [(genotype, False)]
+        while stack:
+            gene, children_done = stack.pop()
+            if gene.id in depths:
+                continue
+            if not isinstance(gene, CompositeGene):
+                depths[gene.id] = 0
+            elif children_done:
+                depths[gene.id] = 1 + max((depths[child.id] for child in gene.child_genes), default=0)
+            else:
+                stack.append((gene, True))
+                stack.extend((child, False) for child in gene.child_genes)
+        return GenotypeShape(depths[genotype.id], len(depths))
+
+
+def normalize_genotype(genotype: Gene) -> Gene:
+    """
+    A genotype that does exactly what genotype does, with less nesting. Composites that run once are spliced
+    into whatever holds them, and ones that never run are dropped. CompositeGeneSplitMutagen piles up another
+    run-once wrapper every time it splits, this gets rid of those but leaves the two halves alone, so they
+    can still be mutated apart.
+
+    New CompositeGenes are only made where something changed, descended from the ones they replace, so
+    unchanged subtrees are shared with genotype. The root's own iterations are left alone.
+    """
+    return _normalize(genotype, {})
+
+
+def _normalize(gene: Gene, normalized: Dict) -> Gene:
+    if not isinstance(gene, CompositeGene):
+        return gene
+    result = normalized.get(gene.id)
+    if result is not None:
+        return result
+
+    children = list(gene.child_genes)
+    flattened: List[Gene] = []
+    for child in children:
+        child = _normalize(child, normalized)
+        if isinstance(child, CompositeGene) and child.iterations == 0:
+            continue
+        if isinstance(child, CompositeGene) and child.iterations == 1:
+            # Already normalized, so there's nothing more to splice in from under this one
+            flattened.extend(child.child_genes)
+        else:
+            flattened.append(child)
+
+    result = gene
+    if len(flattened) != len(children) or any(new is not old for new, old in zip(flattened, children)):
+        result = CompositeGene(flattened, gene.iterations, gene)
+    normalized[gene.id] = result
+    return result
+
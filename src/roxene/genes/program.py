@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from enum import IntEnum
+from typing import List
+
+from ..gene import Gene
+from ..organism import Organism
+from .composite_gene import CompositeGene
+from .connect_neurons import ConnectNeurons
+from .create_input_cell import CreateInputCell
+from .create_neuron import CreateNeuron, NEURON_GENES
+from .rotate_cells import RotateCells
+
+
+class Op(IntEnum):
+    CREATE_NEURON = 1
+    CONNECT = 2
+    ROTATE = 3
+    CREATE_INPUT = 4
+    # Run the next body_length instructions iterations times
+    REPEAT = 5
+    # Anything there's no opcode for, just gets executed
+    EXECUTE = 6
+
+
+_APPLY = {
+    Op.CREATE_NEURON: CreateNeuron.apply,
+    Op.CONNECT: ConnectNeurons.apply,
+    Op.ROTATE: RotateCells.apply,
+    Op.CREATE_INPUT: CreateInputCell.apply,
+    Op.EXECUTE: lambda organism, gene: gene.execute(organism),
+}
+
+
+class GeneProgram(object):
+    """
+    A gene tree flattened into a list of instructions, (Op, *args) tuples. Everything the instructions need
+    is read out of the genes when they're compiled, so running a program doesn't load anything.
+    CompositeGene iterations become REPEAT instructions rather than being unrolled.
+    """
+
+    def __init__(self, instructions: List[tuple]):
+        self.instructions = instructions
+
+    def __len__(self):
+        return len(self.instructions)
+
+    @staticmethod
+    def compile(gene: Gene) -> GeneProgram:
+        instructions = []
+        GeneProgram._emit(gene, instructions)
+        return GeneProgram(instructions)
+
+    @staticmethod
+    def _emit(gene: Gene, instructions: List[tuple]):
+        if isinstance(gene, CompositeGene):
+            if gene._program is not None:
+                body = gene._program.instructions
+            else:
+                body = []
+                for child in gene.child_genes:
+                    GeneProgram._emit(child, body)
+            if gene.iterations == 1:
+                instructions.extend(body)
+            elif gene.iterations > 1 and body:
+                instructions.append((Op.REPEAT, gene.iterations, len(body)))
+                instructions.extend(body)
+        elif isinstance(gene, NEURON_GENES):
+            instructions.append((Op.CREATE_NEURON, gene.state()))
+        elif isinstance(gene, ConnectNeurons):
+            instructions.append((Op.CONNECT, gene.tx_cell_index, gene.rx_port))
+        elif isinstance(gene, RotateCells):
+            instructions.append((Op.ROTATE, gene.direction))
+        elif isinstance(gene, CreateInputCell):
+            instructions.append((Op.CREATE_INPUT, gene.initial_value))
+        else:
+            instructions.append((Op.EXECUTE, gene))
+
+    def run(self, organism: Organism):
+        instructions = self.instructions
+        # [first instruction, end, iterations left] for each REPEAT we're inside of
+        loops = []
+        pc = 0
+        while pc < len(instructions):
+            instruction = instructions[pc]
+            op = instruction[0]
+            if op is Op.REPEAT:
+                loops.append([pc + 1, pc + 1 + instruction[2], instruction[1]])
+                pc += 1
+                continue
+            _APPLY[op](organism, *instruction[1:])
+            pc += 1
+            # Loop back, possibly out of several nested loops that end here
+            while loops and pc == loops[-1][1]:
+                loops[-1][2] -= 1
+                if loops[-1][2] > 0:
+                    pc = loops[-1][0]
+                    break
+                loops.pop()
@@ -24,9 +24,17 @@ class RotateCells(Gene):
         self.direction = direction
 
     def execute(self, organism: Organism):
-        if self.direction is RotateCells.Direction.FORWARD:
+        RotateCells.apply(organism, self.direction)
+
+    def hash_content(self, content) -> None:
+        content.update(str(int(self.direction)).encode())
+
+    @staticmethod
+    def apply(organism: Organism, direction: Direction):
+        # Compare by value, direction is a plain int once it's been loaded from the DB
+        if direction == RotateCells.Direction.FORWARD:
             popped = organism.cells.pop()
             organism.cells.insert(0, popped)
-        elif self.direction is RotateCells.Direction.BACKWARD:
+        elif direction == RotateCells.Direction.BACKWARD:
             popped = organism.cells.pop(0)
             organism.cells.append(popped)
@@ -0,0 +1,64 @@
+import uuid
+from typing import Iterable, List, Optional
+
+from sqlalchemy import Select, literal, select
+from sqlalchemy.orm import Session
+
+from .gene import Gene
+
+
+class Lineage:
+    """
+    Queries up Gene.parent_gene chains, each in a single recursive query rather than a lazy load per hop.
+    Gene.generation (how far down its lineage a gene is) is kept when genes are made, so the chains can
+    be lined up against each other without walking them.
+    """
+
+    @staticmethod
+    def ancestry(gene_ids, name: str = "ancestry", max_distance: Optional[int] = None,
+                 stop_at: Optional[Select] = None) -> Select:
+        """
+        (id, distance) for each of gene_ids (a list or a select of gene IDs), at distance 0, and all their
+        ancestors, or just the ones up to max_distance generations back. If stop_at (a select of gene IDs) is given,
+        each chain ends at the first gene in it.
+        """
+        start = (select(Gene.id.label("id"), Gene.parent_gene_id.label("parent_id"), literal(0).label("distance"))
+                 .where(Gene.id.in_(gene_ids))
+                 .cte(name, recursive=True))
+        parent = select(Gene.id, Gene.parent_gene_id, start.c.distance + 1).join(start, Gene.id == start.c.parent_id)
+        if max_distance is not None:
+            parent = parent.where(start.c.distance < max_distance)
+        if stop_at is not None:
+            parent = parent.where(start.c.id.not_in(stop_at))
+        ancestry = start.union_all(parent)
+        return select(ancestry.c.id, ancestry.c.distance)
+
+    def ancestors(self, gene_id: uuid.UUID, session: Session) -> List[uuid.UUID]:
+        """gene_id's parent, grandparent and so on, nearest first"""
+        ancestry = Lineage.ancestry([gene_id]).subquery()
+        return list(session.scalars(select(ancestry.c.id)
+                                    .where(ancestry.c.distance > 0)
+                                    .order_by(ancestry.c.distance)))
+
+    def load_ancestors(self, genes: Iterable[Gene], session: Session) -> List[Gene]:
+        """
+        Load every ancestor of genes in one go. Walking up parent_gene afterward comes straight out of the
+        session, e.g. for Mutagen.get_mutation_susceptibility, for as long as the returned list is kept
+        (the session only holds onto them weakly).
+        """
+        gene_ids = [gene.id for gene in genes]
+        if not gene_ids:
+            return []
+        ancestry = Lineage.ancestry(gene_ids).subquery()
+        return list(session.scalars(select(Gene)
+                                    .where(Gene.id.in_(select(ancestry.c.id).where(ancestry.c.distance > 0)))))
+
+    def common_ancestor(self, gene_id: uuid.UUID, other_gene_id: uuid.UUID, session: Session) -> Optional[uuid.UUID]:
+        """The most recent gene both are descended from (or are), or None if they're unrelated"""
+        ancestry = Lineage.ancestry([gene_id]).subquery()
+        other_ancestry = Lineage.ancestry([other_gene_id], "other_ancestry").subquery()
+        return session.scalar(select(Gene.id)
+                              .where(Gene.id.in_(select(ancestry.c.id)))
+                              .where(Gene.id.in_(select(other_ancestry.c.id)))
+                              .order_by(Gene.generation.desc())
+                              .limit(1))
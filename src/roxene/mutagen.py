@@ -1,5 +1,5 @@
 import uuid
-from typing import Optional
+from typing import Callable, Collection, Mapping, Optional
 
 from sqlalchemy import ForeignKey
 from sqlalchemy.ext.associationproxy import AssociationProxy, association_proxy
@@ -7,7 +7,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship, attribute_keyed_
 
 from .gene import Gene
 from .genes.composite_gene import CompositeGene
-from .genes.create_neuron import CreateNeuron
+from .genes.create_neuron import CreateNeuron, NEURON_GENES
 from .persistence import EntityBase
 from .util import wiggle
 
@@ -20,7 +20,8 @@ class _Mutagen_Susceptibility(EntityBase):
     susceptibility: Mapped[float]
 
     mutagen: Mapped["Mutagen"] = relationship(back_populates="_susceptibility_records")
-    gene: Mapped[Optional[Gene]] = relationship()
+    # Joined, since the records are keyed by gene. Loading them shouldn't mean loading each gene separately.
+    gene: Mapped[Optional[Gene]] = relationship(lazy="joined")
 
     def __init__(self, gene: Optional[Gene], susceptibility: float):
         self.gene = gene
@@ -40,6 +41,13 @@ class Mutagen(EntityBase):
         "polymorphic_on": "type",
     }
 
+    # Not persisted. The Gene types a subclass's mutate_all() can change, so MutationPipeline only hands it
+    # those. Subclasses that leave it empty get the whole genotype through mutate() instead.
+    affects = ()
+
+    # Not persisted. Set on Mutagens loaded by a MutagenRegistry, which keeps their susceptibilities instead
+    _registry = None
+
     _susceptibility_records: Mapped[dict[Gene, _Mutagen_Susceptibility]] = relationship(
         collection_class=attribute_keyed_dict("gene"),
         cascade="all, delete-orphan",
@@ -58,20 +66,60 @@ class Mutagen(EntityBase):
         self.susceptibility_log_wiggle = susceptibility_log_wiggle
 
     def get_mutation_susceptibility(self, gene: Gene) -> float:
-        if gene is None:
-            return self.base_susceptibility
-        result = self.susceptibilities.get(gene)
-        if result is None:
-            parent_gene = getattr(gene, "parent_gene", None)
-            parent_sus = self.get_mutation_susceptibility(parent_gene)
-            result = wiggle(parent_sus, self.susceptibility_log_wiggle)
-            self.susceptibilities[gene] = result
+        """
+        The susceptibility recorded for gene, or else a wiggle of its parent's, recorded from now on.
+        Walks up the lineage to the nearest recorded ancestor (or past the root, to base_susceptibility)
+        and records one for each gene on the way back down. Use Lineage.load_ancestors() first so the
+        walk doesn't lazy-load every parent. Mutagens from a MutagenRegistry go through it instead, which finds
+        the nearest recorded ancestor with at most one query.
+        """
+        if self._registry is not None:
+            return self._registry.get_mutation_susceptibility(self, gene)
+        susceptibilities = self.susceptibilities
+        return self.inherit_susceptibility(gene, susceptibilities, lambda gene: gene, susceptibilities.__setitem__)
+
+    def inherit_susceptibility(self, gene: Gene, recorded: Mapping, key: Callable, record: Callable,
+                               parent: Callable = lambda gene: getattr(gene, "parent_gene", None)) -> float:
+        """
+        get_mutation_susceptibility() against any store: recorded holds susceptibilities by key(gene), and
+        record(gene, susceptibility) is called for each new one, ancestors first. parent(gene) is the next one up.
+        """
+        unrecorded = []
+        while gene is not None and key(gene) not in recorded:
+            unrecorded.append(gene)
+            gene = parent(gene)
+        result = self.base_susceptibility if gene is None else recorded[key(gene)]
+        for gene in reversed(unrecorded):
+            result = wiggle(result, self.susceptibility_log_wiggle)
+            record(gene, result)
         return result
 
+    def prune_susceptibilities(self, live_genes: Collection[Gene]) -> int:
+        """
+        Forget the susceptibilities recorded for any genes but live_genes (e.g. the ones still in some Organism's
+        genotype), so the records only grow with the population and not with every gene there ever was.
+        Each of live_genes this Mutagen affects gets one recorded first, so genes descended from them later still
+        inherit the same susceptibilities without the forgotten ancestors'. Ones it doesn't affect are never
+        looked up, so get nothing, and lose any they had. Returns how many were forgotten.
+        """
+        affects = type(self).affects
+        live_genes = [gene for gene in live_genes if not affects or isinstance(gene, affects)]
+        if self._registry is not None:
+            return self._registry.prune_susceptibilities(self, live_genes)
+        live_ids = set()
+        for gene in live_genes:
+            self.get_mutation_susceptibility(gene)
+            live_ids.add(gene.id)
+        records = self._susceptibility_records
+        dead = [gene for gene in records if gene is None or gene.id not in live_ids]
+        for gene in dead:
+            del records[gene]
+        return len(dead)
+
     def mutate(self, gene: Gene) -> Gene:
         if isinstance(gene, CompositeGene):
             return self.mutate_CompositeGene(gene)
-        elif isinstance(gene, CreateNeuron):
+        elif isinstance(gene, NEURON_GENES):
             return self.mutate_CreateNeuron(gene)
         else:
             return gene
@@ -1,4 +1,6 @@
 from .create_neuron_mutagen import CreateNeuronMutagen, CNLayer
 from .composite_gene_split_mutagen import CompositeGeneSplitMutagen
+from .pipeline import MutationPipeline
+from .registry import MutagenRegistry
 
-__all__ = ['CreateNeuronMutagen', 'CNLayer', 'CompositeGeneSplitMutagen']
+__all__ = ['CreateNeuronMutagen', 'CNLayer', 'CompositeGeneSplitMutagen', 'MutationPipeline', 'MutagenRegistry']
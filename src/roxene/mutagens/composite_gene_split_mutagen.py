@@ -1,4 +1,5 @@
 import uuid
+from typing import List
 
 from sqlalchemy import ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column
@@ -14,18 +15,37 @@ class CompositeGeneSplitMutagen(Mutagen):
 
     id: Mapped[uuid.UUID] = mapped_column(ForeignKey("mutagen.id"), primary_key=True)
 
+    affects = (CompositeGene,)
+
     def __init__(self, base_susceptibility: float = 0.01, susceptibility_log_wiggle: float = 0.01):
         super().__init__(base_susceptibility, susceptibility_log_wiggle)
 
     def mutate_CompositeGene(self, parent_gene: CompositeGene) -> CompositeGene:
-        if parent_gene.iterations < 2:
+        split = self.split(parent_gene)
+        if split is parent_gene:
+            # No mutation, just recursively mutate child genes
             return super().mutate_CompositeGene(parent_gene)
+        return split
+
+    @classmethod
+    def mutate_all(cls, gene: CompositeGene, mutagens: List["CompositeGeneSplitMutagen"],
+                   original: CompositeGene = None) -> CompositeGene:
+        for mutagen in mutagens:
+            gene = mutagen.split(gene, original)
+        return gene
+
+    def split(self, parent_gene: CompositeGene, original: CompositeGene = None) -> CompositeGene:
+        """
+        Maybe split parent_gene's iterations in two, leaving its children alone. Returns parent_gene if not.
+        The susceptibility is original's, if parent_gene's just been made from it.
+        """
+        if parent_gene.iterations < 2:
+            return parent_gene
 
         # Check if this gene should be mutated based on susceptibility
-        susceptibility = self.get_mutation_susceptibility(parent_gene)
+        susceptibility = self.get_mutation_susceptibility(parent_gene if original is None else original)
         if get_rng().random() >= susceptibility:
-            # No mutation, just recursively mutate child genes
-            return super().mutate_CompositeGene(parent_gene)
+            return parent_gene
 
         # Split the iterations randomly, ensuring both parts get at least 1 iteration
         # For iterations=N, we want first_iterations in range [1, N-1] so second_iterations is also ≥ 1
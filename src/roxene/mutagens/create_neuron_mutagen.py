@@ -1,15 +1,16 @@
 import uuid
 from enum import Enum, auto
+from typing import Dict, List, Tuple
 
 import numpy as np
 from numpy import ndarray
 from sqlalchemy import Enum as SQLEnum, ForeignKey
 from sqlalchemy.orm import Mapped, mapped_column
 
-from ..constants import NP_PRECISION
-from ..genes.create_neuron import CreateNeuron
+from ..gene import Gene
+from ..genes.create_neuron import CreateNeuron, CreateNeuronDelta, NEURON_GENES
 from ..mutagen import Mutagen
-from ..util import wiggle, get_rng
+from ..util import get_rng
 
 
 class CNLayer(Enum):
@@ -21,6 +22,17 @@ class CNLayer(Enum):
     feedback_hidden = auto()
     hidden_output = auto()
 
+LAYER_FIELDS = {
+    CNLayer.input_initial_value: "input",
+    CNLayer.feedback_initial_value: "feedback",
+    CNLayer.output_initial_value: "output",
+    CNLayer.input_hidden: "input_hidden",
+    CNLayer.hidden_feedback: "hidden_feedback",
+    CNLayer.feedback_hidden: "feedback_hidden",
+    CNLayer.hidden_output: "hidden_output",
+}
+
+
 class CreateNeuronMutagen(Mutagen):
     __tablename__ = "create_neuron_mutagen"
     __mapper_args__ = {"polymorphic_identity": "create_neuron_mutagen"}
@@ -28,6 +40,8 @@ class CreateNeuronMutagen(Mutagen):
     id: Mapped[uuid.UUID] = mapped_column(ForeignKey("mutagen.id"), primary_key=True)
     layer_to_mutate: Mapped[CNLayer] = mapped_column(SQLEnum(CNLayer))
 
+    affects = NEURON_GENES
+
     def __init__(self,
                  layer_to_mutate: CNLayer,
                  base_susceptibility: float = 0.001,
@@ -35,36 +49,65 @@ class CreateNeuronMutagen(Mutagen):
         super().__init__(base_susceptibility, susceptibility_log_wiggle)
         self.layer_to_mutate = layer_to_mutate
 
-    def mutate_CreateNeuron(self, gene: CreateNeuron) -> CreateNeuron:
-        susceptibility = self.get_mutation_susceptibility(gene)
-        return CreateNeuron(
-            input=gene.input if self.layer_to_mutate is not CNLayer.input_initial_value
-            else self.maybe_wiggle(gene.input, susceptibility).astype(NP_PRECISION),
-            feedback=gene.feedback if self.layer_to_mutate is not CNLayer.feedback_initial_value
-            else self.maybe_wiggle(gene.feedback, susceptibility).astype(NP_PRECISION),
-            output=gene.output if self.layer_to_mutate is not CNLayer.output_initial_value
-            else self.maybe_wiggle(gene.output, susceptibility).astype(NP_PRECISION),
-            input_hidden=gene.input_hidden if self.layer_to_mutate is not CNLayer.input_hidden
-            else self.maybe_wiggle(gene.input_hidden, susceptibility).astype(NP_PRECISION),
-            hidden_feedback=gene.hidden_feedback if self.layer_to_mutate is not CNLayer.hidden_feedback
-            else self.maybe_wiggle(gene.hidden_feedback, susceptibility).astype(NP_PRECISION),
-            feedback_hidden=gene.feedback_hidden if self.layer_to_mutate is not CNLayer.feedback_hidden
-            else self.maybe_wiggle(gene.feedback_hidden, susceptibility).astype(NP_PRECISION),
-            hidden_output=gene.hidden_output if self.layer_to_mutate is not CNLayer.hidden_output
-            else self.maybe_wiggle(gene.hidden_output, susceptibility).astype(NP_PRECISION),
-            parent_gene=gene
-        )
+    def mutate_CreateNeuron(self, gene: CreateNeuron) -> Gene:
+        return CreateNeuronMutagen.mutate_all(gene, [self])
+
+    @classmethod
+    def mutate_all(cls, gene: Gene, mutagens: List["CreateNeuronMutagen"], original: Gene = None) -> Gene:
+        """
+        Apply all the mutagens to gene (a CreateNeuron or CreateNeuronDelta) at once. Susceptibilities are all
+        looked up on gene itself (or original, if gene's just been made from it), and a single new gene comes
+        out, holding just what changed, or gene itself if nothing did.
+        """
+        by_layer: Dict[CNLayer, List[CreateNeuronMutagen]] = {}
+        for mutagen in mutagens:
+            by_layer.setdefault(mutagen.layer_to_mutate, []).append(mutagen)
+
+        state = gene.state()
+        changes = {}
+        for layer, layer_mutagens in by_layer.items():
+            field = LAYER_FIELDS[layer]
+            susceptibilities = [mutagen.get_mutation_susceptibility(gene if original is None else original)
+                                for mutagen in layer_mutagens]
+            indices, values = CreateNeuronMutagen.wiggle_layer(state[field], susceptibilities)
+            if len(indices):
+                changes[field] = (indices, values)
+        if not changes:
+            return gene
+        return CreateNeuronDelta.derive(gene, changes)
 
     def maybe_wiggle(self, x: ndarray, susceptibility: float) -> ndarray:
         '''
         Use the susceptibility to derive the probability of mutating any given value in the mutated layer,
-        and the log and absolute wiggles to use when mutating
+        and the log and absolute wiggles to use when mutating.
+        The result keeps x's dtype, so genes stay in whatever storage precision they started in.
         '''
-        wiggle_probability = susceptibility
-        log_wiggle = susceptibility * 25
-        absolute_wiggle = susceptibility
-        return np.where(
-            get_rng().random(x.shape) < wiggle_probability,
-            x,
-            wiggle(x, log_wiggle, absolute_wiggle))
+        indices, values = CreateNeuronMutagen.wiggle_layer(x, [susceptibility])
+        result = np.array(x)
+        result.flat[indices] = values
+        return result
 
+    @staticmethod
+    def wiggle_layer(x: ndarray, susceptibilities: List[float]) -> Tuple[ndarray, ndarray]:
+        """
+        maybe_wiggle() x once per susceptibility, in order, and return the flat indices that changed and their
+        new values. Picks how many values and which ones get wiggled up front, and only draws for those.
+        """
+        rng = get_rng()
+        original = np.asarray(x).reshape(-1)
+        result = original.copy()
+        wiggled = []
+        for susceptibility in susceptibilities:
+            # A value's kept when its draw comes in under the susceptibility
+            count = rng.binomial(result.size, min(max(1 - susceptibility, 0), 1))
+            indices = rng.choice(result.size, count, replace=False)
+            values = result[indices].astype(np.float64)
+            with np.errstate(divide="ignore"):
+                values = np.sign(values) * np.exp(np.log(np.abs(values)) + rng.standard_normal(count) * susceptibility * 25)
+            result[indices] = values + rng.standard_normal(count) * susceptibility
+            wiggled.append(indices)
+        if not wiggled:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=x.dtype)
+        indices = np.unique(np.concatenate(wiggled))
+        indices = indices[result[indices] != original[indices]].astype(np.int32)
+        return indices, result[indices]
@@ -0,0 +1,52 @@
+from typing import Dict, List, Tuple
+
+from ..gene import Gene
+from ..genes.composite_gene import CompositeGene
+from ..mutagen import Mutagen
+
+
+class MutationPipeline(object):
+    """
+    Applies a whole set of Mutagens to a genotype in one walk of the gene tree, instead of one walk per Mutagen.
+
+    The Mutagens are grouped by type up front, and each group is only handed the genes its type affects,
+    all at once, so it can batch its work. New genes are only made where something actually changed,
+    so a mutant shares every unchanged subtree with the original. A gene that turns up in several places
+    in the tree is mutated separately in each, like mutate() does, so e.g. the halves of a split can
+    drift apart.
+
+    Children are mutated before their parents, and a gene's Mutagens are applied by type rather than in
+    the order they were given. Mutagens that don't declare what they affect get the result afterward,
+    one at a time, through mutate().
+    """
+
+    def __init__(self, mutagens: List[Mutagen]):
+        self._routes: Dict[type, List[Tuple[type, List[Mutagen]]]] = {}
+        self._unrouted: List[Mutagen] = []
+        by_type: Dict[type, List[Mutagen]] = {}
+        for mutagen in mutagens:
+            if type(mutagen).affects:
+                by_type.setdefault(type(mutagen), []).append(mutagen)
+            else:
+                self._unrouted.append(mutagen)
+        for mutagen_type, typed_mutagens in by_type.items():
+            for gene_type in mutagen_type.affects:
+                self._routes.setdefault(gene_type, []).append((mutagen_type, typed_mutagens))
+
+    def mutate(self, genotype: Gene) -> Gene:
+        mutant = self._mutate(genotype)
+        for mutagen in self._unrouted:
+            mutant = mutagen.mutate(mutant)
+        return mutant
+
+    def _mutate(self, gene: Gene) -> Gene:
+        mutant = gene
+        if isinstance(gene, CompositeGene):
+            children = list(gene.child_genes)
+            mutant_children = [self._mutate(child) for child in children]
+            if any(mutant_child is not child for mutant_child, child in zip(mutant_children, children)):
+                mutant = CompositeGene(mutant_children, gene.iterations, gene)
+        # Susceptibilities are looked up on gene, the new composite hasn't got any of its own yet
+        for mutagen_type, mutagens in self._routes.get(type(mutant), ()):
+            mutant = mutagen_type.mutate_all(mutant, mutagens, gene)
+        return mutant
@@ -0,0 +1,177 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, inspect, select
+from sqlalchemy.orm import sessionmaker, with_polymorphic
+
+from ..gene import Gene
+from ..lineage import Lineage
+from ..mutagen import Mutagen, _Mutagen_Susceptibility
+
+logger = logging.getLogger(__name__)
+
+
+class MutagenRegistry(object):
+    """
+    Keeps every Mutagen, and all their susceptibilities, in memory for the life of the process, so breeding
+    doesn't read them all back from the DB for every offspring. Mutagens handed out by mutagens() look their
+    susceptibilities up here, by gene ID, and the new ones are written back in batches on a background thread.
+    A gene with none recorded yet inherits from its nearest ancestor with one, found by following whatever
+    parents are already in memory, and then with one query for the rest of the way.
+
+    Pass background=False to write from whichever thread fills a batch instead, e.g. when each thread gets
+    its own DB connection. Safe to share between threads. Anything that changes the mutagens or their
+    susceptibilities in the DB directly should call reload() afterward.
+    """
+
+    def __init__(self, sessionmaker: sessionmaker, batch_size: int = 1000, background: bool = True):
+        self.sessionmaker = sessionmaker
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._mutagens: Optional[List[Mutagen]] = None
+        self._susceptibilities: Dict[uuid.UUID, Dict[uuid.UUID, float]] = {}
+        self._pending: List[dict] = []
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="MutagenRegistry") if background else None
+        # Every background write that hasn't been flushed yet, or that failed
+        self._writes: List[Future] = []
+
+    def mutagens(self) -> List[Mutagen]:
+        """All the Mutagens, detached from any session, loaded the first time they're asked for"""
+        with self._lock:
+            if self._mutagens is None:
+                self._load()
+            return self._mutagens
+
+    def _load(self):
+        with self.sessionmaker(expire_on_commit=False) as session:
+            mutagens = session.scalars(select(with_polymorphic(Mutagen, "*"))).all()
+            susceptibilities = {mutagen.id: {} for mutagen in mutagens}
+            for mutagen_id, gene_id, susceptibility in session.execute(
+                    select(_Mutagen_Susceptibility.mutagen_id,
+                           _Mutagen_Susceptibility.gene_id,
+                           _Mutagen_Susceptibility.susceptibility)):
+                susceptibilities[mutagen_id][gene_id] = susceptibility
+        for mutagen in mutagens:
+            mutagen._registry = self
+        self._mutagens = list(mutagens)
+        self._susceptibilities = susceptibilities
+        logger.info(f"Loaded {len(mutagens)} mutagens")
+
+    def get_mutation_susceptibility(self, mutagen: Mutagen, gene: Gene) -> float:
+        with self._lock:
+            recorded = self._susceptibilities.setdefault(mutagen.id, {})
+            if gene.id in recorded:
+                return recorded[gene.id]
+        # Without the lock, it might have to ask the DB
+        parents = self._parents(mutagen, gene, recorded)
+        with self._lock:
+            recorded = self._susceptibilities.setdefault(mutagen.id, {})
+
+            def record(gene_id: uuid.UUID, susceptibility: float):
+                recorded[gene_id] = susceptibility
+                self._pending.append({"mutagen_id": mutagen.id, "gene_id": gene_id, "susceptibility": susceptibility})
+
+            result = mutagen.inherit_susceptibility(gene.id, recorded, lambda gene_id: gene_id, record, parents.get)
+            if len(self._pending) >= self.batch_size:
+                self._write_pending()
+            return result
+
+    def _parents(self, mutagen: Mutagen, gene: Gene,
+                 recorded: Dict[uuid.UUID, float]) -> Dict[uuid.UUID, Optional[uuid.UUID]]:
+        """The parent ID of gene and each of its ancestors, up to the nearest one with a recorded susceptibility"""
+        parents = {}
+        while gene is not None and gene.id not in recorded:
+            state = inspect(gene)
+            if not state.has_identity or "parent_gene" not in state.unloaded:
+                parent = gene.parent_gene
+            elif gene.parent_gene_id is None:
+                parent = None
+            else:
+                key = inspect(Gene).identity_key_from_primary_key([gene.parent_gene_id])
+                parent = state.session.identity_map.get(key) if state.session is not None else None
+                if parent is None:
+                    # Not in memory, so get the rest of the way in one go
+                    parents.update(self._query_parents(mutagen, gene, state.session))
+                    return parents
+            parents[gene.id] = parent.id if parent is not None else None
+            gene = parent
+        return parents
+
+    def _query_parents(self, mutagen: Mutagen, gene: Gene, session) -> Dict[uuid.UUID, Optional[uuid.UUID]]:
+        recorded_genes = (select(_Mutagen_Susceptibility.gene_id)
+                          .where(_Mutagen_Susceptibility.mutagen_id == mutagen.id))
+        ancestry = Lineage.ancestry([gene.id], stop_at=recorded_genes).subquery()
+        query = select(ancestry.c.id).order_by(ancestry.c.distance)
+        if session is None:
+            with self.sessionmaker() as session:
+                gene_ids = session.scalars(query).all()
+        else:
+            gene_ids = session.scalars(query).all()
+        # The last one's recorded, or else has no parent
+        return dict(zip(gene_ids, list(gene_ids[1:]) + [None]))
+
+    def prune_susceptibilities(self, mutagen: Mutagen, live_genes: List[Gene]) -> int:
+        """Mutagen.prune_susceptibilities() for one of this registry's Mutagens, here and in the DB"""
+        live_ids = set()
+        for gene in live_genes:
+            self.get_mutation_susceptibility(mutagen, gene)
+            live_ids.add(gene.id)
+        with self._lock:
+            recorded = self._susceptibilities.setdefault(mutagen.id, {})
+            dead = [gene_id for gene_id in recorded if gene_id not in live_ids]
+            for gene_id in dead:
+                del recorded[gene_id]
+            self._pending = [row for row in self._pending
+                             if row["mutagen_id"] != mutagen.id or row["gene_id"] in live_ids]
+        self.flush()
+        with self.sessionmaker.begin() as session:
+            for start in range(0, len(dead), self.batch_size):
+                session.execute(delete(_Mutagen_Susceptibility)
+                                .where(_Mutagen_Susceptibility.mutagen_id == mutagen.id,
+                                       _Mutagen_Susceptibility.gene_id.in_(dead[start:start + self.batch_size])))
+        return len(dead)
+
+    def _write_pending(self):
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        if self._writer is None:
+            self._write(batch)
+        else:
+            # Let go of the ones that already went through, hang onto any failures until flush() raises them
+            self._writes = [write for write in self._writes if not write.done() or write.exception() is not None]
+            self._writes.append(self._writer.submit(self._write, batch))
+
+    def _write(self, batch: List[dict]):
+        with self.sessionmaker.begin() as session:
+            session.execute(insert(_Mutagen_Susceptibility), batch)
+        logger.debug(f"Wrote {len(batch)} mutagen susceptibilities")
+
+    def flush(self):
+        """
+        Write all the new susceptibilities now, and wait for them to be saved. Raises the first error any
+        background write has hit since the last flush, after logging all of them.
+        """
+        with self._lock:
+            self._write_pending()
+            writes, self._writes = self._writes, []
+        errors = [error for error in (write.exception() for write in writes) if error is not None]
+        for error in errors:
+            logger.error("Failed to write mutagen susceptibilities", exc_info=error)
+        if errors:
+            raise errors[0]
+
+    def reload(self):
+        """Save what's new, and load everything from the DB again the next time it's needed"""
+        with self._lock:
+            self.flush()
+            self._mutagens = None
+            self._susceptibilities = {}
+
+    def close(self):
+        self.flush()
+        if self._writer is not None:
+            self._writer.shutdown()
@@ -1,19 +1,27 @@
 from __future__ import annotations
 
 import uuid
-from typing import Dict, List, Optional
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
 
+import numpy as np
 from sqlalchemy import ForeignKey, Integer, String
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.orderinglist import ordering_list
 from sqlalchemy.orm import Mapped, mapped_column, relationship, attribute_keyed_dict
 
 from .constants import NP_PRECISION
+from .builder import OrganismBuilder
+from .convergence import ConvergenceMonitor
+from .expression import ExpressionCache
 from .cell import Cell
 from .cells.input_cell import InputCell
 from .cells.neuron import Neuron
 from .gene import Gene
 from .persistence import EntityBase
+from .phenotype import Phenotype
+from .precision import Precision, DEFAULT_PRECISION
+from .wiring import Wiring
 
 
 class _Organism_Input(EntityBase):
@@ -89,6 +97,8 @@ class Organism(EntityBase):
                                                                attr="name", creator=_Organism_Unused_Output_Name)
 
     genotype_id: Mapped[Optional[uuid.UUID]] = mapped_column(ForeignKey("gene.id"))
+    # Where in its Population's index it is, so the index can be rebuilt in the same order
+    slot: Mapped[Optional[int]] = mapped_column(index=True)
 
     _inputs_map: Mapped[Dict[str, _Organism_Input]] = relationship(
         back_populates="organism",
@@ -120,35 +130,161 @@ class Organism(EntityBase):
         lazy="joined",
     )
 
-    def __init__(self, input_names={}, output_names={}, genotype: Gene = None):
+    # Neither of these are persisted, they're rebuilt from the cells when needed
+    _wiring = None
+    _phenotype = None
+    # Not persisted either, set it on a loaded Organism before updating it to use something else
+    precision = DEFAULT_PRECISION
+    _simulating = False
+
+    def __init__(self, input_names={}, output_names={}, genotype: Gene = None, precision: Precision = None,
+                 expressions: ExpressionCache = None):
         self.id = uuid.uuid4()
+        if precision is not None:
+            self.precision = precision
         for name in input_names:
             self.inputs[name] = InputCell()
         self.unused_output_names.extend(output_names)
         self.cells.extend(self.inputs.values())
         self.genotype = genotype
         if genotype:
-            genotype.execute(self)
+            if expressions is not None:
+                expressions.express(genotype, self)
+            else:
+                self.express(genotype)
+            self.rewire()
+
+    def express(self, genotype: Gene):
+        """Run genotype against this (freshly constructed) Organism, saving the ORM bookkeeping for the end"""
+        builder = OrganismBuilder(self)
+        genotype.execute(builder)
+        builder.materialize()
 
     def set_input(self, input_label, input_value):
         input_cell: InputCell = self.inputs[input_label]
         input_cell.set_output(input_value)
+        if self._wiring is not None:
+            self._wiring.set_output(input_cell, input_value)
+        if self._phenotype is not None:
+            self._phenotype.set_input(input_label, input_value)
 
     # TODO: Make output a @property, and maybe input and cells
     def get_output(self, output_label) -> NP_PRECISION:
+        if self._phenotype is not None:
+            return self._phenotype.get_output(output_label)
         return self.outputs[output_label].get_output()
 
-    def update(self):
-        for cell in self.cells:
+    def get_state(self) -> np.ndarray:
+        """
+        A flat copy of everything an update carries over to the next one: every cell's output and every
+        Neuron's feedback. With the inputs held still, the same state always leads to the same next one.
+        """
+        if self._phenotype is not None:
+            return self._phenotype.get_state()
+        wiring = self.wiring
+        to_numpy = wiring.backend.to_numpy
+        state = []
+        for cell in wiring.cells:
             if isinstance(cell, Neuron):
-                cell.update()
+                state.append(to_numpy(cell.output.tensor).astype(np.float64))
+            else:
+                state.append(np.array([cell.get_output() or 0], dtype=np.float64))
+        for nw in wiring.neurons:
+            state.append(to_numpy(nw.neuron.feedback.tensor).astype(np.float64))
+        return np.concatenate(state)
+
+    def update(self):
+        if self._phenotype is not None:
+            self._phenotype.update()
+            return
+        self.wiring.update()
+
+    def run_until(self, output_label: str, predicate: Callable, max_steps: int,
+                  monitor: ConvergenceMonitor = None) -> int:
+        """
+        Update until predicate is true of the output (it gets applied to an array of output values, so stick
+        to comparisons), the monitor says we've converged, or max_steps updates have run.
+        Returns how many updates ran, and leaves the Organism in the same state as that many update() calls.
+        """
+        if self._phenotype is not None:
+            return self._phenotype.run_until(output_label, predicate, max_steps, monitor)
+        wiring = self.wiring
+        output = self.outputs[output_label].output
+        for step in range(1, max_steps + 1):
+            wiring.update()
+            if predicate(output.tensor[0:1]).any():
+                return step
+            if monitor is not None and monitor.observe(self.get_state()):
+                return step
+        return max_steps
+
+    @property
+    def wiring(self) -> Wiring:
+        if self._wiring is None:
+            self.rewire()
+        return self._wiring
+
+    def rewire(self) -> Wiring:
+        """Re-index the cells and their connections. Needed after editing them other than through addNeuron"""
+        self._wiring = Wiring(self.cells, self.precision)
+        return self._wiring
+
+    def compile(self) -> Phenotype:
+        """
+        Stack this Organism's Neurons into a Phenotype, and route update() and the I/O methods through it
+        until decompile() is called. The Neurons themselves go stale in the meantime, use write_back() to
+        catch them up. The Phenotype computes in this Organism's compute precision.
+        """
+        self._phenotype = Phenotype(self.wiring, self.inputs, self.outputs)
+        return self._phenotype
+
+    @property
+    def phenotype(self) -> Optional[Phenotype]:
+        return self._phenotype
+
+    def write_back(self):
+        if self._phenotype is not None:
+            self._phenotype.write_back()
+
+    def decompile(self):
+        self.write_back()
+        self._phenotype = None
+        self._wiring = None
+
+    @contextmanager
+    def simulation(self):
+        """
+        Run this Organism without SQLAlchemy change tracking on every write to every Neuron, for when
+        nothing's going to be saved until it's done, e.g. for the length of a Trial.
+        Each Neuron gets marked as changed exactly once on the way out, for the parts of its state that changed.
+        """
+        if self._simulating:
+            yield self
+            return
+        neurons = [cell for cell in self.cells if isinstance(cell, Neuron)]
+        snapshots = [neuron.snapshot() for neuron in neurons]
+        self._simulating = True
+        for neuron in neurons:
+            neuron._tracking = False
+        try:
+            yield self
+        finally:
+            self._simulating = False
+            for neuron, snapshot in zip(neurons, snapshots):
+                neuron._tracking = True
+                neuron.mark_changed(snapshot)
 
     def addNeuron(self, neuron: Neuron):
+        self._wiring = None
         self.cells.insert(0, neuron)
         if self.unused_output_names:
             new_output_name = self.unused_output_names.pop()
             self.outputs[new_output_name] = neuron
 
+    def connect(self, tx_cell: Cell, rx_cell: Neuron, req_port: int):
+        self._wiring = None
+        rx_cell.add_input_connection(tx_cell, req_port)
+
     def __str__(self):
         return f"O-{str(self.id)[-7:]}"
 
@@ -7,16 +7,19 @@ from sqlalchemy import PickleType
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.ext.mutable import Mutable
 
+from .backend import get_backend, backend_for
+
 
 class EntityBase(DeclarativeBase):
     pass
 
 
 class TrackedTensor(Mutable):
+    """A torch Tensor or NumPy array, depending on the backend, that tells SQLAlchemy when it's changed"""
 
-    tensor: torch.Tensor
+    tensor: torch.Tensor | np.ndarray
 
-    def __init__(self, tensor: torch.Tensor):
+    def __init__(self, tensor: torch.Tensor | np.ndarray):
         super(Mutable, self).__init__()
         self.tensor = tensor
 
@@ -24,7 +27,7 @@ class TrackedTensor(Mutable):
     def coerce(cls, key, value):
         if isinstance(value, TrackedTensor):
             return value
-        if isinstance(value, torch.Tensor):
+        if isinstance(value, (torch.Tensor, np.ndarray)):
             return TrackedTensor(value)
         return Mutable.coerce(key, value)
 
@@ -36,16 +39,18 @@ class TrackedTensor(Mutable):
 
     def __setitem__(self, key, value):
         # Convert numpy values to tensors if needed
-        if isinstance(value, (np.ndarray, np.generic)):
+        if isinstance(self.tensor, torch.Tensor) and isinstance(value, (np.ndarray, np.generic)):
             value = torch.tensor(value, dtype=self.tensor.dtype)
         self.tensor[key] = value
         self.changed()
 
     def copy_(self, src):
         """Override copy_ to automatically track changes"""
-        result = self.tensor.copy_(src)
+        if isinstance(src, TrackedTensor):
+            src = src.tensor
+        backend_for(self.tensor).copy_(self.tensor, src)
         self.changed()
-        return result
+        return self.tensor
 
     @classmethod
     def __torch_function__(cls, func, types, args=(), kwargs=None):
@@ -64,8 +69,10 @@ class TrackedTensor(Mutable):
         return func(*args, **kwargs)
 
     def __eq__(self, other):
-        if isinstance(other, torch.Tensor):
+        if isinstance(other, torch.Tensor) and isinstance(self.tensor, torch.Tensor):
             return torch.equal(self.tensor, other)
+        if isinstance(other, np.ndarray):
+            return np.array_equal(backend_for(self.tensor).to_numpy(self.tensor), other)
         return super(Mutable, self).__eq__(other)
     
     @property
@@ -78,8 +85,14 @@ class WrappedTensor(sqlalchemy.types.TypeDecorator):
     impl = PickleType
     cache_ok = True
 
-    def process_bind_param(self, value: TrackedTensor, dialect) -> torch.Tensor:
+    def process_bind_param(self, value: TrackedTensor, dialect) -> torch.Tensor | np.ndarray:
         return value.tensor
 
-    def process_result_value(self, value: torch.Tensor, dialect):
-        return TrackedTensor(value) if value is not None else None
+    def process_result_value(self, value: torch.Tensor | np.ndarray, dialect):
+        # Rows can have been pickled by either backend, load them into whichever one we're using now
+        if value is None:
+            return None
+        backend = get_backend()
+        if not backend.is_array(value):
+            value = backend.array(value)
+        return TrackedTensor(value)
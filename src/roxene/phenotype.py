@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from .backend import Backend
+from .cells.input_cell import InputCell
+from .cells.neuron import Neuron
+from .constants import NP_PRECISION
+from .convergence import ConvergenceMonitor
+from .wiring import Wiring, NeuronWiring
+
+
+class _Bucket(object):
+    """
+    A stack of same-shaped Neurons that all update in the same level of a tick.
+
+    Row r of every tensor here belongs to neurons[r].
+    """
+
+    TENSORS = ['input', 'feedback', 'output', 'hidden_weights', 'hidden_feedback', 'hidden_output']
+
+    def __init__(self, backend: Backend, level: int, shape: Tuple, neurons: List[Neuron], slots,
+                 gather: Tuple, tensors: Dict):
+        self.backend = backend
+        self.level = level
+        self.shape = shape
+        self.neurons = neurons
+        self.slots = slots
+        # (row, port, source slot) for every bound input port
+        self.gather_rows, self.gather_ports, self.gather_sources = gather
+        for name in _Bucket.TENSORS:
+            setattr(self, name, tensors[name])
+
+    @classmethod
+    def from_neurons(cls, backend: Backend, level: int, shape: Tuple, neurons: List[Neuron], slots: List[int],
+                     gather: List[Tuple[int, int, int]], dtype) -> '_Bucket':
+        def stack(arrays):
+            return backend.astype(backend.stack(arrays), dtype)
+
+        tensors = {
+            'input': stack([n.input.tensor for n in neurons]),
+            'feedback': stack([n.feedback.tensor for n in neurons]),
+            'output': stack([n.output.tensor for n in neurons]),
+            # input_hidden and feedback_hidden are always used together, so stick them together once here
+            'hidden_weights': stack([backend.cat([n.input_hidden.tensor, n.feedback_hidden.tensor]) for n in neurons]),
+            'hidden_feedback': stack([n.hidden_feedback.tensor for n in neurons]),
+            'hidden_output': stack([n.hidden_output.tensor for n in neurons]),
+        }
+        gather_index = tuple(backend.index([g[i] for g in gather]) for i in range(3))
+        return cls(backend, level, shape, neurons, backend.index(slots), gather_index, tensors)
+
+    def load_inputs(self, outputs, rows=None):
+        rows_ix, ports, sources = self.gather_rows, self.gather_ports, self.gather_sources
+        if rows is not None:
+            keep = rows[rows_ix]
+            rows_ix, ports, sources = rows_ix[keep], ports[keep], sources[keep]
+        if len(sources):
+            self.input[rows_ix, ports] = outputs[sources]
+
+    def update(self, rows=None):
+        """Update every row, or only the rows where the boolean mask rows is set"""
+        backend = self.backend
+        hidden_in = backend.cat([self.input, self.feedback], axis=1)[:, None, :]
+        hidden = backend.tanh(backend.matmul(hidden_in, self.hidden_weights))
+        feedback = backend.tanh(backend.matmul(hidden, self.hidden_feedback))[:, 0, :]
+        output = backend.tanh(backend.matmul(hidden, self.hidden_output))[:, 0, :]
+        if rows is not None:
+            feedback = backend.where(rows[:, None], feedback, self.feedback)
+            output = backend.where(rows[:, None], output, self.output)
+        backend.copy_(self.feedback, feedback)
+        backend.copy_(self.output, output)
+
+    def store_outputs(self, outputs):
+        outputs[self.slots] = self.output[:, 0]
+
+
+# Longest run of ticks run_until does before checking the output (or a ConvergenceMonitor)
+MAX_CHUNK = 64
+
+
+class Phenotype(object):
+    """
+    A compiled, tensor-only copy of an Organism's Neurons.
+
+    Every Neuron is stacked into a bucket with the others of the same shape, so a tick is a couple of
+    batched matmul calls per bucket instead of a Python-level update per Neuron. Every cell's current
+    output lives in one dense vector laid out by the Organism's Wiring, and bound input ports are loaded
+    from it with a precomputed gather index.
+
+    Neurons are split into levels so a tick reads exactly what Organism.update would have: a Neuron
+    sees the new output of anything that updated before it in the cells list, and the previous output
+    of anything that updates after it.
+
+    Everything is upcast to dtype (by default the Wiring's compute precision) once here, and stays there
+    between ticks, so a tick never pays for converting to and from the Neurons' storage dtype.
+
+    The Organism's cells are still the source of truth. Nothing is copied back to them until
+    write_back() is called.
+    """
+
+    def __init__(self, wiring: Wiring, inputs: Dict[str, InputCell], outputs: Dict[str, Neuron], dtype=None):
+        self.backend = wiring.backend
+        self.dtype = dtype if dtype is not None else wiring.precision.compute
+        # Set while this Phenotype is attached to a BatchStepper, which then runs its ticks
+        self.stepper = None
+        self.outputs = self.backend.astype(wiring.outputs, self.dtype)
+        self.inputs: Dict[str, InputCell] = dict(inputs)
+        self.input_slots: Dict[str, int] = {name: wiring.slots[cell] for name, cell in inputs.items()}
+        # What each input was as of the last write_back, so only the ones that have been set since get written
+        self._written_inputs: Dict[str, float] = {name: self.outputs[slot].item()
+                                                  for name, slot in self.input_slots.items()}
+        self.output_slots: Dict[str, int] = {name: wiring.slots[cell] for name, cell in outputs.items()}
+        self.levels: List[List[_Bucket]] = self._build_levels(wiring.neurons)
+        # The Wiring only keeps the outputs of Neurons that are listened to up to date
+        for buckets in self.levels:
+            for bucket in buckets:
+                bucket.store_outputs(self.outputs)
+
+    def _build_levels(self, neurons: List[NeuronWiring]) -> List[List[_Bucket]]:
+        # A Neuron has to run in a later level than any Neuron before it that it listens to,
+        # and no later than any Neuron after it that it listens to
+        level_of: Dict[int, int] = {}
+        listeners: Dict[int, List[int]] = defaultdict(list)
+        neuron_slots = {nw.slot for nw in neurons}
+        for nw in neurons:
+            level = 0
+            for listener in listeners[nw.slot]:
+                level = max(level, level_of[listener])
+            for source in nw.sources:
+                if source in level_of:
+                    level = max(level, level_of[source] + 1)
+                elif source != nw.slot and source in neuron_slots:
+                    listeners[source].append(nw.slot)
+            level_of[nw.slot] = level
+
+        grouped: Dict[Tuple, List[NeuronWiring]] = defaultdict(list)
+        for nw in neurons:
+            neuron = nw.neuron
+            shape = (neuron.input.shape[0], neuron.feedback.shape[0], neuron.hidden_output.shape[0],
+                     neuron.hidden_output.shape[1])
+            grouped[(level_of[nw.slot], shape)].append(nw)
+
+        levels: List[List[_Bucket]] = [[] for _ in range(max(level_of.values(), default=-1) + 1)]
+        for (level, shape), members in grouped.items():
+            gather = [(row, port, source)
+                      for row, nw in enumerate(members)
+                      for port, source in zip(nw.ports, nw.sources)]
+            levels[level].append(_Bucket.from_neurons(self.backend, level, shape, [nw.neuron for nw in members],
+                                                      [nw.slot for nw in members], gather, self.dtype))
+        return levels
+
+    def set_input(self, input_label: str, input_value) -> None:
+        slot = self.input_slots[input_label]
+        if self.stepper is not None:
+            self.stepper.set_input(self, slot, input_value)
+        else:
+            self.outputs[slot] = input_value
+
+    def get_output(self, output_label: str) -> NP_PRECISION:
+        return NP_PRECISION(self.outputs[self.output_slots[output_label]].item())
+
+    def get_state(self) -> np.ndarray:
+        """Every cell's output and every Neuron's feedback, i.e. everything a tick carries over to the next"""
+        backend = self.backend
+        state = [self.outputs] + [bucket.feedback.reshape(-1) for buckets in self.levels for bucket in buckets]
+        return backend.to_numpy(backend.cat(state))
+
+    def update(self) -> None:
+        if self.stepper is not None:
+            self.stepper.update(self)
+        else:
+            self.step()
+
+    def step(self) -> None:
+        """Run one tick of just this Phenotype"""
+        for buckets in self.levels:
+            for bucket in buckets:
+                bucket.load_inputs(self.outputs)
+            for bucket in buckets:
+                bucket.update()
+                bucket.store_outputs(self.outputs)
+
+    def run_until(self, output_label: str, predicate: Callable, max_steps: int,
+                  monitor: ConvergenceMonitor = None) -> int:
+        """
+        Tick until predicate is true of the output, or max_steps ticks have run, and return how many ran.
+        predicate is applied elementwise to an array of output values, e.g. lambda x: x >= 0.5.
+
+        Ticks run in chunks that double in length up to MAX_CHUNK, with the output recorded into an array
+        after each one, so the output is only looked at once per chunk. When a chunk overshoots, the state
+        from before it is put back and replayed up to the first tick where predicate was true, so this ends
+        in exactly the same state as ticking one at a time would.
+
+        The monitor, if any, only sees the state at the end of each chunk, which is enough to spot fixed
+        points and cycles, if a few ticks later than checking every tick would.
+        """
+        if self.stepper is not None:
+            # Every tick is a round with everybody else on the stepper, no running ahead
+            return self._run_until_stepped(output_label, predicate, max_steps, monitor)
+
+        backend = self.backend
+        slot = self.output_slots[output_label]
+        steps = 0
+        chunk = 1
+        while steps < max_steps:
+            # Stick to powers of 2 so a fused _run_chunk only gets compiled for a handful of lengths
+            length = min(chunk, 1 << ((max_steps - steps).bit_length() - 1))
+            snapshot = self._snapshot()
+            trace = backend.zeros(length, NP_PRECISION)
+            self._run_chunk(trace, slot)
+            hit = backend.first_true(predicate(trace))
+            if hit >= 0:
+                if hit < length - 1:
+                    self._restore(snapshot)
+                    self._run_chunk(trace[:hit + 1], slot)
+                return steps + hit + 1
+            steps += length
+            if monitor is not None and monitor.observe(self.get_state()):
+                return steps
+            chunk = min(chunk * 2, MAX_CHUNK)
+        return steps
+
+    def _run_until_stepped(self, output_label: str, predicate: Callable, max_steps: int,
+                           monitor: ConvergenceMonitor = None) -> int:
+        slot = self.output_slots[output_label]
+        for step in range(1, max_steps + 1):
+            self.update()
+            if predicate(NP_PRECISION(self.outputs[slot].item())):
+                return step
+            if monitor is not None and monitor.observe(self.get_state()):
+                return step
+        return max_steps
+
+    def _run_chunk(self, trace, slot: int) -> None:
+        """Run len(trace) ticks, recording the output in slot after each one"""
+        for i in range(len(trace)):
+            self.step()
+            trace[i] = self.outputs[slot]
+
+    def fuse(self, **compile_args) -> None:
+        """
+        Compile the chunks run_until runs into fused kernels with torch.compile, passing it compile_args.
+        Compiling takes a while, so it's only worth it for a Phenotype that's going to run for a long time.
+        """
+        if self.backend.name != "torch":
+            raise ValueError(f"Only the torch backend can be fused, not {self.backend.name}")
+        import torch
+        self._run_chunk = torch.compile(self._run_chunk, **compile_args)
+
+    def _snapshot(self) -> List:
+        backend = self.backend
+        return [backend.clone(self.outputs)] + [backend.clone(getattr(bucket, name))
+                                                for buckets in self.levels for bucket in buckets
+                                                for name in ('input', 'feedback', 'output')]
+
+    def _restore(self, snapshot: List) -> None:
+        backend = self.backend
+        saved = iter(snapshot)
+        backend.copy_(self.outputs, next(saved))
+        for buckets in self.levels:
+            for bucket in buckets:
+                for name in ('input', 'feedback', 'output'):
+                    backend.copy_(getattr(bucket, name), next(saved))
+
+    def write_back(self) -> None:
+        """Copy the runtime state of every compiled Neuron back onto the Neuron itself, and any inputs that were set"""
+        for name, slot in self.input_slots.items():
+            value = self.outputs[slot].item()
+            if value != self._written_inputs[name]:
+                self.inputs[name].set_output(value)
+                self._written_inputs[name] = value
+        for buckets in self.levels:
+            for bucket in buckets:
+                for row, neuron in enumerate(bucket.neurons):
+                    neuron.input.copy_(bucket.input[row])
+                    neuron.feedback.copy_(bucket.feedback[row])
+                    neuron.output.copy_(bucket.output[row])
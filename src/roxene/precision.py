@@ -0,0 +1,31 @@
+import numpy as np
+
+
+class Precision(object):
+    """
+    Which dtypes Neurons are kept in and which they're updated in.
+
+    storage is what genes, Neurons and the DB hold, so it has to be a NumPy dtype. compute is what the
+    update math runs in: Neurons upcast to it every tick, and Phenotypes upcast to it once when they're
+    built and then stay there. compute can also be "bfloat16", but only with the torch backend.
+    """
+
+    def __init__(self, storage=np.float16, compute=np.float32):
+        self.storage = np.dtype(storage).type
+        self.compute = compute if isinstance(compute, str) else np.dtype(compute).type
+
+    def __eq__(self, other):
+        return isinstance(other, Precision) and (self.storage, self.compute) == (other.storage, other.compute)
+
+    def __hash__(self):
+        return hash((self.storage, self.compute))
+
+    def __repr__(self):
+        compute = self.compute if isinstance(self.compute, str) else self.compute.__name__
+        return f"Precision(storage={self.storage.__name__}, compute={compute})"
+
+
+DEFAULT_PRECISION = Precision()
+
+# Everything in half precision, the way it all worked before there was a choice
+HALF_PRECISION = Precision(np.float16, np.float16)
@@ -9,7 +9,11 @@ from numpy.random import Generator, default_rng
 from sqlalchemy import create_engine
 
 from .environment import Environment
+from .fitness import parse_weights
+from ..backend import BACKENDS, set_backend
+from ..batch import BatchStepper
 from ..persistence import EntityBase
+from ..precision import Precision
 from ..util import set_rng
 
 logging.basicConfig(level=logging.INFO,
@@ -22,10 +26,19 @@ parser = argparse.ArgumentParser(description='Play some tic-tac-toe')
 parser.add_argument('pool_size', type=int, help='Number of cloned Organisms initially in the pool')
 parser.add_argument('num_trials', type=int, help='Number of tic-tac-toe trials to run')
 parser.add_argument('--breed_and_cull_interval', type=int, help='Number of trials between rounds of culling and breeding', default=10)
+parser.add_argument('--gc_interval', type=int, help='Number of trials between collecting the genes and cells dead organisms left behind', default=100)
+parser.add_argument('--lineage_retention_depth', type=int, help='Generations of living genes\' ancestors to keep when collecting garbage', default=0)
+parser.add_argument('--outcome_weights', type=str, help='What each move outcome is worth when ranking organisms, e.g. "WIN=100,LOSE=-10", any left out keep their defaults', default='')
 parser.add_argument('--num_mutagens', type=int, help='Number of mutagens in the pool', default=100)
+parser.add_argument('--batch_inference', action='store_true', help='Share forward passes between concurrent trials')
+parser.add_argument('--compute_dtype', choices=['float16', 'float32', 'bfloat16'], default='float32', help='Precision to update Neurons in, they\'re stored in float16 regardless')
+parser.add_argument('--backend', choices=list(BACKENDS.keys()), help='Array library for Neuron math, defaults to $ROXENE_BACKEND or torch')
 
 args = parser.parse_args(sys.argv[1:])
 
+if args.backend:
+    set_backend(args.backend)
+
 num_organisms = args.pool_size
 num_mutagens = args.num_mutagens
 num_trials = args.num_trials
@@ -56,7 +69,7 @@ EntityBase.metadata.create_all(engine)
 logger.info(f"Seed={SEED}")
 main_rng: Generator = default_rng(SEED)
 set_rng(main_rng)
-env = Environment(engine)
+env = Environment(engine, Precision(compute=args.compute_dtype), outcome_weights=parse_weights(args.outcome_weights))
 
 logger.info(f"Populating environment with {num_organisms} organisms and {num_mutagens} mutagens")
 env.populate(num_organisms)
@@ -66,15 +79,18 @@ logger.info("Done populating environment")
 # Replace 5% of the herd at a time, up to 5
 num_to_cull = num_to_breed = int(max(num_organisms * .05, 5))
 
+stepper = BatchStepper() if args.batch_inference else None
+
 def run(worker_trials: int, worker_rng: Generator, worker_logger: logging.Logger):
     set_rng(worker_rng)
     for iteration in range(worker_trials):
         worker_logger.info(f"Building trial {iteration}")
-        trial = env.start_trial()
-        worker_logger.info(f"Starting trial {iteration} between players {trial.participants[0]} and {trial.participants[1]}")
-        trial.run()
-        worker_logger.info(f"Trial {iteration} complete, saving results")
-        env.complete_trial(trial)
+        try:
+            # Abandons the trial, releasing its organisms, if it fails
+            trial = env.run_trial(stepper=stepper)
+        except Exception:
+            worker_logger.exception(f"Trial {iteration} failed")
+            continue
         worker_logger.info(f"Finished trial {iteration} with moves {[(move.letter, move.position, move.outcomes) for move in trial.moves]}")
         if iteration % args.breed_and_cull_interval == 0 and iteration > 0:
             worker_logger.info("Culling")
@@ -82,6 +98,9 @@ def run(worker_trials: int, worker_rng: Generator, worker_logger: logging.Logger
             worker_logger.info("Done culling, breeding")
             env.breed(num_to_breed)
             worker_logger.info("Done breeding")
+        if iteration % args.gc_interval == 0 and iteration > 0:
+            worker_logger.info("Collecting garbage")
+            env.collect_garbage(args.lineage_retention_depth)
 
 num_threads = 10
 threads = []
@@ -102,6 +121,7 @@ for i in range(num_threads):
 
 for thread in threads:
     thread.join()
+env.mutagens.close()
 
 
 
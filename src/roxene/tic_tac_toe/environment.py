@@ -1,23 +1,37 @@
 import logging
 import uuid
-from typing import Set, List
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Tuple
 
-from sqlalchemy import Engine, select
+from sqlalchemy import Engine, delete, insert, inspect, select, update
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm.attributes import get_history, set_committed_value
+from sqlalchemy.pool import SingletonThreadPool
 
+from .fitness import FitnessLedger
 from .move import Move
 from .outcome import Outcome
 from .players import REQUIRED_INPUTS, REQUIRED_OUTPUTS, Player
 from .population import Population
 from .trial import Trial
-from ..gene import Gene
+from ..batch import BatchStepper
+from ..cells.input_cell import InputCell
+from ..cells.neuron import Neuron, _Neuron_State
+from ..expression import ExpressionCache
+from ..garbage import GCReport, collect_garbage
 from ..genes.composite_gene import CompositeGene
 from ..genes.connect_neurons import ConnectNeurons
 from ..genes.create_neuron import CreateNeuron
+from ..genes.interning import intern_genotype
+from ..genes.loading import load_genotype, load_genotypes
+from ..genes.normalize import GenotypeShape, normalize_genotype
 from ..genes.rotate_cells import RotateCells
 from ..mutagen import Mutagen
 from ..mutagens.create_neuron_mutagen import CreateNeuronMutagen, CNLayer
+from ..mutagens.pipeline import MutationPipeline
+from ..mutagens.registry import MutagenRegistry
 from ..organism import Organism
+from ..precision import Precision, DEFAULT_PRECISION
 from ..util import random_neuron_state
 from ..util import wiggle, get_rng
 
@@ -32,16 +46,29 @@ class Environment(object):
 
     Attributes:
         population (Population): The population of organisms in the environment.
-        mutagens (List[Mutagen]): A list of mutagens used to modify genotypes.
+        mutagens (MutagenRegistry): The mutagens used to modify genotypes, and their susceptibilities, kept in memory.
         sessionmaker (sessionmaker): The SQLAlchemy ORM sessionmaker for database interactions.
+        precision (Precision): The dtypes new genes are stored in and Organisms are updated in.
+        expressions (ExpressionCache): Recently expressed genotypes, for building Organisms without replaying them.
+        fitness (FitnessLedger): The Organisms' scores so far, kept up to date as Trials complete.
     """
 
     population: Population
+    mutagens: MutagenRegistry
     sessionmaker: sessionmaker
+    precision: Precision
+    expressions: ExpressionCache
+    fitness: FitnessLedger
 
-    def __init__(self, engine: Engine):
+    def __init__(self, engine: Engine, precision: Precision = DEFAULT_PRECISION, expression_cache_size: int = 256,
+                 outcome_weights: Optional[Mapping[Outcome, int]] = None):
         self.population = Population()
         self.sessionmaker = sessionmaker(engine)
+        # A SingletonThreadPool gives each thread its own connection (and in-memory SQLite DBs), so no writer thread
+        self.mutagens = MutagenRegistry(self.sessionmaker, background=not isinstance(engine.pool, SingletonThreadPool))
+        self.precision = precision
+        self.expressions = ExpressionCache(expression_cache_size)
+        self.fitness = FitnessLedger(outcome_weights)
 
     def populate(self, num_organisms: int, neuron_shape = None):
         if neuron_shape is None:
@@ -53,14 +80,15 @@ class Environment(object):
                 child_genes = list()
                 for _ in REQUIRED_OUTPUTS:
                     child_genes.extend([
-                        CreateNeuron(**random_neuron_state(**neuron_shape)),
+                        CreateNeuron(**random_neuron_state(**neuron_shape, dtype=self.precision.storage)),
                         *[ConnectNeurons(n, n) for n in range(1, len(REQUIRED_INPUTS) + 1)],
                         RotateCells()
                     ])
-                base_genotype = CompositeGene(child_genes)
+                base_genotype = intern_genotype(CompositeGene(child_genes), session)
 
                 # Create the organism and add it to the population
-                new_organism: Organism = Organism(REQUIRED_INPUTS, REQUIRED_OUTPUTS, base_genotype)
+                new_organism: Organism = Organism(REQUIRED_INPUTS, REQUIRED_OUTPUTS, base_genotype, self.precision,
+                                                  self.expressions)
                 self.population.add(new_organism, session)
 
     def count_organisms(self) -> int:
@@ -76,27 +104,102 @@ class Environment(object):
                 susceptibility_log_wiggle: float = 0.01
                 new_mutagen = CreateNeuronMutagen(layer, base_susceptibility, susceptibility_log_wiggle)
                 session.add(new_mutagen)
+        self.mutagens.reload()
 
     def add_mutagen(self, new_mutagen: Mutagen):
         with self.sessionmaker.begin() as session:
             session.add(new_mutagen)
+        self.mutagens.reload()
 
     def get_mutagens(self, session: Session):
         return session.scalars(select(Mutagen)).all()
 
+    def prune_susceptibilities(self) -> int:
+        """Have the mutagens forget their susceptibilities for genes that no Organism has anymore"""
+        with self.sessionmaker() as session:
+            genotype_ids = session.scalars(select(Organism.genotype_id)
+                                           .where(Organism.genotype_id.is_not(None))
+                                           .distinct()).all()
+            live_genes = list(load_genotypes(genotype_ids, session).values())
+            pruned = sum(mutagen.prune_susceptibilities(live_genes) for mutagen in self.mutagens.mutagens())
+        logger.info(f"Pruned {pruned} mutagen susceptibilities")
+        return pruned
+
+    def collect_garbage(self, retention_depth: int = 0) -> GCReport:
+        """
+        Delete the genes and cells that dead Organisms left behind, keeping retention_depth generations of the living
+        ones' ancestors. Prunes the mutagens' susceptibilities first, so the survivors don't need the rest.
+        """
+        self.prune_susceptibilities()
+        with self.sessionmaker.begin() as session:
+            self.fitness.prune(session)
+            report = collect_garbage(session, retention_depth)
+        self.mutagens.reload()
+        return report
+
     def start_trial(self) -> Trial:
+        """
+        Lease two idle Organisms and start a Trial between them. They stay leased until complete_trial() or
+        abandon_trial(), or until the Population takes the Trial for abandoned if neither ever happens.
+        """
         with (self.sessionmaker(expire_on_commit=False) as session):
-            org_ids: List[uuid.UUID] = self.population.sample(2, True, session)
-            p1 = Player(session.get(Organism, org_ids[0]))
-            p2 = Player(session.get(Organism, org_ids[1]))
-            trial = Trial(p1, p2)
-            session.add(trial)
-            session.commit()
+            org_ids: List[uuid.UUID] = self.population.lease(2, session)
+            try:
+                organisms = [session.get(Organism, org_id) for org_id in org_ids]
+                for organism in organisms:
+                    organism.precision = self.precision
+                p1 = Player(organisms[0])
+                p2 = Player(organisms[1])
+                trial = Trial(p1, p2)
+                # For telling when it's been abandoned, run() sets it again once it really starts
+                trial.start_date = datetime.now()
+                session.add(trial)
+                session.commit()
+            except BaseException:
+                self.population.release(org_ids)
+                raise
             return trial
 
     def complete_trial(self, trial: Trial):
-        with self.sessionmaker.begin() as session:
-            session.merge(trial)
+        """
+        Save trial's results and release its Organisms. Trials from start_trial() are already saved, so only what
+        changed while they ran gets written (see _write_results). Anything else is merged in, Organisms and all.
+        """
+        try:
+            with self.sessionmaker.begin() as session:
+                if inspect(trial).has_identity:
+                    _write_results(trial, session)
+                else:
+                    session.merge(trial)
+                self.fitness.record(trial.moves, session)
+        finally:
+            self.population.release(player.organism.id for player in trial.participants if player.organism is not None)
+
+    def abandon_trial(self, trial: Trial):
+        """
+        Delete a Trial from start_trial() that isn't going to be completed, e.g. because running it failed, and release
+        its Organisms
+        """
+        try:
+            with self.sessionmaker.begin() as session:
+                session.execute(delete(Move).where(Move.trial_id == trial.id))
+                session.execute(delete(Player).where(Player.trial_id == trial.id))
+                session.execute(delete(Trial).where(Trial.id == trial.id))
+        finally:
+            self.population.release(player.organism.id for player in trial.participants if player.organism is not None)
+
+    def run_trial(self, timeout: int = 1000, stepper: BatchStepper = None) -> Trial:
+        """Start a Trial, run it and complete it. If anything goes wrong once it's started it's abandoned instead"""
+        trial = self.start_trial()
+        logger.info(f"Starting trial between players {trial.participants[0]} and {trial.participants[1]}")
+        try:
+            trial.run(timeout, stepper=stepper)
+            self.complete_trial(trial)
+        except BaseException:
+            logger.warning(f"Abandoning trial {trial.id}")
+            self.abandon_trial(trial)
+            raise
+        return trial
 
     def cull(self, num_to_cull: int, num_to_compare: int = 10):
         for n in range(num_to_cull):
@@ -105,13 +208,8 @@ class Environment(object):
                 if num_to_compare == 1:
                     organism_id_to_kill = selectee_ids[0]
                 else:
-                    selectee_scores: dict[uuid.UUID, int] = dict([(oid, 0) for oid in selectee_ids])
-                    relevant_moves = self.get_relevant_moves(selectee_ids, session)
-                    for move in relevant_moves:
-                        selectee_scores[move.organism_id] += self.score_move(move)
-
                     # Put the Organisms with the highest scores at the front of the list
-                    sorted_orgs_and_scores = sorted(selectee_scores.items(), key=lambda item: item[1], reverse=True)
+                    sorted_orgs_and_scores = self.fitness.rank(selectee_ids, session, reverse=True)
 
                     rand = get_rng().random()
                     index_to_kill = int((rand ** 2) * num_to_compare)  # Squaring the random number to skew it towards the lower end
@@ -129,13 +227,8 @@ class Environment(object):
                 if num_to_consider == 1:
                     organism_id_to_breed = selectee_ids[0]
                 else:
-                    selectee_scores: dict[uuid.UUID, int] = dict([(oid, 0) for oid in selectee_ids])
-                    relevant_moves = self.get_relevant_moves(selectee_ids, session)
-                    for move in relevant_moves:
-                        selectee_scores[move.organism_id] += self.score_move(move)
-
                     # Put the Organisms with the lowest scores at the front of the list
-                    sorted_orgs_and_scores = sorted(selectee_scores.items(), key=lambda item: item[1], reverse=False)
+                    sorted_orgs_and_scores = self.fitness.rank(selectee_ids, session)
 
                     # Squaring the random number skews it towards the front,
                     # but don't just take the very fittest always
@@ -151,28 +244,73 @@ class Environment(object):
                 self.population.add(new_organism, session)
 
     def clone(self, organism_id: uuid.UUID, session: Session, mutate=True) -> Organism:
-        original_genotype = session.scalar(select(Gene)
-                             .join_from(Organism, Gene)
-                             .where(Organism.id == organism_id))
+        genotype_id = session.scalar(select(Organism.genotype_id).where(Organism.id == organism_id))
+        original_genotype = load_genotype(genotype_id, session)
         clone_genotype = original_genotype
         if mutate:
-            for mutagen in self.get_mutagens(session):
-                clone_genotype = mutagen.mutate(clone_genotype)
-        return Organism(REQUIRED_INPUTS, REQUIRED_OUTPUTS, clone_genotype)
-
-    def score_move(self, move):
-        score = 0
-        for outcome in move.outcomes:  # Zero-sum is insufficiently motivational
-            if outcome is Outcome.WIN:          score += 100
-            if outcome is Outcome.TIE:          score += 10
-            if outcome is Outcome.VALID_MOVE:   score += 1
-            if outcome is Outcome.LOSE:         score -= 10
-            if outcome is Outcome.INVALID_MOVE: score -= 50
-            if outcome is Outcome.TIMEOUT:      score -= 100
-        return score
-
-    def get_relevant_moves(self, selectee_ids: Set[str], session: Session):
-        return session.scalars(
-            select(Move)
-            .join(Organism)
-            .where(Organism.id.in_(selectee_ids)))
\ No newline at end of file
+            clone_genotype = MutationPipeline(self.mutagens.mutagens()).mutate(clone_genotype)
+            normalized_genotype = normalize_genotype(clone_genotype)
+            if normalized_genotype is not clone_genotype:
+                before, after = GenotypeShape.of(clone_genotype), GenotypeShape.of(normalized_genotype)
+                logger.info(f"Normalized clone of {organism_id} from depth {before.depth} with {before.genes} genes"
+                            f" to depth {after.depth} with {after.genes}")
+                clone_genotype = normalized_genotype
+            clone_genotype = intern_genotype(clone_genotype, session)
+        return Organism(REQUIRED_INPUTS, REQUIRED_OUTPUTS, clone_genotype, self.precision, self.expressions)
+
+
+def _write_results(trial: Trial, session: Session):
+    """
+    Write out what happened while an already-saved Trial ran: its dates, its Players' stats, its Moves, the values
+    its Organisms' inputs were left set to and whatever changed in their Neurons' runtime state (never their weights),
+    in a few statements however big the Organisms are.
+    """
+    session.execute(update(Trial).where(Trial.id == trial.id).values(start_date=trial.start_date,
+                                                                      end_date=trial.end_date))
+    session.execute(update(Player), [{"id": player.id, "letter": player.letter, "updates_saved": player.updates_saved}
+                                     for player in trial.participants])
+    if trial.moves:
+        session.execute(insert(Move.__table__), [_move_row(trial, move) for move in trial.moves])
+
+    # One statement for each combination of state vectors that changed, usually just feedback and output
+    changed_states: Dict[Tuple[str, ...], List[_Neuron_State]] = {}
+    changed_inputs: List[InputCell] = []
+    for player in trial.participants:
+        if player.organism is None:
+            continue
+        for cell in player.organism.cells:
+            if isinstance(cell, Neuron):
+                state = cell._state
+                changed = tuple(key for key in Neuron.STATE if get_history(state, key).has_changes())
+                if changed:
+                    changed_states.setdefault(changed, []).append(state)
+            elif isinstance(cell, InputCell) and get_history(cell, "value").has_changes():
+                changed_inputs.append(cell)
+    if changed_inputs:
+        session.execute(update(InputCell), [{"id": cell.id, "value": cell.value} for cell in changed_inputs])
+        for cell in changed_inputs:
+            set_committed_value(cell, "value", cell.value)
+    for changed, states in changed_states.items():
+        session.execute(update(_Neuron_State),
+                        [dict(neuron_id=state.neuron_id, **{key: getattr(state, key) for key in changed})
+                         for state in states])
+        # They're saved now, so they haven't changed anymore
+        for state in states:
+            for key in changed:
+                set_committed_value(state, key, getattr(state, key))
+
+
+def _move_row(trial: Trial, move: Move) -> Dict:
+    position = move.position
+    return {
+        "id": move.id,
+        "trial_id": trial.id,
+        "letter": move.letter,
+        "initial_board_state": move.initial_board_state,
+        "row": position.row if position is not None else None,
+        "column": position.column if position is not None else None,
+        "resultant_board_state": move.resultant_board_state,
+        "outcomes": move.outcomes,
+        "organism_id": move.organism.id if move.organism is not None else move.organism_id,
+    }
+
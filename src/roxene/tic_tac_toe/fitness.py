@@ -0,0 +1,125 @@
+import logging
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import ForeignKey, delete, insert, select, update
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from .move import Move
+from .outcome import Outcome
+from ..organism import Organism
+from ..persistence import EntityBase
+
+logger = logging.getLogger(__name__)
+
+# How much each Outcome of a Move is worth. Zero-sum is insufficiently motivational
+DEFAULT_WEIGHTS: Dict[Outcome, int] = {
+    Outcome.WIN: 100,
+    Outcome.TIE: 10,
+    Outcome.VALID_MOVE: 1,
+    Outcome.LOSE: -10,
+    Outcome.INVALID_MOVE: -50,
+    Outcome.TIMEOUT: -100,
+}
+
+
+def parse_weights(text: str) -> Dict[Outcome, int]:
+    """Weights like "WIN=100,LOSE=-10", any Outcomes left out keep their default weight"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for pair in filter(None, (pair.strip() for pair in text.split(","))):
+        name, weight = pair.split("=")
+        weights[Outcome[name.strip().upper()]] = int(weight)
+    return weights
+
+
+class Fitness(EntityBase):
+    """How many Moves with each Outcome an Organism has made, and what they add up to"""
+    __tablename__ = "fitness"
+
+    organism_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("organism.id", ondelete="CASCADE"), primary_key=True)
+    wins: Mapped[int] = mapped_column(default=0)
+    losses: Mapped[int] = mapped_column(default=0)
+    ties: Mapped[int] = mapped_column(default=0)
+    timeouts: Mapped[int] = mapped_column(default=0)
+    valid_moves: Mapped[int] = mapped_column(default=0)
+    invalid_moves: Mapped[int] = mapped_column(default=0)
+    score: Mapped[int] = mapped_column(default=0, index=True)
+
+
+_COUNTS = {
+    Outcome.WIN: Fitness.wins,
+    Outcome.LOSE: Fitness.losses,
+    Outcome.TIE: Fitness.ties,
+    Outcome.TIMEOUT: Fitness.timeouts,
+    Outcome.VALID_MOVE: Fitness.valid_moves,
+    Outcome.INVALID_MOVE: Fitness.invalid_moves,
+}
+
+
+class FitnessLedger:
+    """
+    Keeps each Organism's Fitness up to date as its Trials complete, so ranking Organisms doesn't mean going back
+    over all their Moves. Scores are the sum of weights over every Outcome of every Move, and are only as current
+    as the weights they were recorded with; rebuild() after changing them.
+    """
+
+    weights: Dict[Outcome, int]
+
+    def __init__(self, weights: Optional[Mapping[Outcome, int]] = None):
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+
+    def score(self, outcomes: Iterable[Outcome]) -> int:
+        return sum(self.weights.get(outcome, 0) for outcome in outcomes)
+
+    def record(self, moves: Iterable[Move], session: Session):
+        """Add moves' Outcomes to their Organisms' Fitness, in session's transaction"""
+        counts: Dict[uuid.UUID, Counter] = {}
+        for move in moves:
+            organism_id = move.organism.id if move.organism is not None else move.organism_id
+            if organism_id is not None:
+                counts.setdefault(organism_id, Counter()).update(move.outcomes)
+        for organism_id, outcome_counts in counts.items():
+            row = self._row(organism_id, outcome_counts)
+            increments = {key: getattr(Fitness, key) + value for key, value in row.items() if key != "organism_id"}
+            updated = session.execute(update(Fitness).where(Fitness.organism_id == organism_id).values(increments),
+                                      execution_options={"synchronize_session": False}).rowcount
+            if not updated:
+                session.execute(insert(Fitness).values(row))
+
+    def scores(self, organism_ids: Iterable[uuid.UUID], session: Session) -> Dict[uuid.UUID, int]:
+        """The Organisms' scores, 0 for ones that haven't finished a Trial yet"""
+        organism_ids = list(organism_ids)
+        scores = dict.fromkeys(organism_ids, 0)
+        scores.update(session.execute(select(Fitness.organism_id, Fitness.score)
+                                      .where(Fitness.organism_id.in_(organism_ids))).tuples().all())
+        return scores
+
+    def rank(self, organism_ids: Iterable[uuid.UUID], session: Session, reverse: bool = False) -> List[Tuple[uuid.UUID, int]]:
+        """The Organisms and their scores, lowest score first (or highest, if reverse), ties in the order given"""
+        return sorted(self.scores(organism_ids, session).items(), key=lambda item: item[1], reverse=reverse)
+
+    def prune(self, session: Session) -> int:
+        """Forget the Fitness of Organisms that are gone, if the DB didn't cascade their deletes"""
+        return session.execute(delete(Fitness).where(Fitness.organism_id.not_in(select(Organism.id)))).rowcount
+
+    def rebuild(self, session: Session, batch_size: int = 1000) -> int:
+        """Recount every living Organism's Fitness from all the Moves it's made, scored with the current weights"""
+        session.execute(delete(Fitness))
+        counts: Dict[uuid.UUID, Counter] = {}
+        moves = session.execute(select(Move.organism_id, Move.outcomes)
+                                .join(Organism, Organism.id == Move.organism_id)
+                                .execution_options(yield_per=batch_size))
+        for organism_id, outcomes in moves:
+            counts.setdefault(organism_id, Counter()).update(outcomes)
+        rows = [self._row(organism_id, outcome_counts) for organism_id, outcome_counts in counts.items()]
+        for start in range(0, len(rows), batch_size):
+            session.execute(insert(Fitness), rows[start:start + batch_size])
+        logger.info(f"Rebuilt the fitness of {len(rows)} organisms")
+        return len(rows)
+
+    def _row(self, organism_id: uuid.UUID, outcome_counts: Counter) -> Dict:
+        row = {column.key: outcome_counts[outcome] for outcome, column in _COUNTS.items()}
+        row["score"] = sum(self.weights.get(outcome, 0) * count for outcome, count in outcome_counts.items())
+        row["organism_id"] = organism_id
+        return row
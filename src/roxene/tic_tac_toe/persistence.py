@@ -8,6 +8,7 @@ from .outcome import Outcome
 
 class Board(sqlalchemy.types.TypeDecorator):
     impl = CHAR(9)
+    cache_ok = True
 
     def process_bind_param(self, value: List[List[str]], dialect) -> str | None:
         if value is None:
@@ -40,6 +41,7 @@ class Point:
 
 class OutcomeSet(sqlalchemy.types.TypeDecorator):
     impl = VARCHAR
+    cache_ok = True
 
     def process_bind_param(self, value: Set[Outcome], dialect) -> str:
         value_strings = map(lambda o: o.name, value)
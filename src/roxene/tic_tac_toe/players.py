@@ -7,6 +7,7 @@ from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import Tuple, List
 
 # from .trial import Trial
+from ..convergence import ConvergenceMonitor
 from ..organism import Organism
 from ..persistence import EntityBase
 
@@ -17,6 +18,15 @@ MAX_UPDATES = 1_000
 INPUT_READY = "INPUT_READY"
 OUTPUT_READY = "OUTPUT_READY"
 
+
+def is_high(output_ready):
+    return output_ready >= HIGH_THRESHOLD
+
+
+def is_low(output_ready):
+    return output_ready <= LOW_THRESHOLD
+
+
 REQUIRED_INPUTS = [str(x) + ',' + str(y) for x in range(3) for y in range(3)] + [INPUT_READY]
 REQUIRED_OUTPUTS = [str(x) + ',' + str(y) for x in range(3) for y in range(3)] + [OUTPUT_READY]
 
@@ -28,6 +38,11 @@ class Player(EntityBase):
     trial_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("trial.id"))
     organism_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("organism.id"))
     letter: Mapped[str] = mapped_column(CHAR(1), primary_key=True)
+    # How many updates sync() didn't bother running, because the Organism had stopped going anywhere
+    updates_saved: Mapped[int] = mapped_column(default=0)
+
+    # Not persisted, built the first time it's needed
+    _logger = None
 
     trial: Mapped["Trial"] = relationship("Trial", back_populates='participants', lazy="joined")
     organism: Mapped[Organism] = relationship(Organism, lazy="joined")
@@ -36,6 +51,7 @@ class Player(EntityBase):
         self.id = uuid.uuid4()
         self.organism = organism
         self.letter = letter
+        self.updates_saved = 0
 
     def get_move_coords(self, board, timeout=MAX_UPDATES) -> Tuple[int, int]:
         for x in range(3):
@@ -66,54 +82,49 @@ class Player(EntityBase):
     def __str__(self):
         return f"{str(self.organism)}.player"
 
-    def sync(self, timeout):
-        logger = logging.getLogger(str(self.organism)).getChild("player")
+    def sync(self, timeout, monitor: ConvergenceMonitor = None):
+        """
+        Raise a TimeoutError unless the Organism raises then lowers OUTPUT_READY within timeout updates.
+        Gives up as soon as the monitor says the Organism has converged without getting there.
+        """
+        monitor = monitor or ConvergenceMonitor()
+        logger = self.logger
         logger.info(f"Beginning sync, depth={timeout}")
-        num_updates_used = 0
-        next_log_at_update_number = 10
 
         # Set INPUT_READY high, watch for OUTPUT_READY high
         logger.debug("Waiting for high output")
-        seen_output_ready_high = False
         self.organism.set_input(INPUT_READY, HIGH_THRESHOLD)
-        while num_updates_used < timeout:
-            if num_updates_used == next_log_at_update_number:
-                next_log_at_update_number *= 2
-                logger.debug(f"Beginning update {num_updates_used}")
-            self.organism.update()
-            num_updates_used += 1
-            output_value = self.organism.get_output(OUTPUT_READY)
-            if output_value >= HIGH_THRESHOLD:
-                seen_output_ready_high = True
-                logger.debug("Got high output")
-                break
-        if not seen_output_ready_high:
-            logger.info(f"Failed to sync in {timeout} updates")
-            raise TimeoutError(f"Used up all {timeout} updates")
+        num_updates_used = self._wait_for(is_high, timeout, 0, monitor)
+        logger.debug("Got high output")
 
         # Set INPUT_READY low, watch for OUTPUT_READY low
         logger.debug("Waiting for low output")
-        seen_output_ready_low = False
         self.organism.set_input(INPUT_READY, LOW_THRESHOLD)
-        while num_updates_used < timeout:
-            if num_updates_used == next_log_at_update_number:
-                next_log_at_update_number *= 2
-                logger.debug(f"Beginning update {num_updates_used}")
-            self.organism.update()
-            num_updates_used += 1
-            output_value = self.organism.get_output(OUTPUT_READY)
-            if output_value <= LOW_THRESHOLD:
-                seen_output_ready_low = True
-                logger.debug("Got low output")
-                break
-
-        # Raise if we didn't see OUTPUT_READY high and low, pass otherwise
-        if not seen_output_ready_low:
-            logger.info(f"Failed to sync in {timeout} updates")
-            raise TimeoutError(f"Used up all {timeout} updates")
+        num_updates_used = self._wait_for(is_low, timeout, num_updates_used, monitor)
+        logger.debug("Got low output")
 
         logger.info(f"{self} synced in {num_updates_used} updates")
 
+    def _wait_for(self, predicate, timeout, num_updates_used, monitor: ConvergenceMonitor) -> int:
+        """Update until OUTPUT_READY satisfies predicate, and return the total number of updates used so far"""
+        monitor.reset()
+        num_updates_used += self.organism.run_until(OUTPUT_READY, predicate, timeout - num_updates_used, monitor)
+        if predicate(self.organism.get_output(OUTPUT_READY)):
+            return num_updates_used
+        if monitor.reason is not None:
+            saved = timeout - num_updates_used
+            self.updates_saved = (self.updates_saved or 0) + saved
+            self.logger.info(f"Reached a {monitor.reason} after {num_updates_used} updates, saved {saved} updates")
+            raise TimeoutError(f"Reached a {monitor.reason} after {num_updates_used} of {timeout} updates")
+        self.logger.info(f"Failed to sync in {timeout} updates")
+        raise TimeoutError(f"Used up all {timeout} updates")
+
+    @property
+    def logger(self) -> logging.Logger:
+        if self._logger is None:
+            self._logger = logging.getLogger(str(self.organism)).getChild("player")
+        return self._logger
+
 
 class ManualPlayer(Player):
     def __init__(self, organism=None, letter=None, queued_input=[]):
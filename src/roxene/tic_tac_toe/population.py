@@ -1,8 +1,10 @@
 import logging
-import time
+import threading
 import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, event, exists, or_
 from sqlalchemy.orm import Session
 from sqlalchemy.sql.expression import func
 
@@ -13,59 +15,224 @@ from ..util import get_rng
 
 logger = logging.getLogger(__name__)
 
+# How long an unfinished Trial keeps its Organisms busy before they're taken for abandoned, e.g. by a crashed process
+ABANDONED_AFTER = timedelta(hours=1)
+
+class _Changes:
+    """One session's uncommitted changes to a Population's index, made to its own copy of it"""
+
+    def __init__(self, ids: List[uuid.UUID], version: int):
+        self.ids = list(ids)
+        self.slots: Dict[uuid.UUID, int] = {organism_id: slot for slot, organism_id in enumerate(self.ids)}
+        # Which version of the shared index this copy was made from
+        self.version = version
+
+
 class Population:
+    """
+    The living Organisms. Keeps a dense index of their IDs in memory, mirrored in Organism.slot, so sampling
+    doesn't have to count or page through the organism table. Removing an Organism moves the last one into
+    its slot. The index is loaded from the DB the first time it's needed.
+
+    Adding and removing Organisms only changes a copy of the index kept in the session, which that session sees and
+    nobody else does. The copy replaces the shared index when the session commits, or is dropped if it doesn't. If
+    some other session committed changes in the meantime the index is loaded again instead, which fixes up any slots
+    the two of them both wrote.
+
+    Organisms can also be leased out, e.g. for a Trial, so nobody else leases them until they're released. Ones in
+    an unfinished Trial started more than abandoned_after ago are idle again, so a Trial that never gets completed
+    doesn't hold onto its Organisms forever.
+    """
+
+    def __init__(self, abandoned_after: timedelta = ABANDONED_AFTER):
+        self.abandoned_after = abandoned_after
+        self._lock = threading.RLock()
+        self._ids: Optional[List[uuid.UUID]] = None
+        self._slots: Dict[uuid.UUID, int] = {}
+        # Bumped every time the shared index is replaced
+        self._version = 0
+        self._watch_key = ("population", id(self))
+        self._changes_key = ("population changes", id(self))
+        self._leased: Set[uuid.UUID] = set()
 
     def add(self, organism: Organism, session: Session):
+        # Adding it starts session's transaction if it hasn't started yet, so the change to the index has one to go with
         session.add(organism)
+        with self._lock:
+            changes = self._changes(session)
+            if organism.id not in changes.slots:
+                organism.slot = changes.slots[organism.id] = len(changes.ids)
+                changes.ids.append(organism.id)
 
     def remove(self, organism_id_to_kill: uuid.UUID, session: Session):
         result = session.execute(delete(Organism).where(Organism.id == organism_id_to_kill))
         if result.rowcount == 0:
             logger.warning(f"No organism with ID {organism_id_to_kill} found to delete.")
+        with self._lock:
+            changes = self._changes(session)
+            slot = changes.slots.pop(organism_id_to_kill, None)
+            if slot is None:
+                return
+            last_id = changes.ids.pop()
+            if last_id != organism_id_to_kill:
+                changes.ids[slot] = last_id
+                changes.slots[last_id] = slot
+                session.execute(update(Organism).where(Organism.id == last_id).values(slot=slot),
+                                execution_options={"synchronize_session": False})
 
     def count(self, session: Session) -> int:
         """Count the total number of organisms in the population."""
         return session.scalar(select(func.count(Organism.id)))
 
-    def sample(self, num_to_select: int, idle_only: bool, session: Session):
-
-        # Build the base stmt once
-        candidate_select_stmt = select(Organism.id).order_by(Organism.id)
+    def sample(self, num_to_select: int, idle_only: bool, session: Session) -> List[uuid.UUID]:
+        """
+        The IDs of num_to_select different Organisms, drawn at random from the index with the thread's rng. Only
+        ones that aren't in an unfinished Trial if idle_only, which takes one query for the busy ones.
+        """
+        busy = set()
         if idle_only:
-            busy_organisms_query = (select(Organism.id)
-                                    .join(Player)
-                                    .join(Trial)
-                                    .where(Trial.end_date.is_(None)))
-            candidate_select_stmt = candidate_select_stmt.where(~Organism.id.in_(busy_organisms_query))
-
-        if logger.isEnabledFor(logging.DEBUG):
-            start = time.perf_counter()
-        num_candidates = session.execute(select(func.count()).select_from(candidate_select_stmt)).scalar()
-        if logger.isEnabledFor(logging.DEBUG):
-            end = time.perf_counter()
-            logger.debug(f"Count query took {end - start} seconds")
-
-        if num_candidates < num_to_select:
-            raise ValueError(f"Only {num_candidates} candidates available, not enough candidates to select {num_to_select} organisms. ")
-
-        indexes = []
-        results = []
-        for _ in range(num_to_select):
-            idx = get_rng().integers(0, num_candidates)
-            while idx in indexes:
-                idx = get_rng().integers(0, num_candidates)
-            indexes.append(idx)
-
-        indexes.sort()
-
-        for idx in indexes:
-            stmt_with_offset = candidate_select_stmt.offset(idx).limit(1)
-            if logger.isEnabledFor(logging.DEBUG):
-                start = time.perf_counter()
-            result = session.scalars(stmt_with_offset).unique().all()[0]
-            if logger.isEnabledFor(logging.DEBUG):
-                end = time.perf_counter()
-                logger.debug(f"Organism fetch took {end - start} seconds")
-            results.append(result)
+            busy = set(session.scalars(select(Player.organism_id).join(Trial).where(self._in_play())))
+        with self._lock:
+            ids, slots = self._view(session)
+            num_candidates = len(ids) - sum(1 for organism_id in busy if organism_id in slots)
+            if num_candidates < num_to_select:
+                raise ValueError(f"Only {num_candidates} candidates available, not enough candidates to select {num_to_select} organisms. ")
 
+            results = []
+            chosen = set()
+            while len(results) < num_to_select:
+                organism_id = ids[get_rng().integers(0, len(ids))]
+                if organism_id not in chosen and organism_id not in busy:
+                    chosen.add(organism_id)
+                    results.append(organism_id)
+            return results
+
+    def lease(self, num_to_lease: int, session: Session) -> List[uuid.UUID]:
+        """
+        Claim the IDs of num_to_lease different idle Organisms, drawn at random from the index with the thread's rng,
+        until they're released. Ones leased in this process are skipped without asking the DB. The rest are locked
+        with SELECT ... FOR UPDATE SKIP LOCKED, and only claimed if they aren't in an unfinished Trial, so other
+        processes leasing at the same time don't get them either. Put them in a Trial before committing session.
+        Picks are set aside in this process before the DB is asked about them, so the lock is never held across
+        the query.
+        """
+        rejected = set()
+        results = []
+        while len(results) < num_to_lease:
+            with self._lock:
+                ids, slots = self._view(session)
+                num_candidates = len(ids) - len(self._leased.intersection(slots)) - len(rejected)
+                if num_candidates < num_to_lease - len(results):
+                    self._leased.difference_update(results)
+                    raise ValueError(f"Only {len(results) + num_candidates} idle organisms available, not enough to lease {num_to_lease}")
+                picks = []
+                while len(picks) < num_to_lease - len(results):
+                    organism_id = ids[get_rng().integers(0, len(ids))]
+                    if organism_id not in self._leased and organism_id not in rejected and organism_id not in picks:
+                        picks.append(organism_id)
+                # Hold onto them while asking the DB, so the lock doesn't have to be held that long
+                self._leased.update(picks)
+            try:
+                claimed = set(session.scalars(_claim(picks, self._in_play())))
+            except BaseException:
+                self.release(results + picks)
+                raise
+            with self._lock:
+                for organism_id in picks:
+                    if organism_id in claimed:
+                        results.append(organism_id)
+                    else:
+                        self._leased.discard(organism_id)
+                        rejected.add(organism_id)
         return results
+
+    def release(self, organism_ids: Iterable[uuid.UUID]):
+        """Let the Organisms be leased again, e.g. once their Trial is over"""
+        with self._lock:
+            self._leased.difference_update(organism_ids)
+
+    def _in_play(self):
+        """Whether a Trial is unfinished, and not abandoned. Ones that were never started count as in play"""
+        return Trial.end_date.is_(None) & or_(Trial.start_date.is_(None),
+                                              Trial.start_date >= datetime.now() - self.abandoned_after)
+
+    def _view(self, session: Session) -> Tuple[List[uuid.UUID], Dict[uuid.UUID, int]]:
+        """The index as session sees it, including its own uncommitted changes"""
+        changes = session.info.get(self._changes_key)
+        if changes is None:
+            self._load(session)
+            changes = session.info.get(self._changes_key)
+        if changes is not None:
+            return changes.ids, changes.slots
+        return self._ids, self._slots
+
+    def _changes(self, session: Session) -> _Changes:
+        """session's own copy of the index, to make changes to"""
+        changes = session.info.get(self._changes_key)
+        if changes is None:
+            self._load(session)
+            changes = session.info.get(self._changes_key)
+        if changes is None:
+            changes = session.info[self._changes_key] = _Changes(self._ids, self._version)
+            self._watch(session)
+        return changes
+
+    def _load(self, session: Session):
+        """
+        Read the index out of the DB if it isn't loaded, filling in any holes. If any slots needed filling in, the
+        index only goes to session until it commits them.
+        """
+        if self._ids is not None:
+            return
+        rows = session.execute(select(Organism.id, Organism.slot)
+                               .order_by(Organism.slot.is_(None), Organism.slot, Organism.id)).all()
+        repaired = False
+        for slot, (organism_id, stored_slot) in enumerate(rows):
+            if stored_slot != slot:
+                session.execute(update(Organism).where(Organism.id == organism_id).values(slot=slot),
+                                execution_options={"synchronize_session": False})
+                repaired = True
+        ids = [organism_id for organism_id, _ in rows]
+        if repaired:
+            session.info[self._changes_key] = _Changes(ids, self._version)
+            self._watch(session)
+        else:
+            self._install(ids, {organism_id: slot for slot, organism_id in enumerate(ids)})
+
+    def _install(self, ids: Optional[List[uuid.UUID]], slots: Dict[uuid.UUID, int]):
+        self._ids = ids
+        self._slots = slots
+        self._version += 1
+
+    def _watch(self, session: Session):
+        """Hook session's changes to the index up to its transaction: kept if it commits and dropped if not"""
+        if not session.info.get(self._watch_key):
+            event.listen(session, "after_commit", self._commit)
+            event.listen(session, "after_transaction_end", self._end)
+            session.info[self._watch_key] = True
+
+    def _commit(self, session: Session):
+        changes = session.info.pop(self._changes_key, None)
+        if changes is None:
+            return
+        with self._lock:
+            if changes.version == self._version:
+                self._install(changes.ids, changes.slots)
+            else:
+                # Somebody else's changes went in first, so the slots this session wrote might clash with theirs
+                self._install(None, {})
+
+    def _end(self, session: Session, transaction):
+        if transaction.parent is None:
+            session.info.pop(self._changes_key, None)
+
+
+def _claim(organism_ids: List[uuid.UUID], in_play):
+    """
+    Which of organism_ids aren't in a Trial in_play, locking them. Postgres skips rows another transaction has
+    locked. SQLite doesn't do row locks and leaves out the FOR UPDATE, but it only has one writer at a time anyway.
+    """
+    in_trial = exists().where(Player.organism_id == Organism.id, Player.trial_id == Trial.id, in_play)
+    return (select(Organism.id)
+            .where(Organism.id.in_(organism_ids), ~in_trial)
+            .with_for_update(skip_locked=True, of=Organism))
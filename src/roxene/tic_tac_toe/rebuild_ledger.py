@@ -0,0 +1,27 @@
+import argparse
+import logging
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .fitness import Fitness, FitnessLedger, parse_weights
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - [%(threadName)s]\t- %(name)s: %(message)s',
+                    force=True)
+logger = logging.getLogger(__name__)
+
+parser = argparse.ArgumentParser(description='Recompute every living organism\'s fitness from all the moves it\'s made')
+
+parser.add_argument('db_url', type=str, help='SQLAlchemy URL of the database a run was saved to')
+parser.add_argument('--outcome_weights', type=str, help='What each outcome is worth, e.g. "WIN=100,LOSE=-10", any left out keep their defaults', default='')
+
+args = parser.parse_args(sys.argv[1:])
+
+engine = create_engine(args.db_url)
+Fitness.__table__.create(engine, checkfirst=True)
+ledger = FitnessLedger(parse_weights(args.outcome_weights))
+logger.info(f"Rebuilding fitness with weights {dict((outcome.name, weight) for outcome, weight in ledger.weights.items())}")
+with sessionmaker(engine).begin() as session:
+    ledger.rebuild(session)
@@ -3,6 +3,7 @@ from __future__ import annotations
 import itertools
 import logging
 import uuid
+from contextlib import ExitStack
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import Iterator, List
@@ -11,6 +12,7 @@ from .move import Move
 from .outcome import Outcome
 from .persistence import Point
 from .players import Player
+from ..batch import BatchStepper
 from ..persistence import EntityBase
 
 # import roxene.tic_tac_toe as ttt
@@ -49,7 +51,29 @@ class Trial(EntityBase):
         return len(self.moves) == 9 or \
                any(filter(lambda move: Outcome.WIN in move.outcomes or Outcome.LOSE in move.outcomes, self.moves))
 
-    def run(self, timeout=1000, queued_input: List[tuple[int, int]] = None):
+    def run(self, timeout=1000, queued_input: List[tuple[int, int]] = None, stepper: BatchStepper = None):
+        """
+        Play the game out. The Organisms run in simulation mode the whole time, nothing about them needs
+        saving until complete_trial(). Each Player's Organism is compiled for the length of the game (unless it
+        already was), and written back when it's over. If a stepper is given, each one shares its forward passes
+        with whatever else is attached to the stepper while it's that Player's move.
+        """
+        organisms = [p.organism for p in self.participants if p.organism is not None]
+        with ExitStack() as simulations:
+            for organism in organisms:
+                simulations.enter_context(organism.simulation())
+            compiled = []
+            for organism in organisms:
+                if organism.phenotype is None:
+                    organism.compile()
+                    compiled.append(organism)
+            try:
+                self._run(timeout, queued_input, stepper)
+            finally:
+                for organism in compiled:
+                    organism.decompile()
+
+    def _run(self, timeout, queued_input: List[tuple[int, int]], stepper: BatchStepper):
         self.start_date = datetime.now()
         board = [[None, None, None], [None, None, None], [None, None, None]]
         logging.info(f"Beginning trial for {[str(p) for p in self.participants]}")
@@ -66,6 +90,9 @@ class Trial(EntityBase):
             try:
                 if queued_input is not None:
                     move_coords = queued_input.pop(0)
+                elif stepper is not None and current_player.organism is not None:
+                    with stepper.attached(current_player.organism.phenotype):
+                        move_coords = current_player.get_move_coords(board, timeout)
                 else:
                     move_coords = current_player.get_move_coords(board, timeout)
                 this_move.position = Point(move_coords[0], move_coords[1])
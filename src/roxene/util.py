@@ -20,16 +20,17 @@ def new_uuid() -> UUID:
 def get_rng() -> Generator:
     return thread_local_data.rng
 
-def random_neuron_state(input_size=10, feedback_size=10, hidden_size=10, rng: Generator = None) -> Dict[str, ndarray]:
+def random_neuron_state(input_size=10, feedback_size=10, hidden_size=10, rng: Generator = None,
+                        dtype=NP_PRECISION) -> Dict[str, ndarray]:
     rng = rng or get_rng()
     return {
-        "input": (2 * rng.random([input_size]) - 1).astype(dtype=NP_PRECISION),
-        "feedback": (2 * rng.random([feedback_size]) - 1).astype(dtype=NP_PRECISION),
-        "output": (2 * rng.random([1]) - 1).astype(dtype=NP_PRECISION),
-        "input_hidden": (2 * rng.random([input_size, hidden_size]) - 1).astype(dtype=NP_PRECISION),
-        "hidden_feedback": (2 * rng.random([hidden_size, feedback_size]) - 1).astype(dtype=NP_PRECISION),
-        "feedback_hidden": (2 * rng.random([feedback_size, hidden_size]) - 1).astype(dtype=NP_PRECISION),
-        "hidden_output": (2 * rng.random([hidden_size, 1]) - 1).astype(dtype=NP_PRECISION),
+        "input": (2 * rng.random([input_size]) - 1).astype(dtype=dtype),
+        "feedback": (2 * rng.random([feedback_size]) - 1).astype(dtype=dtype),
+        "output": (2 * rng.random([1]) - 1).astype(dtype=dtype),
+        "input_hidden": (2 * rng.random([input_size, hidden_size]) - 1).astype(dtype=dtype),
+        "hidden_feedback": (2 * rng.random([hidden_size, feedback_size]) - 1).astype(dtype=dtype),
+        "feedback_hidden": (2 * rng.random([feedback_size, hidden_size]) - 1).astype(dtype=dtype),
+        "hidden_output": (2 * rng.random([hidden_size, 1]) - 1).astype(dtype=dtype),
     }
 
 
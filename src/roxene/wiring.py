@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from typing import Dict, List, Iterable
+
+from .backend import Backend, get_backend, backend_for
+from .cell import Cell
+from .cells.input_cell import InputCell
+from .cells.neuron import Neuron
+from .precision import Precision, DEFAULT_PRECISION
+
+
+class NeuronWiring(object):
+    """Which slots of the Wiring's output vector feed which input ports of one Neuron"""
+
+    def __init__(self, neuron: Neuron, slot: int, ports: List[int], sources: List[int], backend: Backend):
+        self.neuron = neuron
+        self.slot = slot
+        self.ports = ports
+        self.sources = sources
+        self.port_index = backend.index(ports)
+        self.source_index = backend.index(sources)
+        # Only Neurons somebody listens to need their output copied into the output vector
+        self.is_source = False
+
+
+class Wiring(object):
+    """
+    An Organism's connections flattened into indexes.
+
+    Every cell gets a slot in one dense vector of outputs, and every Neuron gets a table of
+    (input port, source slot) pairs, so loading its inputs is a single gather from that vector
+    instead of a walk through bound_ports.
+
+    Built once from the cells list, so it has to be rebuilt if cells are added, moved or reconnected.
+    Uses the same backend as the Neurons' arrays were created with, and updates them in precision.compute.
+    """
+
+    def __init__(self, cells: Iterable[Cell], precision: Precision = DEFAULT_PRECISION, backend: Backend = None):
+        self.cells: List[Cell] = list(cells)
+        self.precision = precision
+        self.slots: Dict[Cell, int] = {cell: slot for slot, cell in enumerate(self.cells)}
+        if backend is None:
+            neuron = next((cell for cell in self.cells if isinstance(cell, Neuron)), None)
+            backend = backend_for(neuron.output.tensor) if neuron is not None else get_backend()
+        self.backend = backend
+
+        self.outputs = self.backend.zeros(len(self.cells), precision.storage)
+        for slot, cell in enumerate(self.cells):
+            if isinstance(cell, InputCell):
+                self.outputs[slot] = cell.get_output() or 0
+            elif isinstance(cell, Neuron):
+                self.outputs[slot] = cell.output.tensor[0]
+
+        self.neurons: List[NeuronWiring] = []
+        by_slot: Dict[int, NeuronWiring] = {}
+        for slot, cell in enumerate(self.cells):
+            if isinstance(cell, Neuron):
+                ports, sources = [], []
+                for port, tx_cell in cell.bound_ports.items():
+                    ports.append(port)
+                    sources.append(self.slots[tx_cell])
+                by_slot[slot] = NeuronWiring(cell, slot, ports, sources, self.backend)
+                self.neurons.append(by_slot[slot])
+        for neuron_wiring in self.neurons:
+            for source in neuron_wiring.sources:
+                if source in by_slot:
+                    by_slot[source].is_source = True
+
+    def set_output(self, cell: Cell, value) -> None:
+        self.outputs[self.slots[cell]] = value
+
+    def update(self) -> None:
+        """Update every Neuron in cells order, the same as calling update() on each one"""
+        outputs = self.outputs
+        compute_dtype = self.precision.compute
+        for nw in self.neurons:
+            if nw.ports:
+                nw.neuron.load_inputs(nw.port_index, outputs[nw.source_index])
+            nw.neuron.step(compute_dtype)
+            if nw.is_source:
+                outputs[nw.slot] = nw.neuron.output.tensor[0]
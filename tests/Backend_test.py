@@ -0,0 +1,102 @@
+import unittest
+
+import numpy as np
+import torch
+from numpy.random import default_rng
+from sqlalchemy.orm import Session
+
+from roxene import Organism, Neuron, InputCell, random_neuron_state
+from roxene.backend import get_backend, set_backend
+from roxene.precision import HALF_PRECISION
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+from Phenotype_test import build_genotype, INPUT_NAMES, OUTPUT_NAMES
+
+SEED = 40440231
+
+
+class Backend_test(unittest.TestCase):
+
+    def setUp(self):
+        self.original_backend = get_backend()
+
+    def tearDown(self):
+        set_backend(self.original_backend.name)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            set_backend("cupy")
+
+    def test_neuron_update_matches(self):
+        state = random_neuron_state(4, 5, 3, rng=default_rng(SEED))
+        set_backend("torch")
+        torch_neuron = Neuron(**state)
+        set_backend("numpy")
+        numpy_neuron = Neuron(**state)
+        self.assertIsInstance(numpy_neuron.input.tensor, np.ndarray)
+
+        input_cell = InputCell(np.float16(0.25))
+        torch_neuron.add_input_connection(input_cell, 1)
+        numpy_neuron.add_input_connection(input_cell, 1)
+        for _ in range(5):
+            torch_neuron.update()
+            numpy_neuron.update()
+            self.assertAlmostEqual(float(torch_neuron.get_output()), float(numpy_neuron.get_output()), 2)
+        np.testing.assert_allclose(numpy_neuron.feedback.tensor, torch_neuron.feedback.numpy(), atol=1e-2)
+
+    def test_organism_update_matches(self):
+        organisms = {}
+        for name in ("torch", "numpy"):
+            set_backend(name)
+            set_rng(default_rng(SEED))
+            organisms[name] = Organism(INPUT_NAMES, OUTPUT_NAMES, build_genotype())
+        rng = default_rng(SEED)
+        for _ in range(10):
+            for input_name in INPUT_NAMES:
+                value = rng.uniform(-1, 1)
+                for organism in organisms.values():
+                    organism.set_input(input_name, value)
+            for organism in organisms.values():
+                organism.update()
+            for output_name in OUTPUT_NAMES:
+                self.assertAlmostEqual(float(organisms["torch"].get_output(output_name)),
+                                       float(organisms["numpy"].get_output(output_name)), 1)
+
+    def test_numpy_phenotype_matches_organism(self):
+        set_backend("numpy")
+        set_rng(default_rng(SEED))
+        genotype = build_genotype()
+        compiled = Organism(INPUT_NAMES, OUTPUT_NAMES, genotype, HALF_PRECISION)
+        plain = Organism(INPUT_NAMES, OUTPUT_NAMES, genotype, HALF_PRECISION)
+        compiled.compile()
+        for _ in range(10):
+            compiled.update()
+            plain.update()
+            for output_name in OUTPUT_NAMES:
+                self.assertEqual(compiled.get_output(output_name), plain.get_output(output_name))
+
+    def test_load_into_other_backend(self):
+        engine = get_engine()
+        set_backend("torch")
+        neuron = Neuron(**random_neuron_state(rng=default_rng(SEED)))
+        neuron_id = neuron.id
+        expected = neuron.hidden_output.numpy().copy()
+        with Session(engine) as session:
+            session.add(neuron)
+            session.commit()
+
+        set_backend("numpy")
+        with Session(engine) as session:
+            loaded = session.get(Neuron, neuron_id)
+            self.assertIsInstance(loaded.hidden_output.tensor, np.ndarray)
+            np.testing.assert_array_equal(loaded.hidden_output.tensor, expected)
+            # Changes made with NumPy arrays are still tracked
+            loaded.update()
+            updated_output = loaded.output.tensor.copy()
+            session.commit()
+
+        set_backend("torch")
+        with Session(engine) as session:
+            reloaded = session.get(Neuron, neuron_id)
+            self.assertIsInstance(reloaded.output.tensor, torch.Tensor)
+            np.testing.assert_array_equal(reloaded.output.numpy(), updated_output)
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+from numpy.random import default_rng
+
+from roxene import Organism
+from roxene.convergence import ConvergenceMonitor
+from roxene.util import set_rng
+from Phenotype_test import build_genotype, INPUT_NAMES, OUTPUT_NAMES
+
+SEED = 55012983
+
+
+class ConvergenceMonitor_test(unittest.TestCase):
+
+    def test_fixed_point(self):
+        monitor = ConvergenceMonitor(tolerance=0.01)
+        self.assertFalse(monitor.observe(np.array([0., 1.])))
+        self.assertFalse(monitor.observe(np.array([0.5, 1.])))
+        self.assertTrue(monitor.observe(np.array([0.505, 1.])))
+        self.assertEqual(monitor.reason, ConvergenceMonitor.FIXED_POINT)
+
+    def test_cycle(self):
+        monitor = ConvergenceMonitor(tolerance=0)
+        states = [np.array([x]) for x in (0., 1., 2., 3.)]
+        for state in states:
+            self.assertFalse(monitor.observe(state))
+        self.assertTrue(monitor.observe(states[1]))
+        self.assertEqual(monitor.reason, ConvergenceMonitor.CYCLE)
+        self.assertEqual(monitor.cycle_length, 3)
+
+    def test_history(self):
+        monitor = ConvergenceMonitor(tolerance=0, history=2)
+        for x in (0., 1., 2.):
+            self.assertFalse(monitor.observe(np.array([x])))
+        # Too long ago to remember
+        self.assertFalse(monitor.observe(np.array([0.])))
+
+    def test_reset(self):
+        monitor = ConvergenceMonitor()
+        monitor.observe(np.array([1.]))
+        monitor.reset()
+        self.assertFalse(monitor.observe(np.array([1.])))
+        self.assertIsNone(monitor.reason)
+
+    def test_organism_state(self):
+        set_rng(default_rng(SEED))
+        organism = Organism(INPUT_NAMES, OUTPUT_NAMES, build_genotype())
+        for compile in (False, True):
+            if compile:
+                organism.compile()
+            before = organism.get_state()
+            np.testing.assert_array_equal(organism.get_state(), before)
+            organism.update()
+            self.assertFalse(np.array_equal(organism.get_state(), before))
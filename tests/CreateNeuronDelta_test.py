@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+from numpy.random import default_rng
+from sqlalchemy.orm import Session
+
+from roxene import Organism, random_neuron_state
+from roxene.genes import CreateNeuron, CreateNeuronDelta
+from roxene.mutagens import CNLayer, CreateNeuronMutagen
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+
+SEED = 38106624
+
+
+class CreateNeuronDelta_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        self.gene = CreateNeuron(**random_neuron_state(20, 10, 20))
+
+    def test_sparse(self):
+        # Values are kept with probability 0.99, so only about 1% of them change
+        mutant = CreateNeuronMutagen(CNLayer.input_hidden, 0.99, 0).mutate(self.gene)
+        self.assertIsInstance(mutant, CreateNeuronDelta)
+        self.assertEqual(list(mutant.deltas.keys()), ["input_hidden"])
+        indices, values = mutant.deltas["input_hidden"]
+        self.assertGreater(len(indices), 0)
+        self.assertLess(len(indices), self.gene.input_hidden.size * CreateNeuronDelta.DENSE_FRACTION)
+
+        expected = np.array(self.gene.input_hidden)
+        expected.flat[indices] = values
+        np.testing.assert_array_equal(mutant.input_hidden, expected)
+        self.assertEqual(np.count_nonzero(mutant.input_hidden != self.gene.input_hidden), len(indices))
+        self.assertIs(mutant.hidden_output, self.gene.hidden_output)
+
+    def test_dense(self):
+        mutant = CreateNeuronMutagen(CNLayer.hidden_feedback).mutate(self.gene)
+        indices, values = mutant.deltas["hidden_feedback"]
+        self.assertIsNone(indices)
+        np.testing.assert_array_equal(mutant.hidden_feedback, values)
+
+    def test_chain(self):
+        mutagen = CreateNeuronMutagen(CNLayer.input_hidden, 0.99, 0)
+        genes = [self.gene]
+        for _ in range(CreateNeuronDelta.MAX_DEPTH + 1):
+            genes.append(mutagen.mutate(genes[-1]))
+        self.assertEqual([getattr(gene, "depth", 0) for gene in genes],
+                         list(range(CreateNeuronDelta.MAX_DEPTH + 1)) + [0])
+        # Past the limit it's stored whole again, with the same values
+        last = genes[-1]
+        self.assertIsInstance(last, CreateNeuron)
+        self.assertIs(last.parent_gene, genes[-2])
+        self.assertFalse(np.array_equal(last.input_hidden, self.gene.input_hidden))
+
+    def test_persistence(self):
+        mutagen = CreateNeuronMutagen(CNLayer.input_hidden, 0.99, 0)
+        child = mutagen.mutate(mutagen.mutate(self.gene))
+        child_id = child.id
+        expected = {name: np.array(value) for name, value in child.state().items()}
+
+        engine = get_engine()
+        with Session(engine) as session:
+            session.add(child)
+            session.commit()
+        with Session(engine) as session:
+            loaded = session.get(CreateNeuronDelta, child_id)
+            self.assertEqual(loaded.depth, 2)
+            for name, value in expected.items():
+                np.testing.assert_array_equal(loaded.state()[name], value)
+            organism = Organism()
+            loaded.execute(organism)
+            np.testing.assert_array_equal(organism.cells[0].input_hidden.numpy(), expected["input_hidden"])
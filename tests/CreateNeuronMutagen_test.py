@@ -56,6 +56,13 @@ class CreateNeuronMutagen_test(unittest.TestCase):
         else:
             self.assertEqual(fraction_changed, 0, "None should have changed")
 
+    def test_keeps_dtype(self):
+        set_rng(default_rng(SEED))
+        gene = CreateNeuron(**random_neuron_state(10, 10, 10, dtype=np.float32))
+        mutant = CreateNeuronMutagen(CNLayer.hidden_output, base_susceptibility=0.5).mutate(gene)
+        self.assertEqual(mutant.hidden_output.dtype, np.float32)
+        self.assertFalse(np.array_equal(mutant.hidden_output, gene.hidden_output))
+
     def test_persist_reload(self):
         mutagen = CreateNeuronMutagen(CNLayer.input_hidden, 0.005, 0.02)
         mutagen_id = mutagen.id
@@ -0,0 +1,124 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from numpy.random import default_rng
+from sqlalchemy.orm import Session
+
+from roxene import Organism, Neuron, InputCell
+from roxene.expression import ExpressionCache
+from roxene.genes import CompositeGene, CreateInputCell
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+from Phenotype_test import build_genotype, INPUT_NAMES, OUTPUT_NAMES
+
+SEED = 73303412
+
+
+class ExpressionCache_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        self.genotype = CompositeGene([CreateInputCell(0.25), build_genotype()])
+
+    def assertSameStructure(self, expected: Organism, actual: Organism):
+        self.assertEqual(len(expected.cells), len(actual.cells))
+        expected_index = {cell.id: i for i, cell in enumerate(expected.cells)}
+        actual_index = {cell.id: i for i, cell in enumerate(actual.cells)}
+        for expected_cell, actual_cell in zip(expected.cells, actual.cells):
+            self.assertIs(type(expected_cell), type(actual_cell))
+            if isinstance(expected_cell, Neuron):
+                for name in ("input", "feedback", "output", "input_hidden", "hidden_feedback", "feedback_hidden",
+                             "hidden_output"):
+                    np.testing.assert_array_equal(getattr(expected_cell, name).numpy(),
+                                                  getattr(actual_cell, name).numpy())
+                self.assertEqual({port: expected_index[cell.id] for port, cell in expected_cell.bound_ports.items()},
+                                 {port: actual_index[cell.id] for port, cell in actual_cell.bound_ports.items()})
+            else:
+                self.assertEqual(expected_cell.get_output(), actual_cell.get_output())
+        self.assertEqual({name: expected_index[n.id] for name, n in expected.outputs.items()},
+                         {name: actual_index[n.id] for name, n in actual.outputs.items()})
+        self.assertEqual(list(expected.unused_output_names), list(actual.unused_output_names))
+
+    def test_matches_execute(self):
+        cache = ExpressionCache()
+        executed = Organism(INPUT_NAMES, OUTPUT_NAMES, self.genotype)
+        first = Organism(INPUT_NAMES, OUTPUT_NAMES, self.genotype, expressions=cache)
+        with patch.object(CompositeGene, "execute") as execute:
+            second = Organism(INPUT_NAMES, OUTPUT_NAMES, self.genotype, expressions=cache)
+            execute.assert_not_called()
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertSameStructure(executed, first)
+        self.assertSameStructure(executed, second)
+
+        # The cached copy shares nothing with the first one
+        first_ids = {cell.id for cell in first.cells}
+        self.assertFalse(first_ids & {cell.id for cell in second.cells if not isinstance(cell, InputCell)})
+        self.assertIn(second.inputs['A'], list(second.cells))
+
+        for organism in (executed, second):
+            for input_name in INPUT_NAMES:
+                organism.set_input(input_name, 0.5)
+        for _ in range(5):
+            executed.update()
+            second.update()
+            for output_name in OUTPUT_NAMES:
+                self.assertEqual(executed.get_output(output_name), second.get_output(output_name))
+
+    def test_different_outputs_miss(self):
+        cache = ExpressionCache()
+        Organism(INPUT_NAMES, OUTPUT_NAMES, self.genotype, expressions=cache)
+        Organism(INPUT_NAMES, OUTPUT_NAMES[:2], self.genotype, expressions=cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_lru_eviction(self):
+        cache = ExpressionCache(maxsize=2)
+        genotypes = [build_genotype() for _ in range(3)]
+        Organism(INPUT_NAMES, OUTPUT_NAMES, genotypes[0], expressions=cache)
+        Organism(INPUT_NAMES, OUTPUT_NAMES, genotypes[1], expressions=cache)
+        # Use the first one again, so the second is the least recently used
+        Organism(INPUT_NAMES, OUTPUT_NAMES, genotypes[0], expressions=cache)
+        Organism(INPUT_NAMES, OUTPUT_NAMES, genotypes[2], expressions=cache)
+        self.assertEqual(len(cache), 2)
+        Organism(INPUT_NAMES, OUTPUT_NAMES, genotypes[0], expressions=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+        Organism(INPUT_NAMES, OUTPUT_NAMES, genotypes[1], expressions=cache)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_threads(self):
+        cache = ExpressionCache(maxsize=2)
+        genotypes = [build_genotype() for _ in range(3)]
+        errors = []
+
+        def build(n):
+            set_rng(default_rng(SEED + n))
+            try:
+                for i in range(12):
+                    Organism(INPUT_NAMES, OUTPUT_NAMES, genotypes[(n + i) % 3], expressions=cache)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=build, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.hits + cache.misses, 48)
+        self.assertLessEqual(len(cache), 2)
+
+    def test_persistence(self):
+        cache = ExpressionCache()
+        Organism(INPUT_NAMES, OUTPUT_NAMES, self.genotype, expressions=cache)
+        organism = Organism(INPUT_NAMES, OUTPUT_NAMES, self.genotype, expressions=cache)
+        organism_id = organism.id
+        cell_ids = [cell.id for cell in organism.cells]
+        engine = get_engine()
+        with Session(engine) as session:
+            session.add(organism)
+            session.commit()
+        with Session(engine) as session:
+            loaded = session.get(Organism, organism_id)
+            self.assertEqual([cell.id for cell in loaded.cells], cell_ids)
+            self.assertEqual(set(loaded.outputs.keys()), set(OUTPUT_NAMES))
@@ -0,0 +1,91 @@
+import unittest
+
+from numpy.random import default_rng
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
+
+from roxene import EntityBase, Gene, Organism, random_neuron_state
+from roxene.cells import Neuron
+from roxene.garbage import GCReport, collect_garbage
+from roxene.genes import CompositeGene, ConnectNeurons, CreateNeuron
+from roxene.genes.loading import load_genotype
+from roxene.mutagens import CNLayer, CreateNeuronMutagen
+from roxene.tic_tac_toe.population import Population
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+
+SEED = 91327745
+
+
+class GarbageCollection_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        self.engine = get_engine()
+        self.dead_genotype = CompositeGene([CreateNeuron(**random_neuron_state(4, 3, 5))])
+        grandparent = CreateNeuron(**random_neuron_state(4, 3, 5))
+        self.parent = CreateNeuron(**random_neuron_state(4, 3, 5), parent_gene=grandparent)
+        self.live_genotype = CompositeGene([CreateNeuron(**random_neuron_state(4, 3, 5), parent_gene=self.parent)])
+        self.dead = Organism(genotype=self.dead_genotype)
+        self.live = Organism(genotype=self.live_genotype)
+        self.mutagen = CreateNeuronMutagen(CNLayer.input_hidden)
+        self.mutagen.get_mutation_susceptibility(self.dead_genotype.child_genes[0])
+        with Session(self.engine, expire_on_commit=False) as session:
+            session.add_all([self.dead, self.live, self.mutagen])
+            session.commit()
+            Population().remove(self.dead.id, session)
+            session.commit()
+
+    def test_collect_garbage(self):
+        with Session(self.engine) as session:
+            report = collect_garbage(session, retention_depth=1)
+            session.commit()
+        # The dead genotype, and the live one's great-grandparent
+        self.assertEqual(report.genes, 3)
+        self.assertEqual(report.cells, 1)
+        self.assertEqual(report.rows["mutagen_susceptibility"], 1)
+        self.assertEqual(report.rows["organism_cell"], 1)
+        self.assertGreater(report.bytes_reclaimed, 0)
+
+        with Session(self.engine) as session:
+            self.assertEqual(set(session.scalars(select(Gene.id))),
+                             {self.live_genotype.id, self.live_genotype.child_genes[0].id, self.parent.id})
+            self.assertIsNone(session.get(Gene, self.parent.id).parent_gene_id)
+            self.assertEqual(list(session.scalars(select(Neuron.id))), [self.live.cells[0].id])
+            genotype = load_genotype(self.live_genotype.id, session)
+            genotype.execute(Organism())
+
+            # Nothing left to collect the second time
+            self.assertEqual(collect_garbage(session, retention_depth=1), GCReport())
+
+    def test_retention_depth(self):
+        with Session(self.engine) as session:
+            # Only the dead genotype goes, then both of the live one's ancestors
+            self.assertEqual(collect_garbage(session, retention_depth=2).genes, 2)
+            self.assertEqual(collect_garbage(session, retention_depth=0).genes, 2)
+
+    def test_foreign_keys_enforced(self):
+        engine = create_engine("sqlite://")
+        event.listen(engine, "connect", lambda connection, record: connection.execute("PRAGMA foreign_keys=ON"))
+        EntityBase.metadata.create_all(engine)
+        genotype = CompositeGene([
+            CompositeGene([CreateNeuron(**random_neuron_state(4, 3, 5)), CreateNeuron(**random_neuron_state(4, 3, 5))]),
+            ConnectNeurons(1, 0),
+        ])
+        dead = Organism(genotype=genotype)
+        self.assertEqual(len(dead.cells[0].bound_ports), 1)
+        with Session(engine, expire_on_commit=False) as session:
+            session.add(dead)
+            session.commit()
+            Population().remove(dead.id, session)
+            session.commit()
+
+        # More dead genes and cells than fit in a chunk, with links running between chunks
+        with Session(engine) as session:
+            report = collect_garbage(session, chunk_size=1)
+            session.commit()
+        self.assertEqual(report.genes, 5)
+        self.assertEqual(report.cells, 2)
+        self.assertEqual(report.rows["neuron_input"], 1)
+        with Session(engine) as session:
+            self.assertEqual(list(session.scalars(select(Gene.id))), [])
@@ -0,0 +1,80 @@
+import unittest
+
+from numpy.random import default_rng
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from roxene import Gene, random_neuron_state
+from roxene.genes import CompositeGene, ConnectNeurons, CreateNeuron, RotateCells
+from roxene.genes.interning import intern_genotype
+from roxene.mutagens import CNLayer, CreateNeuronMutagen
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+
+SEED = 26601954
+
+
+class GeneInterning_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        self.state = random_neuron_state(4, 3, 5)
+
+    def test_digest(self):
+        self.assertEqual(ConnectNeurons(1, 2).digest(), ConnectNeurons(1, 2).digest())
+        self.assertNotEqual(ConnectNeurons(1, 2).digest(), ConnectNeurons(2, 1).digest())
+        self.assertEqual(CreateNeuron(**self.state).digest(), CreateNeuron(**self.state).digest())
+        self.assertNotEqual(CreateNeuron(**self.state).digest(), CreateNeuron(**random_neuron_state(4, 3, 5)).digest())
+
+        # CompositeGenes are equal when their children and iterations are, and parents don't matter
+        composite = CompositeGene([CreateNeuron(**self.state), RotateCells()], 2)
+        self.assertEqual(composite.digest(),
+                         CompositeGene([CreateNeuron(**self.state), RotateCells()], 2, composite).digest())
+        self.assertNotEqual(composite.digest(), CompositeGene([CreateNeuron(**self.state), RotateCells()], 3).digest())
+        self.assertNotEqual(composite.digest(), CompositeGene([RotateCells(), CreateNeuron(**self.state)], 2).digest())
+
+        # A delta is only equal to another one from an equal parent
+        mutagen = CreateNeuronMutagen(CNLayer.input_hidden, 0.9, 0)
+        delta = mutagen.mutate(CreateNeuron(**self.state))
+        self.assertNotEqual(delta.digest(), delta.parent_gene.digest())
+
+    def test_saved_with_hash(self):
+        gene = RotateCells()
+        gene_id = gene.id
+        engine = get_engine()
+        with Session(engine) as session:
+            session.add(gene)
+            session.commit()
+        with Session(engine) as session:
+            found = session.scalars(select(Gene).where(Gene.content_hash == RotateCells().digest())).all()
+            self.assertEqual([g.id for g in found], [gene_id])
+
+    def test_intern_genotype(self):
+        engine = get_engine()
+        with Session(engine) as session:
+            first = intern_genotype(CompositeGene([
+                CreateNeuron(**self.state), ConnectNeurons(1, 1), ConnectNeurons(1, 1), RotateCells()
+            ]), session)
+            # Repeats within a genotype get collapsed
+            self.assertIs(first.child_genes[1], first.child_genes[2])
+            session.add(first)
+            session.commit()
+            saved_ids = [gene.id for gene in first.child_genes]
+
+            second = intern_genotype(CompositeGene([
+                CreateNeuron(**random_neuron_state(4, 3, 5)), ConnectNeurons(1, 1), RotateCells()
+            ]), session)
+            self.assertIsNot(second, first)
+            self.assertNotEqual(second.child_genes[0].id, saved_ids[0])
+            self.assertEqual(second.child_genes[1].id, saved_ids[1])
+            self.assertEqual(second.child_genes[2].id, saved_ids[3])
+
+            # The whole thing is swapped for the saved one if that's equal
+            third = intern_genotype(CompositeGene([
+                CreateNeuron(**self.state), ConnectNeurons(1, 1), ConnectNeurons(1, 1), RotateCells()
+            ]), session)
+            self.assertIs(third, first)
+            session.add(second)
+            session.commit()
+            self.assertEqual(session.scalar(select(func.count()).select_from(ConnectNeurons)), 1)
+            self.assertEqual(session.scalar(select(func.count()).select_from(RotateCells)), 1)
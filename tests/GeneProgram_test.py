@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import Mock
+
+from numpy.random import default_rng
+from sqlalchemy.orm import Session
+
+from roxene import Gene, Organism, Neuron, random_neuron_state
+from roxene.genes import CompositeGene, ConnectNeurons, CreateInputCell, CreateNeuron, GeneProgram, RotateCells
+from roxene.genes.program import Op
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+from Phenotype_test import INPUT_NAMES, OUTPUT_NAMES
+
+SEED = 60231779
+
+
+def cell_kinds(organism: Organism):
+    kinds = []
+    index_of = {cell.id: i for i, cell in enumerate(organism.cells)}
+    for cell in organism.cells:
+        if isinstance(cell, Neuron):
+            kinds.append(("N", cell.input.shape[0], {p: index_of[c.id] for p, c in cell.bound_ports.items()}))
+        else:
+            kinds.append(("I", cell.get_output()))
+    return kinds
+
+
+class GeneProgram_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+
+    def test_compile(self):
+        create_neuron = CreateNeuron(**random_neuron_state(3, 2, 2))
+        gene = CompositeGene([
+            create_neuron,
+            CompositeGene([ConnectNeurons(1, 0), RotateCells()], iterations=3),
+            CompositeGene([CreateInputCell(0.5)]),
+            CompositeGene([RotateCells()], iterations=0),
+        ], iterations=2)
+        program = gene.program()
+        self.assertIs(program, gene.program())
+        self.assertEqual([instruction[0] for instruction in program.instructions],
+                         [Op.REPEAT, Op.CREATE_NEURON, Op.REPEAT, Op.CONNECT, Op.ROTATE, Op.CREATE_INPUT])
+        self.assertEqual(program.instructions[0], (Op.REPEAT, 2, 5))
+        self.assertEqual(program.instructions[2], (Op.REPEAT, 3, 2))
+
+    def test_nested_repeats_match_unrolled(self):
+        # The inner loop ends where the outer one does
+        rotate = RotateCells(RotateCells.Direction.FORWARD)
+        inner = [CreateNeuron(**random_neuron_state(4, 2, 3)), ConnectNeurons(2, 1), ConnectNeurons(3, 0)]
+        looped = CompositeGene([rotate, CompositeGene(inner, iterations=3)], iterations=2)
+        unrolled = CompositeGene([rotate, *inner, *inner, *inner, rotate, *inner, *inner, *inner])
+        self.assertEqual(cell_kinds(Organism(INPUT_NAMES, OUTPUT_NAMES, looped)),
+                         cell_kinds(Organism(INPUT_NAMES, OUTPUT_NAMES, unrolled)))
+
+    def test_execute_unknown_gene(self):
+        organism: Organism = Mock(Organism)
+        unknown = Mock(Gene)
+        program = GeneProgram.compile(CompositeGene([unknown], iterations=4))
+        self.assertEqual(program.instructions[1], (Op.EXECUTE, unknown))
+        program.run(organism)
+        self.assertEqual(unknown.execute.call_count, 4)
+
+    def test_run_detached(self):
+        genotype = CompositeGene([
+            CompositeGene([
+                CreateNeuron(**random_neuron_state(4, 3, 5)),
+                ConnectNeurons(1, 0),
+                ConnectNeurons(2, 1),
+                RotateCells(),
+            ], iterations=3),
+            CreateInputCell(0.25),
+        ])
+        genotype_id = genotype.id
+        expected = cell_kinds(Organism(INPUT_NAMES, OUTPUT_NAMES, genotype))
+
+        engine = get_engine()
+        with Session(engine) as session:
+            session.add(genotype)
+            session.commit()
+        with Session(engine) as session:
+            loaded = session.get(Gene, genotype_id)
+            loaded.program()
+        # Running the program doesn't need the session, even though nothing under loaded got loaded until it compiled
+        self.assertEqual(cell_kinds(Organism(INPUT_NAMES, OUTPUT_NAMES, loaded)), expected)
@@ -0,0 +1,65 @@
+import unittest
+
+import numpy as np
+from numpy.random import default_rng
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from roxene import Organism, random_neuron_state
+from roxene.genes import CompositeGene, ConnectNeurons, CreateInputCell, CreateNeuron, CreateNeuronDelta, RotateCells
+from roxene.genes.loading import load_genotype
+from roxene.mutagens import CNLayer, CreateNeuronMutagen
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+
+SEED = 83351706
+
+
+class GenotypeLoading_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        mutagen = CreateNeuronMutagen(CNLayer.input_hidden, 0.99, 0)
+        delta = mutagen.mutate(mutagen.mutate(CreateNeuron(**random_neuron_state(4, 3, 5))))
+        wiring = CompositeGene([ConnectNeurons(1, 0), RotateCells()], iterations=2)
+        self.genotype = CompositeGene([
+            CompositeGene([delta, CreateNeuron(**random_neuron_state(4, 3, 5)), wiring]),
+            wiring,
+            CreateInputCell(0.5),
+        ])
+        self.expected = Organism()
+        self.genotype.execute(self.expected)
+
+    def test_one_query(self):
+        genotype_id = self.genotype.id
+        engine = get_engine()
+        with Session(engine) as session:
+            session.add(self.genotype)
+            session.commit()
+
+        with Session(engine) as session:
+            statements = []
+            event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+            genotype = load_genotype(genotype_id, session)
+            self.assertEqual(len(statements), 1)
+
+            body, wiring, input_cell = genotype.child_genes
+            self.assertIsInstance(input_cell, CreateInputCell)
+            delta, _, shared_wiring = body.child_genes
+            self.assertIsInstance(delta, CreateNeuronDelta)
+            self.assertIs(shared_wiring, wiring)
+            self.assertEqual(wiring.iterations, 2)
+
+            # Everything needed to express it came in with the first query
+            organism = Organism()
+            genotype.execute(organism)
+            self.assertEqual(len(statements), 1)
+            self.assertEqual(len(organism.cells), len(self.expected.cells))
+            for cell, expected_cell in zip(organism.cells, self.expected.cells):
+                self.assertIs(type(cell), type(expected_cell))
+                if hasattr(cell, "input_hidden"):
+                    np.testing.assert_array_equal(cell.input_hidden.numpy(), expected_cell.input_hidden.numpy())
+
+    def test_missing(self):
+        with Session(get_engine()) as session:
+            self.assertIsNone(load_genotype(self.genotype.id, session))
@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+from numpy.random import default_rng
+
+from roxene import Organism, random_neuron_state
+from roxene.genes import CompositeGene, ConnectNeurons, CreateNeuron, RotateCells
+from roxene.genes.normalize import GenotypeShape, normalize_genotype
+from roxene.mutagens import CNLayer, CompositeGeneSplitMutagen, CreateNeuronMutagen, MutationPipeline
+from roxene.util import set_rng
+from GeneProgram_test import cell_kinds
+from Phenotype_test import INPUT_NAMES, OUTPUT_NAMES
+
+SEED = 14470023
+
+
+class GenotypeNormalization_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        self.create_neuron = CreateNeuron(**random_neuron_state(len(INPUT_NAMES), 2, 3))
+        self.wiring = CompositeGene([ConnectNeurons(1, 0), RotateCells()], iterations=4)
+
+    def test_flattens(self):
+        genotype = CompositeGene([
+            CompositeGene([self.create_neuron, CompositeGene([RotateCells()])]),
+            CompositeGene([ConnectNeurons(0, 0)], iterations=0),
+            self.wiring,
+        ])
+        normalized = normalize_genotype(genotype)
+        self.assertIs(normalized.parent_gene, genotype)
+        children = list(normalized.child_genes)
+        self.assertIs(children[0], self.create_neuron)
+        self.assertIsInstance(children[1], RotateCells)
+        self.assertIs(children[2], self.wiring)
+        self.assertEqual(len(children), 3)
+        self.assertEqual(GenotypeShape.of(genotype), GenotypeShape(3, 10))
+        self.assertEqual(GenotypeShape.of(normalized), GenotypeShape(2, 6))
+
+    def test_keeps_split_halves(self):
+        halves = CompositeGene([CompositeGene(self.wiring.child_genes, 2), CompositeGene(self.wiring.child_genes, 3)])
+        normalized = normalize_genotype(CompositeGene([self.create_neuron, halves]))
+        self.assertEqual([child.iterations for child in normalized.child_genes[1:]], [2, 3])
+
+    def test_split_halves_mutate_apart(self):
+        genotype = CompositeGene([CompositeGene([self.create_neuron], iterations=4)])
+        split = MutationPipeline([CompositeGeneSplitMutagen(1, 0)]).mutate(genotype)
+        mutated = MutationPipeline([CreateNeuronMutagen(CNLayer.hidden_output)]).mutate(split)
+        normalized = normalize_genotype(mutated)
+        # A half that runs once gets spliced in, so there are one or two composites left under the root
+        neurons = [gene for child in normalized.child_genes
+                   for gene in (child.child_genes if isinstance(child, CompositeGene) else [child])]
+        self.assertEqual(len(neurons), 2)
+        first_neuron, second_neuron = neurons
+        self.assertIsNot(first_neuron, second_neuron)
+        self.assertFalse(np.array_equal(first_neuron.hidden_output, second_neuron.hidden_output))
+
+    def test_unchanged(self):
+        genotype = CompositeGene([self.create_neuron, self.wiring])
+        self.assertIs(normalize_genotype(genotype), genotype)
+
+    def test_same_behavior_after_splits(self):
+        genotype = CompositeGene([
+            self.create_neuron,
+            CompositeGene([CreateNeuron(**random_neuron_state(len(INPUT_NAMES), 2, 3)),
+                           CompositeGene([ConnectNeurons(1, 0), ConnectNeurons(2, 0)], iterations=4)], iterations=3),
+        ])
+        pipeline = MutationPipeline([CompositeGeneSplitMutagen(1, 0)])
+        split = genotype
+        for _ in range(5):
+            split = pipeline.mutate(split)
+        self.assertGreater(GenotypeShape.of(split).depth, GenotypeShape.of(genotype).depth)
+        normalized = normalize_genotype(split)
+        self.assertLessEqual(GenotypeShape.of(normalized).depth, GenotypeShape.of(genotype).depth)
+        self.assertEqual(cell_kinds(Organism(INPUT_NAMES, OUTPUT_NAMES, normalized)),
+                         cell_kinds(Organism(INPUT_NAMES, OUTPUT_NAMES, genotype)))
@@ -0,0 +1,102 @@
+import sys
+import unittest
+
+from numpy.random import default_rng
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from roxene import Gene, Mutagen
+from roxene.genes import CompositeGene, ConnectNeurons, RotateCells
+from roxene.lineage import Lineage
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+
+SEED = 70421165
+
+
+class Lineage_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+
+    def test_generation(self):
+        root = RotateCells()
+        child = RotateCells(parent_gene=root)
+        grandchild = CompositeGene([child], parent_gene=child)
+        self.assertEqual([root.generation, child.generation, grandchild.generation], [0, 1, 2])
+
+    def test_ancestors(self):
+        chain = [ConnectNeurons(0, 0)]
+        for n in range(1, 5):
+            chain.append(ConnectNeurons(n, 0, parent_gene=chain[-1]))
+        other = ConnectNeurons(9, 9, parent_gene=chain[1])
+        ids = [gene.id for gene in chain]
+        other_id = other.id
+
+        engine = get_engine()
+        with Session(engine) as session:
+            session.add_all([chain[-1], other])
+            session.commit()
+        with Session(engine) as session:
+            lineage = Lineage()
+            self.assertEqual(lineage.ancestors(ids[-1], session), list(reversed(ids[:-1])))
+            self.assertEqual(lineage.ancestors(ids[0], session), [])
+            self.assertEqual(lineage.common_ancestor(ids[-1], other_id, session), ids[1])
+            self.assertEqual(lineage.common_ancestor(ids[2], ids[-1], session), ids[2])
+            self.assertIsNone(lineage.common_ancestor(ids[-1], RotateCells().id, session))
+
+    def test_ancestry_stop_at(self):
+        chain = [ConnectNeurons(0, 0)]
+        for n in range(1, 5):
+            chain.append(ConnectNeurons(n, 0, parent_gene=chain[-1]))
+        ids = [gene.id for gene in chain]
+
+        engine = get_engine()
+        with Session(engine) as session:
+            session.add(chain[-1])
+            session.commit()
+        with Session(engine) as session:
+            ancestry = Lineage.ancestry([ids[-1]], stop_at=select(Gene.id).where(Gene.id.in_(ids[:3]))).subquery()
+            self.assertEqual(session.execute(select(ancestry.c.id, ancestry.c.distance)
+                                             .order_by(ancestry.c.distance)).all(),
+                             [(ids[4], 0), (ids[3], 1), (ids[2], 2)])
+
+    def test_deep_lineage(self):
+        mutagen = Mutagen(0.5, 0.1)
+        generations = sys.getrecursionlimit() * 2
+        gene = RotateCells()
+        mutagen.susceptibilities[gene] = 0.25
+        for _ in range(generations):
+            gene = RotateCells(parent_gene=gene)
+        leaf_id = gene.id
+
+        engine = get_engine()
+        with Session(engine) as session:
+            session.add_all([mutagen, gene])
+            session.commit()
+            mutagen_id = mutagen.id
+        with Session(engine) as session:
+            leaf = session.get(RotateCells, leaf_id)
+            mutagen = session.get(Mutagen, mutagen_id)
+            self.assertEqual(leaf.generation, generations)
+            ancestors = Lineage().load_ancestors([leaf], session)
+            self.assertEqual(len(ancestors), generations)
+
+            statements = []
+            event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+            sus = mutagen.get_mutation_susceptibility(leaf)
+            # The parent_genes came out of the session, only the susceptibility records got loaded
+            self.assertEqual(len(statements), 1)
+            self.assertEqual(len(mutagen.susceptibilities), generations + 1)
+            self.assertGreater(sus, 0)
+
+    def test_susceptibility_from_nearest_ancestor(self):
+        mutagen = Mutagen(0.5, 0)
+        root = RotateCells()
+        middle = RotateCells(parent_gene=root)
+        leaf = RotateCells(parent_gene=RotateCells(parent_gene=middle))
+        mutagen.susceptibilities[root] = 0.1
+        mutagen.susceptibilities[middle] = 0.3
+        # No wiggle, so it's the middle's all the way down
+        self.assertEqual(mutagen.get_mutation_susceptibility(leaf), 0.3)
+        self.assertEqual(mutagen.susceptibilities[leaf.parent_gene], 0.3)
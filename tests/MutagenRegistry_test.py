@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import patch
+
+from numpy.random import default_rng
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from roxene import Mutagen, random_neuron_state
+from roxene.genes import CreateNeuron
+from roxene.mutagen import _Mutagen_Susceptibility
+from roxene.mutagens import CNLayer, CreateNeuronMutagen, MutagenRegistry
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+
+SEED = 40617263
+
+
+class MutagenRegistry_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        self.engine = get_engine()
+        self.parent = CreateNeuron(**random_neuron_state(4, 3, 5))
+        self.child = CreateNeuron(**random_neuron_state(4, 3, 5), parent_gene=self.parent)
+        mutagen = CreateNeuronMutagen(CNLayer.input_hidden, 0.01, 0.1)
+        mutagen.susceptibilities[self.parent] = 0.5
+        self.mutagen_id = mutagen.id
+        with Session(self.engine, expire_on_commit=False) as session:
+            session.add_all([mutagen, self.child])
+            session.commit()
+
+    def count_records(self):
+        with Session(self.engine) as session:
+            return session.scalar(select(func.count()).select_from(_Mutagen_Susceptibility))
+
+    def test_served_from_memory(self):
+        registry = MutagenRegistry(sessionmaker(self.engine), background=False)
+        mutagen, = registry.mutagens()
+        self.assertIs(registry.mutagens()[0], mutagen)
+        self.assertEqual(mutagen.layer_to_mutate, CNLayer.input_hidden)
+
+        with Session(self.engine) as session:
+            child = session.get(CreateNeuron, self.child.id)
+            parent = child.parent_gene
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(self.engine, "before_cursor_execute", listener)
+            self.assertEqual(mutagen.get_mutation_susceptibility(parent), 0.5)
+            child_sus = mutagen.get_mutation_susceptibility(child)
+            self.assertEqual(mutagen.get_mutation_susceptibility(child), child_sus)
+            event.remove(self.engine, "before_cursor_execute", listener)
+            self.assertEqual(statements, [])
+
+    def test_nearest_recorded_in_one_query(self):
+        chain = [self.child]
+        for _ in range(20):
+            chain.append(CreateNeuron(**random_neuron_state(4, 3, 5), parent_gene=chain[-1]))
+        ids = [gene.id for gene in chain]
+        with Session(self.engine, expire_on_commit=False) as session:
+            session.add(chain[-1])
+            session.commit()
+
+        registry = MutagenRegistry(sessionmaker(self.engine), background=False)
+        mutagen, = registry.mutagens()
+        with Session(self.engine) as session:
+            leaf = session.get(CreateNeuron, ids[-1])
+            middle = session.get(CreateNeuron, ids[10])
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            event.listen(self.engine, "before_cursor_execute", listener)
+            leaf_sus = mutagen.get_mutation_susceptibility(leaf)
+            # All the way up to the parent's recorded one in one go, and the rest are recorded on the way back down
+            self.assertEqual(len(statements), 1)
+            mutagen.get_mutation_susceptibility(middle)
+            mutagen.get_mutation_susceptibility(self.child)
+            event.remove(self.engine, "before_cursor_execute", listener)
+            self.assertEqual(len(statements), 1)
+        self.assertEqual(mutagen.get_mutation_susceptibility(leaf), leaf_sus)
+        self.assertNotEqual(leaf_sus, 0.5)
+
+    def test_write_behind(self):
+        registry = MutagenRegistry(sessionmaker(self.engine), batch_size=2, background=False)
+        mutagen, = registry.mutagens()
+        child_sus = mutagen.get_mutation_susceptibility(self.child)
+        self.assertEqual(self.count_records(), 1)
+        other = CreateNeuron(**random_neuron_state(4, 3, 5))
+        with Session(self.engine, expire_on_commit=False) as session:
+            session.add(other)
+            session.commit()
+            # A second new one fills the batch
+            mutagen.get_mutation_susceptibility(other)
+        self.assertEqual(self.count_records(), 3)
+
+        other_sus = mutagen.get_mutation_susceptibility(other)
+        registry.reload()
+        mutagen, = registry.mutagens()
+        self.assertEqual(mutagen.get_mutation_susceptibility(self.child), child_sus)
+        with Session(self.engine) as session:
+            saved = session.get(Mutagen, self.mutagen_id)
+            self.assertEqual({gene.id: sus for gene, sus in saved.susceptibilities.items()},
+                             {self.parent.id: 0.5, self.child.id: child_sus, other.id: other_sus})
+
+    def test_flush_raises_every_failed_write(self):
+        registry = MutagenRegistry(sessionmaker(self.engine), batch_size=1)
+        mutagen, = registry.mutagens()
+        other = CreateNeuron(**random_neuron_state(4, 3, 5))
+        # The first batch fails, the one after it goes through
+        with patch.object(registry, "_write", side_effect=[RuntimeError("first"), None]) as write:
+            mutagen.get_mutation_susceptibility(self.child)
+            mutagen.get_mutation_susceptibility(other)
+            with self.assertLogs("roxene.mutagens.registry", "ERROR"):
+                with self.assertRaisesRegex(RuntimeError, "first"):
+                    registry.flush()
+            self.assertEqual(write.call_count, 2)
+            # Only raised the once
+            registry.flush()
+        registry.close()
@@ -2,8 +2,9 @@ import unittest
 from numpy.random import default_rng
 
 from roxene import random_neuron_state
-from roxene.genes import CreateNeuron
+from roxene.genes import CompositeGene, CreateNeuron
 from roxene.mutagens import CreateNeuronMutagen, CNLayer
+from roxene.util import set_rng
 
 class Mutagen_test(unittest.TestCase):
 
@@ -37,3 +38,24 @@ class Mutagen_test(unittest.TestCase):
         self.assertNotEqual(grandparent_val, parent_val)
         self.assertNotEqual(parent_val, child_val)
 
+    def test_prune_susceptibilities(self):
+        set_rng(default_rng(7))
+        mutagen = CreateNeuronMutagen(CNLayer.input_hidden, 0.05, 0.1)
+        grandparent = CreateNeuron(**random_neuron_state(10, 10, 10))
+        parent = CreateNeuron(**random_neuron_state(10, 10, 10), parent_gene=grandparent)
+        child = CreateNeuron(**random_neuron_state(10, 10, 10), parent_gene=parent)
+        other = CreateNeuron(**random_neuron_state(10, 10, 10))
+        parent_val = mutagen.get_mutation_susceptibility(parent)
+        mutagen.get_mutation_susceptibility(other)
+
+        # The child gets its own first, so it doesn't need its ancestors' anymore
+        # CreateNeuronMutagen never looks at CompositeGenes, so the composite doesn't get one
+        composite = CompositeGene([parent, child])
+        self.assertEqual(mutagen.prune_susceptibilities([composite, parent, child]), 2)
+        self.assertNotIn(composite, mutagen.susceptibilities)
+        self.assertEqual(set(mutagen.susceptibilities), {parent, child})
+        self.assertEqual(mutagen.susceptibilities[parent], parent_val)
+        child_val = mutagen.susceptibilities[child]
+        grandchild = CreateNeuron(**random_neuron_state(10, 10, 10), parent_gene=child)
+        self.assertNotEqual(mutagen.get_mutation_susceptibility(grandchild), child_val)
+        self.assertEqual(mutagen.prune_susceptibilities([]), 3)
@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+from numpy.random import default_rng
+
+from roxene import Mutagen, random_neuron_state
+from roxene.genes import CompositeGene, ConnectNeurons, CreateNeuron, CreateNeuronDelta, RotateCells
+from roxene.mutagens import CNLayer, CompositeGeneSplitMutagen, CreateNeuronMutagen, MutationPipeline
+from roxene.util import set_rng
+
+SEED = 51260087
+
+
+class MutationPipeline_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        self.create_neuron = CreateNeuron(**random_neuron_state(10, 5, 10))
+        self.wiring = CompositeGene([ConnectNeurons(1, 0), RotateCells()], iterations=3)
+        self.genotype = CompositeGene([self.create_neuron, self.wiring])
+
+    def test_shares_unchanged_subtrees(self):
+        mutant = MutationPipeline([CreateNeuronMutagen(CNLayer.hidden_output)]).mutate(self.genotype)
+        self.assertIsNot(mutant, self.genotype)
+        self.assertIs(mutant.parent_gene, self.genotype)
+        mutant_neuron, mutant_wiring = mutant.child_genes
+        self.assertIs(mutant_wiring, self.wiring)
+        self.assertIs(mutant_neuron.parent_gene, self.create_neuron)
+        self.assertIs(mutant_neuron.input_hidden, self.create_neuron.input_hidden)
+        self.assertFalse(np.array_equal(mutant_neuron.hidden_output, self.create_neuron.hidden_output))
+
+    def test_nothing_changed(self):
+        # Every value is kept when the draws all come in under the susceptibility
+        mutagens = [CreateNeuronMutagen(layer, 1.0, 0) for layer in CNLayer]
+        self.assertIs(MutationPipeline(mutagens).mutate(self.genotype), self.genotype)
+
+    def test_one_gene_per_neuron(self):
+        mutagens = [CreateNeuronMutagen(layer) for layer in (CNLayer.input_hidden, CNLayer.hidden_output)] * 3
+        mutant = MutationPipeline(mutagens).mutate(self.genotype)
+        mutant_neuron = mutant.child_genes[0]
+        # All six applied to the original, no intermediate genes in between
+        self.assertIs(mutant_neuron.parent_gene, self.create_neuron)
+        for mutagen in mutagens:
+            self.assertIn(self.create_neuron, mutagen.susceptibilities)
+            self.assertNotIn(mutant_neuron, mutagen.susceptibilities)
+        self.assertFalse(np.array_equal(mutant_neuron.input_hidden, self.create_neuron.input_hidden))
+        self.assertFalse(np.array_equal(mutant_neuron.hidden_output, self.create_neuron.hidden_output))
+        self.assertIs(mutant_neuron.feedback_hidden, self.create_neuron.feedback_hidden)
+
+    def test_routes_by_gene_type(self):
+        split = CompositeGeneSplitMutagen(1, 0)
+        mutant = MutationPipeline([split, CreateNeuronMutagen(CNLayer.input_initial_value)]).mutate(self.genotype)
+        mutant_neuron, mutant_wiring = mutant.child_genes
+        self.assertIsInstance(mutant_neuron, CreateNeuronDelta)
+        # The split halves share the original children
+        self.assertEqual(len(mutant_wiring.child_genes), 2)
+        self.assertEqual(sum(half.iterations for half in mutant_wiring.child_genes), 3)
+        for half in mutant_wiring.child_genes:
+            self.assertEqual([child.id for child in half.child_genes], [child.id for child in self.wiring.child_genes])
+        # Only the CompositeGenes were offered to the split mutagen
+        self.assertNotIn(self.create_neuron, split.susceptibilities)
+
+    def test_unrouted_mutagens(self):
+        mutant = MutationPipeline([Mutagen(0.1, 0.1)]).mutate(self.genotype)
+        self.assertIs(mutant, self.genotype)
+
+    def test_mutates_each_occurrence(self):
+        genotype = CompositeGene([self.create_neuron, self.create_neuron])
+        first, second = MutationPipeline([CreateNeuronMutagen(CNLayer.hidden_output)]).mutate(genotype).child_genes
+        self.assertIs(first.parent_gene, self.create_neuron)
+        self.assertIs(second.parent_gene, self.create_neuron)
+        self.assertIsNot(first, second)
+        self.assertFalse(np.array_equal(first.hidden_output, second.hidden_output))
+
+    def test_split_susceptibility_from_original(self):
+        wiring = CompositeGene([self.create_neuron, ConnectNeurons(1, 0)], iterations=3)
+        split = CompositeGeneSplitMutagen(1, 0)
+        mutant = MutationPipeline([split, CreateNeuronMutagen(CNLayer.hidden_output)]).mutate(wiring)
+        # The children changed first, then the new composite was split
+        self.assertIs(mutant.parent_gene.parent_gene, wiring)
+        self.assertEqual(len(mutant.child_genes), 2)
+        self.assertIn(wiring, split.susceptibilities)
+        self.assertNotIn(mutant.parent_gene, split.susceptibilities)
+
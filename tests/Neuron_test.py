@@ -5,6 +5,7 @@ import torch
 from numpy.random import default_rng
 # // maya smells...fine
 from parameterized import parameterized
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
 from roxene import InputCell, Neuron, random_neuron_state
@@ -166,6 +167,31 @@ class Neuron_test(unittest.TestCase):
             np.testing.assert_array_equal(n3_feedback, n2_feedback)
             self.assertEqual(n3_output, n2_output)
 
+    def test_save_state_only(self):
+        engine = get_engine()
+        neuron = Neuron(**random_neuron_state(rng=default_rng(SEED)))
+        nid = neuron.id
+        with Session(engine) as session:
+            session.add(neuron)
+            session.commit()
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with Session(engine) as session:
+            neuron = session.get(Neuron, nid)
+            neuron.update()
+            event.listen(engine, "before_cursor_execute", count_statement)
+            try:
+                session.commit()
+            finally:
+                event.remove(engine, "before_cursor_execute", count_statement)
+        # Updating the runtime state doesn't touch the weights
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith("UPDATE neuron_state "))
+
     def test_save_linked_neurons(self):
         engine = get_engine()
         set_rng(default_rng(SEED))
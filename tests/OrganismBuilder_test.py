@@ -0,0 +1,59 @@
+import unittest
+
+from numpy.random import default_rng
+from sqlalchemy.orm import Session
+
+from roxene import Organism
+from roxene.builder import OrganismBuilder
+from roxene.genes import CompositeGene, CreateInputCell, RotateCells
+from roxene.util import set_rng
+from tic_tac_toe.util import get_engine
+from GeneProgram_test import cell_kinds
+from Phenotype_test import build_genotype, INPUT_NAMES, OUTPUT_NAMES
+
+SEED = 93810427
+
+
+class OrganismBuilder_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        self.genotype = CompositeGene([
+            CreateInputCell(0.75),
+            build_genotype(),
+            RotateCells(RotateCells.Direction.FORWARD),
+        ])
+
+    def test_matches_organism(self):
+        # Run the genes straight against the Organism's ORM collections, the way they used to be
+        direct = Organism(INPUT_NAMES, OUTPUT_NAMES)
+        self.genotype.execute(direct)
+        built = Organism(INPUT_NAMES, OUTPUT_NAMES, self.genotype)
+        self.assertEqual(cell_kinds(direct), cell_kinds(built))
+        self.assertEqual(list(direct.unused_output_names), list(built.unused_output_names))
+        direct_index = {cell.id: i for i, cell in enumerate(direct.cells)}
+        built_index = {cell.id: i for i, cell in enumerate(built.cells)}
+        self.assertEqual({name: direct_index[neuron.id] for name, neuron in direct.outputs.items()},
+                         {name: built_index[neuron.id] for name, neuron in built.outputs.items()})
+
+    def test_untouched_until_materialized(self):
+        organism = Organism(INPUT_NAMES, OUTPUT_NAMES)
+        input_cells = list(organism.cells)
+        builder = OrganismBuilder(organism)
+        self.genotype.execute(builder)
+        self.assertEqual(list(organism.cells), input_cells)
+        self.assertEqual(len(organism.outputs), 0)
+        builder.materialize()
+        self.assertEqual(len(organism.cells), len(builder.cells))
+        self.assertEqual(set(organism.outputs.keys()), set(OUTPUT_NAMES))
+
+    def test_persistence(self):
+        organism = Organism(INPUT_NAMES, OUTPUT_NAMES, self.genotype)
+        organism_id = organism.id
+        expected = cell_kinds(organism)
+        engine = get_engine()
+        with Session(engine) as session:
+            session.add(organism)
+            session.commit()
+        with Session(engine) as session:
+            self.assertEqual(cell_kinds(session.get(Organism, organism_id)), expected)
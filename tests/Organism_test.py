@@ -2,11 +2,13 @@ from unittest import TestCase
 from unittest.mock import Mock
 from uuid import UUID
 
+import torch
 from numpy.random import default_rng, Generator
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
 
 from roxene import Gene, Organism, random_neuron_state, Neuron
+from roxene.builder import OrganismBuilder
 from roxene.genes import CreateNeuron, CompositeGene
 from roxene.persistence import EntityBase
 
@@ -19,7 +21,11 @@ class Organism_test(TestCase):
         root_gene = Mock(Gene)
         organism = Organism(genotype=root_gene)
         print(root_gene.method_calls)
-        root_gene.execute.assert_called_once_with(organism)
+        # Genes run against a builder standing in for the Organism
+        root_gene.execute.assert_called_once()
+        builder = root_gene.execute.call_args.args[0]
+        self.assertIsInstance(builder, OrganismBuilder)
+        self.assertIs(builder.organism, organism)
 
     def test_constructor_input_output_names(self):
         input_names = {'I_0', 'I_1', 'I_2'}
@@ -57,11 +63,13 @@ class Organism_test(TestCase):
 
         # Function to generate side effect function
         def side_effect_func(i):
-            return lambda: update_order.append(i)
+            return lambda *args: update_order.append(i)
 
         for i, mock_neuron in enumerate(mock_neurons):
-            # Each time update is called, append the index to update_order
-            mock_neuron.update.side_effect = side_effect_func(i)
+            # Each time step is called, append the index to update_order
+            mock_neuron.step.side_effect = side_effect_func(i)
+            mock_neuron.bound_ports = {}
+            mock_neuron.output.tensor = torch.zeros(1)
             organism.addNeuron(mock_neuron)
 
         # Call update on the Organism
@@ -71,9 +79,9 @@ class Organism_test(TestCase):
         expected_order = list(reversed(range(5)))
         self.assertEqual(update_order, expected_order)
 
-        # Verify that update was called once on each mock Neuron
+        # Verify that step was called once on each mock Neuron
         for mock_neuron in mock_neurons:
-            mock_neuron.update.assert_called_once()
+            mock_neuron.step.assert_called_once()
 
     def test_save_organism_inputs(self):
 
@@ -246,3 +254,38 @@ class Organism_test(TestCase):
             o5 = session.get(Organism, org_id)
             self.assertFalse(o5 is None)
             self.assertEqual(len(o5.unused_output_names), 0)
+
+    def test_simulation(self):
+        rng: Generator = default_rng(SEED)
+        engine = create_engine("sqlite://")
+        EntityBase.metadata.create_all(engine)
+
+        organism = Organism(input_names=['A'], output_names=['B'])
+        for n in range(2):
+            organism.addNeuron(Neuron(**random_neuron_state(rng=rng)))
+        oid = UUID(organism.id.hex)
+
+        with Session(engine) as session:
+            with session.begin():
+                session.add(organism)
+
+        with Session(engine) as session:
+            with session.begin():
+                organism = session.get(Organism, oid)
+                neurons = [cell for cell in organism.cells if isinstance(cell, Neuron)]
+                organism.set_input('A', 0.5)
+                with organism.simulation():
+                    with organism.simulation():
+                        for _ in range(3):
+                            organism.update()
+                    self.assertTrue(organism._simulating)
+                    self.assertFalse(any(neuron._state in session.dirty for neuron in neurons))
+                self.assertFalse(organism._simulating)
+                self.assertTrue(all(neuron._state in session.dirty for neuron in neurons))
+                outputs = {neuron.id: neuron.output.numpy().copy() for neuron in neurons}
+
+        with Session(engine) as session:
+            organism = session.get(Organism, oid)
+            for cell in organism.cells:
+                if isinstance(cell, Neuron):
+                    self.assertTrue(torch.equal(cell.output.tensor, torch.tensor(outputs[cell.id])))
@@ -0,0 +1,160 @@
+import threading
+import unittest
+
+import torch
+from numpy.random import default_rng
+
+from roxene import Organism, random_neuron_state
+from roxene.batch import PhenotypeBatch, BatchStepper
+from roxene.genes import CompositeGene, ConnectNeurons, CreateNeuron
+from roxene.util import set_rng
+from Phenotype_test import build_genotype, INPUT_NAMES, OUTPUT_NAMES
+
+SEED = 31337011
+
+NUM_ORGANISMS = 4
+
+
+def build_other_genotype() -> CompositeGene:
+    # A different shape of Neuron than build_genotype() uses, so not everything lands in one bucket
+    return CompositeGene([
+        CreateNeuron(**random_neuron_state(3, 2, 7)),
+        ConnectNeurons(1, 0),
+        ConnectNeurons(2, 1),
+        ConnectNeurons(3, 2),
+    ], iterations=4)
+
+
+class PhenotypeBatch_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        genotypes = [build_genotype() if n % 2 else build_other_genotype() for n in range(NUM_ORGANISMS)]
+        self.solo = [Organism(INPUT_NAMES, OUTPUT_NAMES, g) for g in genotypes]
+        self.batched = [Organism(INPUT_NAMES, OUTPUT_NAMES, g) for g in genotypes]
+        rng = default_rng(SEED)
+        for solo, batched in zip(self.solo, self.batched):
+            for name in INPUT_NAMES:
+                value = rng.uniform(-1, 1)
+                solo.set_input(name, value)
+                batched.set_input(name, value)
+            solo.compile()
+            batched.compile()
+
+    def assertOutputsMatch(self, solo: Organism, batched: Organism):
+        for name in solo.outputs.keys():
+            self.assertAlmostEqual(float(solo.get_output(name)), float(batched.get_output(name)), 3)
+
+    def test_update(self):
+        batch = PhenotypeBatch([o.phenotype for o in self.batched])
+        for _ in range(10):
+            for organism in self.solo:
+                organism.update()
+            batch.update()
+            for solo, batched in zip(self.solo, self.batched):
+                self.assertOutputsMatch(solo, batched)
+
+    def test_update_some(self):
+        batch = PhenotypeBatch([o.phenotype for o in self.batched])
+        for n in range(10):
+            active = [i for i in range(NUM_ORGANISMS) if (i + n) % 3]
+            for i in active:
+                self.solo[i].update()
+            batch.update([self.batched[i].phenotype for i in active])
+            for solo, batched in zip(self.solo, self.batched):
+                self.assertOutputsMatch(solo, batched)
+
+    def test_set_input_while_batched(self):
+        batch = PhenotypeBatch([o.phenotype for o in self.batched])
+        self.solo[1].set_input(INPUT_NAMES[0], 0.75)
+        self.batched[1].set_input(INPUT_NAMES[0], 0.75)
+        for _ in range(3):
+            for organism in self.solo:
+                organism.update()
+            batch.update()
+        self.assertOutputsMatch(self.solo[1], self.batched[1])
+
+    def test_write_back(self):
+        batch = PhenotypeBatch([o.phenotype for o in self.batched])
+        for _ in range(3):
+            for organism in self.solo:
+                organism.update()
+            batch.update()
+        for solo, batched in zip(self.solo, self.batched):
+            solo.decompile()
+            batched.decompile()
+            for solo_cell, batched_cell in zip(solo.cells, batched.cells):
+                if hasattr(solo_cell, 'feedback'):
+                    torch.testing.assert_close(batched_cell.feedback.tensor, solo_cell.feedback.tensor,
+                                               atol=1e-3, rtol=0)
+
+    def test_stepper(self):
+        stepper = BatchStepper(max_wait=1.)
+        num_ticks = [5, 10, 20, 40]
+
+        def run(organism, ticks, barrier):
+            with stepper.attached(organism.phenotype):
+                barrier.wait()
+                for _ in range(ticks):
+                    organism.update()
+
+        # Don't start ticking until everybody's attached
+        barrier = threading.Barrier(NUM_ORGANISMS)
+
+        threads = [threading.Thread(target=run, args=(organism, ticks, barrier))
+                   for organism, ticks in zip(self.batched, num_ticks)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for organism, ticks in zip(self.solo, num_ticks):
+            for _ in range(ticks):
+                organism.update()
+        for solo, batched in zip(self.solo, self.batched):
+            self.assertOutputsMatch(solo, batched)
+
+        self.assertEqual(stepper.ticks_run, sum(num_ticks))
+        # Nobody should have had to wait out max_wait, they all kept asking for ticks until they detached
+        self.assertEqual(stepper.rounds_run, max(num_ticks))
+
+    def test_stepper_reattach(self):
+        stepper = BatchStepper(max_wait=0.01)
+        solo, batched = self.solo[:2], [o.phenotype for o in self.batched[:2]]
+
+        def tick():
+            # Both attached, so the round runs once both have asked for it
+            threads = [threading.Thread(target=p.update) for p in batched]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for organism in solo:
+                organism.update()
+
+        for phenotype in batched:
+            stepper.attach(phenotype)
+        tick()
+        batch = stepper._batch
+
+        # Inputs set while attached go through the stepper and survive it rebuilding the batch
+        for phenotype in batched:
+            stepper.detach(phenotype)
+        stepper.attach(batched[0])
+        batched[0].set_input(INPUT_NAMES[0], 0.75)
+        solo[0].set_input(INPUT_NAMES[0], 0.75)
+        stepper.attach(batched[1])
+        tick()
+        self.assertIs(stepper._batch, batch)
+
+        stepper.detach(batched[1])
+        stepper.attach(self.batched[2].phenotype)
+        stepper.attach(batched[1])
+        stepper.detach(self.batched[2].phenotype)
+        self.assertTrue(stepper._stale)
+        tick()
+        self.assertIsNot(stepper._batch, batch)
+
+        for s, b in zip(solo, self.batched[:2]):
+            self.assertOutputsMatch(s, b)
+        self.assertEqual(stepper.rounds_run, 3)
@@ -0,0 +1,140 @@
+import unittest
+
+import numpy as np
+import torch
+from numpy.random import default_rng
+
+from roxene import Organism, random_neuron_state
+from roxene.convergence import ConvergenceMonitor
+from roxene.genes import CompositeGene, ConnectNeurons, CreateNeuron, RotateCells
+from roxene.precision import HALF_PRECISION
+from roxene.util import set_rng
+
+SEED = 4418923
+
+INPUT_NAMES = ['A', 'B', 'C']
+OUTPUT_NAMES = ['X', 'Y', 'Z', 'W']
+
+
+def build_genotype() -> CompositeGene:
+    # Wire Neurons to the inputs and to each other, both ahead of and behind themselves in the cells list
+    return CompositeGene([
+        CompositeGene([
+            CreateNeuron(**random_neuron_state(4, 3, 5)),
+            ConnectNeurons(1, 0),
+            ConnectNeurons(2, 1),
+            ConnectNeurons(-1, 2),
+            RotateCells(),
+        ], iterations=2),
+        CreateNeuron(**random_neuron_state(4, 3, 5)),
+        ConnectNeurons(1, 0),
+        ConnectNeurons(4, 1),
+        CreateNeuron(**random_neuron_state(6, 2, 3)),
+        ConnectNeurons(0, 0),
+        ConnectNeurons(1, 1),
+        ConnectNeurons(2, 2),
+        ConnectNeurons(5, 3),
+    ])
+
+
+class Phenotype_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        genotype = build_genotype()
+        # Storage and compute the same, so the Phenotype has nothing to round differently
+        self.reference = Organism(INPUT_NAMES, OUTPUT_NAMES, genotype, HALF_PRECISION)
+        self.compiled = Organism(INPUT_NAMES, OUTPUT_NAMES, genotype, HALF_PRECISION)
+
+    def set_inputs(self, rng):
+        for name in INPUT_NAMES:
+            value = rng.uniform(-1, 1)
+            self.reference.set_input(name, value)
+            self.compiled.set_input(name, value)
+
+    def test_levels(self):
+        phenotype = self.compiled.compile()
+        # The last Neuron listens to the one just before it, so they can't share a level
+        self.assertGreater(len(phenotype.levels), 1)
+
+    def test_update_matches_organism(self):
+        rng = default_rng(SEED)
+        self.set_inputs(rng)
+        self.compiled.compile()
+        for _ in range(20):
+            self.reference.update()
+            self.compiled.update()
+            for name in OUTPUT_NAMES:
+                self.assertAlmostEqual(float(self.reference.get_output(name)),
+                                       float(self.compiled.get_output(name)), 2)
+            self.set_inputs(rng)
+
+    def test_write_back(self):
+        rng = default_rng(SEED)
+        self.set_inputs(rng)
+        self.compiled.compile()
+        for _ in range(5):
+            self.reference.update()
+            self.compiled.update()
+        self.compiled.decompile()
+
+        for ref_cell, compiled_cell in zip(self.reference.cells, self.compiled.cells):
+            if hasattr(ref_cell, 'feedback'):
+                torch.testing.assert_close(compiled_cell.input.tensor, ref_cell.input.tensor, atol=1e-2, rtol=0)
+                torch.testing.assert_close(compiled_cell.feedback.tensor, ref_cell.feedback.tensor, atol=1e-2, rtol=0)
+                torch.testing.assert_close(compiled_cell.output.tensor, ref_cell.output.tensor, atol=1e-2, rtol=0)
+
+        # Back on the Neurons now
+        self.reference.update()
+        self.compiled.update()
+        for name in OUTPUT_NAMES:
+            self.assertAlmostEqual(float(self.reference.get_output(name)),
+                                   float(self.compiled.get_output(name)), 2)
+
+    def check_run_until(self, compile: bool, fuse: bool = False):
+        rng = default_rng(SEED)
+        self.set_inputs(rng)
+        if compile:
+            self.reference.compile()
+            self.compiled.compile()
+            if fuse:
+                self.compiled.phenotype.fuse(backend="eager")
+
+        # Tick the reference one at a time to find a target the output first reaches some way in
+        trace = []
+        for _ in range(40):
+            self.reference.update()
+            trace.append(self.reference.get_output('X'))
+        target = max(trace)
+        expected_steps = trace.index(target) + 1
+
+        steps = self.compiled.run_until('X', lambda x: x >= target, 100)
+        self.assertEqual(steps, expected_steps)
+
+        # And it's left in the same state as ticking that many times would
+        for _ in range(40 - expected_steps):
+            self.compiled.update()
+        np.testing.assert_array_equal(self.compiled.get_state(), self.reference.get_state())
+
+        # Never true, so it runs right up to max_steps
+        self.assertEqual(self.compiled.run_until('X', lambda x: x > 2, 75), 75)
+        for _ in range(75):
+            self.reference.update()
+        np.testing.assert_array_equal(self.compiled.get_state(), self.reference.get_state())
+
+    def test_run_until(self):
+        self.check_run_until(compile=True)
+
+    def test_run_until_uncompiled(self):
+        self.check_run_until(compile=False)
+
+    def test_run_until_fused(self):
+        self.check_run_until(compile=True, fuse=True)
+
+    def test_run_until_monitor(self):
+        self.compiled.compile()
+        monitor = ConvergenceMonitor(tolerance=float('inf'))
+        # Everything looks like a fixed point to this monitor, so it stops as soon as it has two states to
+        # compare, after the first chunk of 1 tick and the next of 2
+        self.assertEqual(self.compiled.run_until('X', lambda x: x > 2, 100, monitor), 3)
+        self.assertEqual(monitor.reason, ConvergenceMonitor.FIXED_POINT)
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+import torch
+from numpy.random import default_rng
+
+from roxene import Organism, Neuron, random_neuron_state
+from roxene.backend import get_backend, set_backend
+from roxene.precision import Precision, DEFAULT_PRECISION
+from roxene.util import set_rng
+from Phenotype_test import build_genotype, INPUT_NAMES, OUTPUT_NAMES
+
+SEED = 91200417
+
+
+class Precision_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        self.original_backend = get_backend()
+
+    def tearDown(self):
+        set_backend(self.original_backend.name)
+
+    def test_default(self):
+        self.assertEqual(DEFAULT_PRECISION, Precision(np.float16, np.float32))
+        neuron = Neuron(**random_neuron_state(3, 4, 5))
+        self.assertEqual(neuron.hidden_output.dtype, torch.float16)
+
+    def test_storage(self):
+        organism = Organism(INPUT_NAMES, OUTPUT_NAMES, build_genotype(), Precision(storage=np.float32))
+        for neuron in organism.outputs.values():
+            self.assertEqual(neuron.input_hidden.dtype, torch.float32)
+        self.assertEqual(organism.wiring.outputs.dtype, torch.float32)
+
+    def test_phenotype_computes_in_compute_dtype(self):
+        genotype = build_genotype()
+        compiled = Organism(INPUT_NAMES, OUTPUT_NAMES, genotype)
+        plain = Organism(INPUT_NAMES, OUTPUT_NAMES, genotype)
+        phenotype = compiled.compile()
+        self.assertEqual(phenotype.outputs.dtype, torch.float32)
+        for buckets in phenotype.levels:
+            for bucket in buckets:
+                self.assertEqual(bucket.hidden_weights.dtype, torch.float32)
+
+        for _ in range(10):
+            compiled.update()
+            plain.update()
+        for name in OUTPUT_NAMES:
+            # The Phenotype never rounds to float16 between ticks, the plain Organism does every tick
+            self.assertAlmostEqual(float(compiled.get_output(name)), float(plain.get_output(name)), 1)
+
+        compiled.decompile()
+        for neuron in compiled.outputs.values():
+            self.assertEqual(neuron.feedback.dtype, torch.float16)
+
+    def test_bfloat16(self):
+        organism = Organism(INPUT_NAMES, OUTPUT_NAMES, build_genotype(), Precision(compute="bfloat16"))
+        organism.update()
+        phenotype = organism.compile()
+        self.assertEqual(phenotype.outputs.dtype, torch.bfloat16)
+        phenotype.update()
+        self.assertTrue(np.isfinite(organism.get_output(OUTPUT_NAMES[0])))
+
+    def test_bfloat16_needs_torch(self):
+        set_backend("numpy")
+        organism = Organism(INPUT_NAMES, OUTPUT_NAMES, build_genotype(), Precision(compute="bfloat16"))
+        with self.assertRaises(ValueError):
+            organism.compile()
+
+    def test_random_neuron_state_dtype(self):
+        state = random_neuron_state(2, 3, 4, dtype=np.float32)
+        for value in state.values():
+            self.assertEqual(value.dtype, np.float32)
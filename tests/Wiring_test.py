@@ -0,0 +1,52 @@
+import unittest
+
+from numpy.random import default_rng
+
+from roxene import Organism, Neuron, random_neuron_state
+from roxene.util import set_rng
+from Phenotype_test import build_genotype, INPUT_NAMES, OUTPUT_NAMES
+
+SEED = 67305221
+
+
+class Wiring_test(unittest.TestCase):
+
+    def setUp(self):
+        set_rng(default_rng(SEED))
+        genotype = build_genotype()
+        self.wired = Organism(INPUT_NAMES, OUTPUT_NAMES, genotype)
+        self.unwired = Organism(INPUT_NAMES, OUTPUT_NAMES, genotype)
+
+    def test_slots(self):
+        wiring = self.wired.wiring
+        self.assertEqual(len(wiring.outputs), len(self.wired.cells))
+        for nw in wiring.neurons:
+            self.assertIs(wiring.cells[nw.slot], nw.neuron)
+            for port, source in zip(nw.ports, nw.sources):
+                self.assertIs(nw.neuron.bound_ports[port], wiring.cells[source])
+
+    def test_update_matches_neuron_update(self):
+        rng = default_rng(SEED)
+        for _ in range(10):
+            for name in INPUT_NAMES:
+                value = rng.uniform(-1, 1)
+                self.wired.set_input(name, value)
+                self.unwired.set_input(name, value)
+
+            self.wired.update()
+            # The old way, one Neuron at a time, each reading its own bound ports
+            for cell in self.unwired.cells:
+                if isinstance(cell, Neuron):
+                    cell.update()
+
+            for wired_cell, unwired_cell in zip(self.wired.cells, self.unwired.cells):
+                if isinstance(wired_cell, Neuron):
+                    self.assertEqual(wired_cell.input, unwired_cell.input.tensor)
+                    self.assertEqual(wired_cell.feedback, unwired_cell.feedback.tensor)
+                    self.assertEqual(wired_cell.output, unwired_cell.output.tensor)
+
+    def test_rewire_after_add_neuron(self):
+        wiring = self.wired.wiring
+        self.wired.addNeuron(Neuron(**random_neuron_state(4, 3, 5)))
+        self.assertIsNot(self.wired.wiring, wiring)
+        self.assertEqual(len(self.wired.wiring.outputs), len(wiring.outputs) + 1)
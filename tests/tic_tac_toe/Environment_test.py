@@ -1,13 +1,23 @@
 import logging
 import unittest
+from unittest.mock import patch
 
+import numpy as np
+import torch
 from numpy.random import default_rng
-from sqlalchemy import Engine, select
+from sqlalchemy import Engine, event, func, select
 from sqlalchemy.orm import Session
 
-from roxene import Organism
+from roxene import Mutagen, Organism
+from roxene.cells import InputCell, Neuron
+from roxene.genes import ConnectNeurons, CreateNeuron, RotateCells
+from roxene.genes.create_neuron import NEURON_GENES
+from roxene.genes.loading import load_genotypes
 from roxene.mutagens import CreateNeuronMutagen, CNLayer
+from roxene.precision import Precision
 from roxene.tic_tac_toe import Trial, Player, Environment, Outcome
+from roxene.tic_tac_toe.move import Move
+from roxene.tic_tac_toe.players import REQUIRED_INPUTS, REQUIRED_OUTPUTS
 from roxene.util import set_rng
 from util import get_engine
 
@@ -21,7 +31,7 @@ class Environment_test(unittest.TestCase):
     def setUp(self):
         set_rng(default_rng(seed=SEED))
 
-    def test_get_relevant_moves(self):
+    def test_complete_trial_saves_moves(self):
         engine: Engine = get_engine()
 
         environment: Environment = Environment(engine)
@@ -41,8 +51,10 @@ class Environment_test(unittest.TestCase):
         environment.complete_trial(trial_2)
 
         with Session(engine) as session:
-            self.assertEqual(5, len(list(environment.get_relevant_moves([o1_id], session))))
-            self.assertEqual(4, len(list(environment.get_relevant_moves([o2_id, o3_id], session))))
+            def count_moves(*organism_ids):
+                return session.scalar(select(func.count()).select_from(Move).where(Move.organism_id.in_(organism_ids)))
+            self.assertEqual(5, count_moves(o1_id))
+            self.assertEqual(4, count_moves(o2_id, o3_id))
 
 
     def test_start_and_run_trial(self):
@@ -66,6 +78,83 @@ class Environment_test(unittest.TestCase):
         self.assertTrue(ended, "Trial should have ended in a win or loss")
 
 
+    def test_complete_trial_writes_results(self):
+        engine = get_engine()
+        env = Environment(engine)
+        env.populate(2)
+        trial = env.start_trial()
+        trial.run(timeout=100)
+
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            env.complete_trial(trial)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+        self.assertTrue(any(statement.startswith("UPDATE input_cell") for statement in statements))
+        # The trial, its players, its moves, the inputs, the neurons' state and the fitness of two organisms at most
+        self.assertLessEqual(len(statements), 9)
+
+        with Session(engine) as session:
+            self.assertIsNotNone(session.get(Trial, trial.id).end_date)
+            self.assertEqual(len(trial.moves), session.scalar(select(func.count(Move.id))))
+            for player in trial.participants:
+                for name, cell in player.organism.inputs.items():
+                    self.assertEqual(session.get(InputCell, cell.id).value, cell.value, name)
+                for neuron in player.organism.outputs.values():
+                    saved = session.get(Neuron, neuron.id)
+                    self.assertTrue(torch.equal(saved.output.tensor, neuron.output.tensor))
+                    self.assertTrue(torch.equal(saved.feedback.tensor, neuron.feedback.tensor))
+
+
+    def test_trials_lease_organisms(self):
+        env = Environment(get_engine())
+        env.populate(4)
+        trial_1, trial_2 = env.start_trial(), env.start_trial()
+        leased = {player.organism.id for trial in (trial_1, trial_2) for player in trial.participants}
+        self.assertEqual(4, len(leased))
+        with self.assertRaises(ValueError):
+            env.start_trial()
+
+        trial_1.run(timeout=10)
+        env.complete_trial(trial_1)
+        trial_3 = env.start_trial()
+        self.assertEqual({player.organism.id for player in trial_3.participants},
+                         {player.organism.id for player in trial_1.participants})
+
+
+    def test_failed_trial_abandoned(self):
+        engine = get_engine()
+        env = Environment(engine)
+        env.populate(2)
+        with patch.object(Trial, "run", side_effect=RuntimeError("crashed")):
+            with self.assertRaises(RuntimeError):
+                env.run_trial(timeout=10)
+        with Session(engine) as session:
+            self.assertEqual(0, session.scalar(select(func.count()).select_from(Trial)))
+            self.assertEqual(0, session.scalar(select(func.count()).select_from(Player)))
+
+        # Its organisms are free for the next one
+        trial = env.run_trial(timeout=10)
+        self.assertIsNotNone(trial.end_date)
+
+    def test_precision(self):
+        precision = Precision(storage=np.float32, compute=np.float32)
+        env = Environment(get_engine(), precision)
+        env.populate(2)
+        trial = env.start_trial()
+        for player in trial.participants:
+            self.assertEqual(player.organism.precision, precision)
+            for neuron in player.organism.outputs.values():
+                self.assertEqual(neuron.input_hidden.dtype, torch.float32)
+        trial.run(timeout=10)
+        env.complete_trial(trial)
+
+
     def test_cull(self):
         # Build an environment with a larger population
         env = Environment(get_engine())
@@ -132,8 +221,9 @@ class Environment_test(unittest.TestCase):
         engine: Engine = get_engine()
         env = Environment(engine)
 
-        # Add a mutagen to ensure mutation occurs during cloning
-        env.add_mutagen(CreateNeuronMutagen(CNLayer.input_initial_value, base_susceptibility=1.0))
+        # Add a mutagen to ensure mutation occurs during cloning. Values only wiggle when a draw comes up at or over
+        # the susceptibility, so it has to be low for anything to change
+        env.add_mutagen(CreateNeuronMutagen(CNLayer.input_initial_value, base_susceptibility=0.001))
 
         # Create a single organism to clone
         env.populate(1)
@@ -157,3 +247,65 @@ class Environment_test(unittest.TestCase):
         self.assertIsNot(clone.genotype, original_genotype)
         self.assertGreaterEqual(len(clone.cells), 0)
 
+
+    def test_clone_unmutated(self):
+        engine: Engine = get_engine()
+        env = Environment(engine)
+        env.populate(1)
+        self.assertEqual((env.expressions.hits, env.expressions.misses), (0, 1))
+
+        with Session(engine) as session:
+            original_organism = session.scalar(select(Organism))
+            clone = env.clone(original_organism.id, session, mutate=False)
+            self.assertEqual((env.expressions.hits, env.expressions.misses), (1, 1))
+            self.assertIs(clone.genotype, original_organism.genotype)
+            self.assertEqual(len(clone.cells), len(original_organism.cells))
+            self.assertEqual(set(clone.outputs.keys()), set(original_organism.outputs.keys()))
+            self.assertFalse({c.id for c in clone.cells} & {c.id for c in original_organism.cells})
+
+    def test_populate_shares_genes(self):
+        engine: Engine = get_engine()
+        env = Environment(engine)
+        env.populate(3)
+        with Session(engine) as session:
+            # One of each ConnectNeurons(n, n), and a single RotateCells, shared by every genotype
+            self.assertEqual(session.scalar(select(func.count()).select_from(ConnectNeurons)), len(REQUIRED_INPUTS))
+            self.assertEqual(session.scalar(select(func.count()).select_from(RotateCells)), 1)
+            self.assertEqual(session.scalar(select(func.count()).select_from(CreateNeuron)),
+                             3 * len(REQUIRED_OUTPUTS))
+
+    def test_prune_susceptibilities(self):
+        engine: Engine = get_engine()
+        env = Environment(engine)
+        env.populate(2)
+        env.add_mutagen(CreateNeuronMutagen(CNLayer.input_hidden, base_susceptibility=0.001))
+        with env.sessionmaker.begin() as session:
+            dead_id, live_id = session.scalars(select(Organism.id)).all()
+            # Cloning records susceptibilities for the genes in the dead one
+            env.clone(dead_id, session)
+            env.population.remove(dead_id, session)
+            live_genotype_id = session.get(Organism, live_id).genotype_id
+
+        self.assertGreater(env.prune_susceptibilities(), 0)
+        with Session(engine) as session:
+            live_genes = load_genotypes([live_genotype_id], session)
+            mutagen = session.scalar(select(Mutagen))
+            # Only the live genes it could mutate, not the composites or anything else
+            self.assertEqual({gene.id for gene in mutagen.susceptibilities},
+                             {gene_id for gene_id, gene in live_genes.items() if isinstance(gene, NEURON_GENES)})
+            self.assertGreater(len(mutagen.susceptibilities), 0)
+        self.assertEqual(env.prune_susceptibilities(), 0)
+
+    def test_collect_garbage(self):
+        engine: Engine = get_engine()
+        env = Environment(engine)
+        env.populate(2)
+        env.cull(1, num_to_compare=1)
+        report = env.collect_garbage()
+        # The dead one's neurons, but none of the genes they shared
+        self.assertEqual(report.rows["create_neuron"], len(REQUIRED_OUTPUTS))
+        self.assertEqual(report.rows["neuron"], len(REQUIRED_OUTPUTS))
+        self.assertGreater(report.bytes_reclaimed, 0)
+        with Session(engine) as session:
+            self.assertEqual(session.scalar(select(func.count()).select_from(CreateNeuron)), len(REQUIRED_OUTPUTS))
+            self.assertEqual(session.scalar(select(func.count()).select_from(RotateCells)), 1)
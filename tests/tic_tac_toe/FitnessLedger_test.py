@@ -0,0 +1,51 @@
+import unittest
+import uuid
+
+from sqlalchemy.orm import Session
+
+from roxene import Organism
+from roxene.tic_tac_toe import Environment, Outcome, Player, Trial
+from roxene.tic_tac_toe.fitness import Fitness, FitnessLedger, parse_weights
+from util import get_engine
+
+
+class FitnessLedger_test(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = get_engine()
+        self.environment = Environment(self.engine)
+        o1, o2, o3 = Organism(), Organism(), Organism()
+        self.o1_id, self.o2_id, self.o3_id = o1.id, o2.id, o3.id
+
+        # o1 wins with three valid moves, o2 makes two
+        trial_1 = Trial(Player(o1), Player(o2))
+        trial_1.run(queued_input=[(0, 0), (1, 0), (0, 1), (1, 1), (0, 2)])
+        self.environment.complete_trial(trial_1)
+
+        # o1 makes two more valid moves, o3 makes one and loses on an invalid one
+        trial_2 = Trial(Player(o1), Player(o3))
+        trial_2.run(queued_input=[(0, 0), (1, 0), (0, 1), (0, 0)])
+        self.environment.complete_trial(trial_2)
+
+    def test_complete_trial_records_fitness(self):
+        with Session(self.engine) as session:
+            fitness = session.get(Fitness, self.o1_id)
+            self.assertEqual((fitness.wins, fitness.valid_moves, fitness.losses), (1, 5, 0))
+            self.assertEqual(fitness.score, 105)
+            fitness = session.get(Fitness, self.o3_id)
+            self.assertEqual((fitness.valid_moves, fitness.invalid_moves, fitness.losses), (1, 1, 1))
+
+            unplayed_id = uuid.uuid4()
+            self.assertEqual(self.environment.fitness.rank([self.o1_id, unplayed_id, self.o2_id, self.o3_id], session),
+                             [(self.o3_id, -59), (unplayed_id, 0), (self.o2_id, 2), (self.o1_id, 105)])
+
+    def test_rebuild(self):
+        ledger = FitnessLedger(parse_weights("WIN=1000, invalid_move=0"))
+        self.assertEqual(ledger.weights[Outcome.WIN], 1000)
+        self.assertEqual(ledger.weights[Outcome.LOSE], -10)
+        with Session(self.engine) as session:
+            self.assertEqual(ledger.rebuild(session), 3)
+            session.commit()
+            self.assertEqual(ledger.scores([self.o1_id, self.o2_id, self.o3_id], session),
+                             {self.o1_id: 1005, self.o2_id: 2, self.o3_id: -9})
+            self.assertEqual(session.get(Fitness, self.o1_id).wins, 1)
@@ -1,9 +1,13 @@
+import itertools
 import random
 import unittest
-from unittest.mock import Mock, call
+from unittest.mock import ANY, Mock, call
+
+import numpy as np
 
 from roxene import Organism
 from roxene.tic_tac_toe import Player
+from roxene.tic_tac_toe.players import is_high, is_low
 from roxene.tic_tac_toe.move import Move
 
 MAX_VALUE = 0.5
@@ -25,23 +29,31 @@ def generateBoard(numToFill):
     return board
 
 
+def mock_organism() -> Organism:
+    organism = Mock(Organism)
+    # Hit whatever it's waiting for on the first update
+    organism.run_until.return_value = 1
+    return organism
+
+
 class Player_test(unittest.TestCase):
 
     def test_get_move_coords(self):
         # Set a fixed seed for reproducible tests
         rng = random.Random(SEED)
 
-        organism: Organism = Mock(Organism)
+        organism: Organism = mock_organism()
         player = Player(organism, 'X')
         board = generateBoard(numToFill=6)
 
         organism_outputs: list[list[float]] = [[rng.uniform(-1, 1) for _ in range(3)] for _ in range(3)]
 
         # Let the mock organism's side-effect look up the label in organism_outputs
+        output_ready = iter([0.5, -0.5])
         organism.get_output.side_effect = (
             lambda label: organism_outputs[int(label.split(',')[0])][int(label.split(',')[1])]
             if ',' in label
-            else rng.uniform(-1, 1)
+            else next(output_ready)
         )
 
         move = player.get_move_coords(board)
@@ -69,7 +81,8 @@ class Player_test(unittest.TestCase):
 
     def test_sync_1_high_1_low(self):
         """Let the organism show high on "OUTPUT_READY", then low to satisfy the Player that it's ready"""
-        organism = Mock(Organism)
+        organism = mock_organism()
+        organism.run_until.side_effect = [1, 1]
         organism.get_output.side_effect = [0.5, -0.5]
         player = Player(organism=organism, letter='X')
         player.sync(timeout=10)
@@ -78,42 +91,75 @@ class Player_test(unittest.TestCase):
         self.assertEqual(organism.set_input.call_count, 2)
         organism.set_input.assert_has_calls([call("INPUT_READY", 0.5), call("INPUT_READY", -0.5)])
 
+        # And ran it until each one, with whatever was left of the timeout
+        organism.run_until.assert_has_calls([call("OUTPUT_READY", is_high, 10, ANY),
+                                             call("OUTPUT_READY", is_low, 9, ANY)])
         self.assertEqual(organism.get_output.call_count, 2)
 
     def test_sync_10_low(self):
         """Let the organism show only low on "OUTPUT_READY", until it triggers a timeout"""
-        organism = Mock(Organism)
-        max_updates = 100
-
-        organism.get_output.side_effect = [-0.5] * 10
+        organism = mock_organism()
+        organism.run_until.return_value = 10
+        organism.get_output.return_value = -0.5
         player = Player(organism=organism, letter='X')
-        try:
+        with self.assertRaises(TimeoutError):
             player.sync(timeout=10)
-            self.fail("Should have failed")
-        except TimeoutError as expected:
-            pass
 
         # Player only showed the Organism INPUT_READY high, once
-        organism.set_input.assert_has_calls([call("INPUT_READY", 0.5)])
-
-        # The Player asked for the Organism's output 10 times before timing out
-        self.assertEqual(organism.get_output.call_count, 10)
+        organism.set_input.assert_called_once_with("INPUT_READY", 0.5)
+        organism.run_until.assert_called_once_with("OUTPUT_READY", is_high, 10, ANY)
+        self.assertEqual(player.updates_saved, 0)
 
     def test_sync_10_high(self):
         """Let the organism show only high on "OUTPUT_READY", until it triggers a timeout"""
-        organism = Mock(Organism)
-        max_updates = 100
-
-        organism.get_output.side_effect = [0.5] * 10
+        organism = mock_organism()
+        organism.run_until.side_effect = [1, 9]
+        organism.get_output.return_value = 0.5
         player = Player(organism=organism, letter='X')
-        try:
+        with self.assertRaises(TimeoutError):
             player.sync(timeout=10)
-            self.fail("Should have failed")
-        except TimeoutError as expected:
-            pass
 
-        # Player only showed the Organism INPUT_READY high, once
         organism.set_input.assert_has_calls([call("INPUT_READY", 0.5), call("INPUT_READY", -0.5)])
+        organism.run_until.assert_has_calls([call("OUTPUT_READY", is_high, 10, ANY),
+                                             call("OUTPUT_READY", is_low, 9, ANY)])
+
+    def test_sync_fixed_point(self):
+        """Let the organism stop changing while OUTPUT_READY is low, and give up on it right away"""
+        organism = mock_organism()
+        organism.get_output.return_value = -0.5
+        state = np.array([0.25, -0.125])
+
+        def run_until(output_label, predicate, max_steps, monitor):
+            # It takes 2 updates to see the state hasn't changed
+            for step in (1, 2):
+                if monitor.observe(state):
+                    return step
+            return max_steps
+
+        organism.run_until.side_effect = run_until
+        player = Player(organism=organism, letter='X')
+        with self.assertRaises(TimeoutError):
+            player.sync(timeout=100)
+        self.assertEqual(player.updates_saved, 98)
+
+    def test_sync_cycle(self):
+        """Let the organism go around in a cycle after reaching high, and give up once it comes back around"""
+        organism = mock_organism()
+        organism.get_output.side_effect = [0.5, 0.]
+        states = itertools.cycle([np.array([1.]), np.array([2.]), np.array([3.])])
+
+        def run_until(output_label, predicate, max_steps, monitor):
+            for step in range(1, max_steps + 1):
+                if monitor.observe(next(states)):
+                    return step
+            return max_steps
+
+        # Straight to high, then round and round
+        phases = [lambda *args: 1, run_until]
+        organism.run_until.side_effect = lambda *args: phases.pop(0)(*args)
+        player = Player(organism=organism, letter='X')
+        with self.assertRaises(TimeoutError):
+            player.sync(timeout=100)
 
-        # The Player asked for the Organism's output 10 times before timing out
-        self.assertEqual(organism.get_output.call_count, 10)
+        # 1 update to get high, then 4 more to come back around to the first state
+        self.assertEqual(player.updates_saved, 95)
@@ -1,12 +1,16 @@
 import logging
+import threading
 import unittest
 import uuid
+from datetime import datetime, timedelta
 
 from numpy.random import default_rng, Generator
+from sqlalchemy import event, select
 from sqlalchemy.orm import sessionmaker
 
 from roxene import Organism
 from roxene.tic_tac_toe import Population, Player, Trial
+from roxene.util import set_rng
 from util import get_engine
 
 SEED = 1123581321
@@ -274,3 +278,178 @@ class Population_test(unittest.TestCase):
             pop.remove(organisms[2].id, session)
             pop.remove(organisms[0].id, session)
             self.assertEqual(1, pop.count(session))
+
+    def test_slots_dense_after_remove(self):
+        seshmaker = sessionmaker(get_engine())
+        pop = Population()
+
+        with seshmaker.begin() as session:
+            organisms = [Organism() for _ in range(6)]
+            ids = [organism.id for organism in organisms]
+            for organism in organisms:
+                pop.add(organism, session)
+            pop.remove(ids[1], session)
+            pop.remove(ids[5], session)
+
+        with seshmaker.begin() as session:
+            slots = dict(session.execute(select(Organism.id, Organism.slot)).all())
+            self.assertEqual(sorted(slots.values()), list(range(4)))
+            # The last one moved into the first hole
+            self.assertEqual(slots[ids[4]], 1)
+
+            # Another Population over the same DB picks up the same index
+            set_rng(default_rng(SEED))
+            sampled = pop.sample(4, False, session)
+            set_rng(default_rng(SEED))
+            self.assertEqual(Population().sample(4, False, session), sampled)
+
+    def test_reload_after_rollback(self):
+        seshmaker = sessionmaker(get_engine())
+        pop = Population()
+
+        with seshmaker.begin() as session:
+            pop.add(Organism(), session)
+
+        with seshmaker() as session:
+            pop.add(Organism(), session)
+            session.rollback()
+            set_rng(default_rng(SEED))
+            self.assertEqual(1, len(pop.sample(1, False, session)))
+            with self.assertRaises(ValueError):
+                pop.sample(2, False, session)
+
+    def test_rollback_only_undoes_own_changes(self):
+        set_rng(default_rng(SEED))
+        seshmaker = sessionmaker(get_engine())
+        pop = Population()
+
+        with seshmaker.begin() as session:
+            kept = Organism()
+            pop.add(kept, session)
+            kept_id = kept.id
+
+        rolled_back = seshmaker()
+        pop.add(Organism(), rolled_back)
+        # Nobody else sees it before it's committed
+        with seshmaker.begin() as session:
+            self.assertEqual([kept_id], pop.sample(1, False, session))
+            with self.assertRaises(ValueError):
+                pop.sample(2, False, session)
+            added = Organism()
+            pop.add(added, session)
+            added_id = added.id
+        rolled_back.rollback()
+        rolled_back.close()
+
+        with seshmaker.begin() as session:
+            self.assertEqual({kept_id, added_id}, set(pop.sample(2, False, session)))
+            with self.assertRaises(ValueError):
+                pop.sample(3, False, session)
+            slots = dict(session.execute(select(Organism.id, Organism.slot)).all())
+            self.assertEqual({kept_id: 0, added_id: 1}, slots)
+
+    def test_concurrent_commits_reload(self):
+        set_rng(default_rng(SEED))
+        seshmaker = sessionmaker(get_engine())
+        pop = Population()
+
+        with seshmaker.begin() as session:
+            organisms = [Organism() for _ in range(3)]
+            ids = [organism.id for organism in organisms]
+            for organism in organisms:
+                pop.add(organism, session)
+
+        # Each one moves the last Organism into the slot of the one it removes, so they disagree about its slot
+        first, second = seshmaker(), seshmaker()
+        pop.remove(ids[0], first)
+        pop.remove(ids[1], second)
+        first.commit()
+        first.close()
+        second.commit()
+        second.close()
+
+        with seshmaker.begin() as session:
+            self.assertEqual({ids[2]}, set(pop.sample(1, False, session)))
+            with self.assertRaises(ValueError):
+                pop.sample(2, False, session)
+        with seshmaker.begin() as session:
+            self.assertEqual([0], session.scalars(select(Organism.slot)).all())
+
+    def test_lease(self):
+        set_rng(default_rng(SEED))
+        seshmaker = sessionmaker(get_engine())
+        pop = Population()
+
+        with seshmaker.begin() as session:
+            organisms = [Organism() for _ in range(5)]
+            for organism in organisms:
+                pop.add(organism, session)
+            # Two of them are already in an unfinished trial
+            session.add(Trial(Player(organisms[0]), Player(organisms[1])))
+            busy = {organisms[0].id, organisms[1].id}
+
+        with seshmaker.begin() as session:
+            leased = pop.lease(2, session)
+            self.assertEqual(2, len(set(leased)))
+            self.assertFalse(busy.intersection(leased))
+            last = pop.lease(1, session)
+            self.assertNotIn(last[0], leased)
+            with self.assertRaises(ValueError):
+                pop.lease(1, session)
+
+            pop.release(leased)
+            self.assertEqual(set(leased), set(pop.lease(2, session)))
+
+    def test_lease_abandoned(self):
+        set_rng(default_rng(SEED))
+        seshmaker = sessionmaker(get_engine())
+        pop = Population(abandoned_after=timedelta(minutes=10))
+
+        with seshmaker.begin() as session:
+            organisms = [Organism() for _ in range(5)]
+            idle = {organisms[n].id for n in (0, 1, 4)}
+            for organism in organisms:
+                pop.add(organism, session)
+            # One trial that never got finished a while ago, and one that's still going
+            abandoned = Trial(Player(organisms[0]), Player(organisms[1]))
+            abandoned.start_date = datetime.now() - timedelta(minutes=20)
+            going = Trial(Player(organisms[2]), Player(organisms[3]))
+            going.start_date = datetime.now()
+            session.add_all([abandoned, going])
+
+        with seshmaker.begin() as session:
+            leased = pop.lease(3, session)
+            self.assertEqual(idle, set(leased))
+            with self.assertRaises(ValueError):
+                pop.lease(1, session)
+            pop.release(leased)
+            self.assertEqual(idle, set(pop.sample(3, True, session)))
+
+    def test_lease_queries_without_lock(self):
+        set_rng(default_rng(SEED))
+        engine = get_engine()
+        seshmaker = sessionmaker(engine)
+        pop = Population()
+
+        with seshmaker.begin() as session:
+            for _ in range(4):
+                pop.add(Organism(), session)
+
+        during_query = []
+
+        def check_lock(conn, cursor, statement, *args):
+            if "EXISTS" in statement:
+                # Another thread can still use the Population, and what's being claimed is already set aside
+                other = threading.Thread(target=pop.release, args=([],))
+                other.start()
+                other.join(timeout=5)
+                during_query.append((other.is_alive(), len(pop._leased)))
+
+        event.listen(engine, "before_cursor_execute", check_lock)
+        try:
+            with seshmaker.begin() as session:
+                leased = pop.lease(2, session)
+        finally:
+            event.remove(engine, "before_cursor_execute", check_lock)
+        self.assertEqual(2, len(leased))
+        self.assertEqual([(False, 2)], during_query)
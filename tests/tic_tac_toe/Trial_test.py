@@ -1,5 +1,6 @@
 import unittest
 import uuid
+from unittest.mock import patch
 from numpy.random import Generator, default_rng
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
@@ -7,9 +8,11 @@ from typing import Set
 
 import roxene
 from ConnectNeurons_test import build_organism
+from roxene.batch import BatchStepper
 from roxene.tic_tac_toe import Trial
 from roxene.tic_tac_toe.outcome import Outcome
-from roxene.tic_tac_toe.players import Player, ManualPlayer, REQUIRED_INPUTS, REQUIRED_OUTPUTS
+from roxene.tic_tac_toe.players import Player, ManualPlayer, REQUIRED_INPUTS, REQUIRED_OUTPUTS, INPUT_READY, \
+    HIGH_THRESHOLD, LOW_THRESHOLD
 from roxene.util import set_rng
 
 SEED = 235869903
@@ -124,3 +127,35 @@ class Trial_test(unittest.TestCase):
             self.assertGreater(len(trial_3.moves), 0)
             self.assertIsNotNone(trial_3.start_date)
             self.assertIsNotNone(trial_3.end_date)
+
+    def test_run_with_stepper(self):
+        set_rng(default_rng(seed=SEED))
+
+        org_1 = build_organism(input_names=REQUIRED_INPUTS, output_names=REQUIRED_OUTPUTS)
+        org_2 = build_organism(input_names=REQUIRED_INPUTS, output_names=REQUIRED_OUTPUTS)
+        trial = Trial(Player(org_1, 'X'), Player(org_2, 'O'))
+        stepper = BatchStepper()
+        trial.run(timeout=50, stepper=stepper)
+
+        self.assertGreater(len(trial.moves), 0)
+        self.assertTrue(trial.is_finished())
+        self.assertGreater(stepper.ticks_run, 0)
+        # Everything's decompiled and detached afterward
+        self.assertIsNone(org_1.phenotype)
+        self.assertIsNone(org_2.phenotype)
+
+    def test_run_compiles(self):
+        set_rng(default_rng(seed=SEED))
+
+        org_1 = build_organism(input_names=REQUIRED_INPUTS, output_names=REQUIRED_OUTPUTS)
+        org_2 = build_organism(input_names=REQUIRED_INPUTS, output_names=REQUIRED_OUTPUTS)
+        trial = Trial(Player(org_1, 'X'), Player(org_2, 'O'))
+        with patch.object(roxene.Organism, "compile", autospec=True, side_effect=roxene.Organism.compile) as compile:
+            trial.run(timeout=50)
+        self.assertEqual([call.args[0] for call in compile.call_args_list], [org_1, org_2])
+
+        self.assertTrue(trial.is_finished())
+        self.assertIsNone(org_1.phenotype)
+        self.assertIsNone(org_2.phenotype)
+        # What X set its inputs to on its move was written back to the InputCells
+        self.assertIn(org_1.inputs[INPUT_READY].value, (HIGH_THRESHOLD, LOW_THRESHOLD))